@@ -17,6 +17,15 @@
 #   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 # 
 
-from . import util, rules
+import importlib
+
+from . import util
+
+def __getattr__(name):
+	# the rules are only imported when needed, which makes namcap start
+	# faster when it has no package to check
+	if name == 'rules':
+		return importlib.import_module('.rules', __name__)
+	raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 # vim: set ts=4 sw=4 noet:
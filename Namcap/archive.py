@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Opening of package archives
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Package archives are decompressed once into a seekable buffer, so that
+the rules get random access to them without decompressing them again.
+Small archives are kept in memory, larger ones go to a memory-mapped
+scratch file.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import subprocess
+import tarfile
+import tempfile
+import zlib
+
+import Namcap.profile
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+SPOOL_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# largest zstd window accepted, the zstd default without --long
+ZSTD_MAX_WINDOW = 1 << 27
+
+def zstd_open(path, mode = 'rb'):
+	"Streaming zstd decompression with a bounded window"
+	dctx = zstandard.ZstdDecompressor(max_window_size = ZSTD_MAX_WINDOW)
+	return dctx.stream_reader(open(path, mode), read_size = CHUNK_SIZE,
+			read_across_frames = True)
+
+# compressed formats decompressed in process, by magic number
+MAGICS = [
+	(b'\x1f\x8b', gzip.open),
+	(b'BZh', bz2.open),
+	(b'\xfd7zXZ\x00', lzma.open),
+]
+
+# formats needing an external program, by extension
+COMMANDS = {
+	'lzo': ['lzop', '-dcf'],
+	'lrz': ['lrzip', '-dcf', '-q', '-o', '-'],
+}
+
+DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError, zlib.error)
+
+if zstandard is not None:
+	MAGICS.append((b'\x28\xb5\x2f\xfd', zstd_open))
+	DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+else:
+	COMMANDS['zst'] = ['zstd', '-dcf',
+			'--memory=%dMB' % (ZSTD_MAX_WINDOW >> 20)]
+
+class PackageArchive(tarfile.TarFile):
+	"A tarfile reading a decompressed package, which it frees on close()"
+	def close(self):
+		super().close()
+		self.fileobj.close()
+
+class PackageStream(tarfile.TarFile):
+	"A tarfile reading a package in order, which closes its source on close()"
+	source = None
+
+	def close(self):
+		super().close()
+		if self.source is not None:
+			self.source.close()
+
+def spool(stream, spool_size = SPOOL_SIZE):
+	"""
+	Copies a stream to a seekable buffer: a BytesIO if it fits in
+	spool_size, a read-only mmap of an anonymous scratch file otherwise
+	"""
+	buf = io.BytesIO()
+	while buf.tell() <= spool_size:
+		chunk = stream.read(CHUNK_SIZE)
+		if not chunk:
+			buf.seek(0)
+			return buf
+		buf.write(chunk)
+
+	with tempfile.TemporaryFile() as scratch:
+		scratch.write(buf.getbuffer())
+		buf.close()
+		while True:
+			chunk = stream.read(CHUNK_SIZE)
+			if not chunk:
+				break
+			scratch.write(chunk)
+		scratch.flush()
+		# the mapping stays valid once the file is closed
+		return mmap.mmap(scratch.fileno(), 0, access = mmap.ACCESS_READ)
+
+def decompressed(path, spool_size = SPOOL_SIZE):
+	"""
+	Returns a seekable buffer with the decompressed contents of path,
+	or None if the file is not compressed
+	"""
+	with open(path, 'rb') as f:
+		magic = f.read(6)
+	for prefix, opener in MAGICS:
+		if magic.startswith(prefix):
+			with opener(path, 'rb') as stream:
+				return spool(stream, spool_size)
+
+	command = COMMANDS.get(path.rsplit('.', 1)[-1])
+	if command is None:
+		return None
+	try:
+		process = subprocess.Popen(command + [path],
+				stdout = subprocess.PIPE, stderr = subprocess.DEVNULL)
+	except OSError:
+		raise tarfile.ReadError("%s is needed to read %s" % (command[0], path))
+	with Namcap.profile.stage(command[0], children = True), process:
+		buf = spool(process.stdout, spool_size)
+	if process.returncode != 0:
+		buf.close()
+		raise tarfile.ReadError("%s failed to decompress %s" % (command[0], path))
+	return buf
+
+def open_stream(path):
+	"""
+	Opens a package archive for reading its members in order, only
+	decompressing it as far as they are read. Returns None if it is
+	compressed with an external program.
+	"""
+	with open(path, 'rb') as f:
+		magic = f.read(6)
+	for prefix, opener in MAGICS:
+		if magic.startswith(prefix):
+			break
+	else:
+		if path.rsplit('.', 1)[-1] in COMMANDS:
+			return None
+		opener = open
+	try:
+		source = opener(path, 'rb')
+	except DECOMPRESSION_ERRORS as e:
+		raise tarfile.ReadError("cannot decompress %s: %s" % (path, e))
+	try:
+		tar = PackageStream.open(fileobj = source, mode = 'r|')
+	except (tarfile.TarError,) + DECOMPRESSION_ERRORS as e:
+		source.close()
+		raise tarfile.ReadError("cannot read %s: %s" % (path, e))
+	tar.source = source
+	return tar
+
+def open_archive(path, spool_size = SPOOL_SIZE):
+	"""
+	Opens a package archive for random access, decompressing it only once.
+	Raises tarfile.ReadError if it is not a readable tarball.
+	"""
+	try:
+		buf = decompressed(path, spool_size)
+	except DECOMPRESSION_ERRORS as e:
+		raise tarfile.ReadError("cannot decompress %s: %s" % (path, e))
+	if buf is None:
+		return tarfile.open(path, "r:")
+	try:
+		return PackageArchive(fileobj = buf)
+	except tarfile.TarError:
+		buf.close()
+		raise
+
+# vim: set ts=4 sw=4 noet:
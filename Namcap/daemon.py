@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Long-running namcap process serving requests over a UNIX socket
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+namcapd loads namcap once: the rules, the pyalpm handle, the dependency
+graph and file index of the local database, ld.so.cache. It then waits
+on a UNIX socket for namcap-client, which sends its command line,
+environment, working directory and standard streams.
+
+Every request is run by a forked child of the daemon, which starts with
+everything loaded, writes to the streams of the client as namcap itself
+would, and answers with the exit status. The daemon loads the pacman
+databases again when they change.
+
+The client only needs this module, which imports nothing from namcap.
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import types
+
+SOCKET_ENV = 'NAMCAPD_SOCKET'
+
+# length of the JSON message that follows
+HEADER = struct.Struct('!I')
+MAX_MESSAGE = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+class ProtocolError(Exception):
+	"The other side did not follow the protocol"
+
+def default_socket():
+	"The socket of namcapd: $NAMCAPD_SOCKET, or one in the runtime directory"
+	path = os.environ.get(SOCKET_ENV)
+	if path:
+		return path
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+	if runtime_dir:
+		return os.path.join(runtime_dir, 'namcapd.socket')
+	return os.path.join(tempfile.gettempdir(), 'namcapd-%d.socket' % os.getuid())
+
+def send_message(sock, message, fds = ()):
+	"Sends a JSON-compatible message, along with file descriptors"
+	data = json.dumps(message).encode('ascii')
+	data = HEADER.pack(len(data)) + data
+	sent = 0
+	if fds:
+		sent = socket.send_fds(sock, [data], list(fds))
+	sock.sendall(data[sent:])
+
+def receive_message(sock, maxfds = 0):
+	"""
+	Returns a message of send_message() and the file descriptors sent
+	with it, (None, []) if the other side closed the connection instead
+	"""
+	data = b''
+	fds = []
+	length = None
+	try:
+		while length is None or len(data) < HEADER.size + length:
+			if maxfds and not data:
+				# the descriptors come with the first bytes
+				chunk, fds, flags, address = socket.recv_fds(sock, CHUNK_SIZE, maxfds)
+			else:
+				chunk = sock.recv(CHUNK_SIZE)
+			if not chunk:
+				if not data:
+					return None, []
+				raise ProtocolError("truncated message")
+			data += chunk
+			if length is None and len(data) >= HEADER.size:
+				length = HEADER.unpack_from(data)[0]
+				if length > MAX_MESSAGE:
+					raise ProtocolError("message too large")
+		if len(data) > HEADER.size + length:
+			raise ProtocolError("unexpected data after the message")
+		return json.loads(data[HEADER.size:].decode('ascii')), fds
+	except (ProtocolError, ValueError):
+		for fd in fds:
+			os.close(fd)
+		raise ProtocolError("invalid message")
+
+def _exit_status(code):
+	"The exit status of SystemExit(code), like the interpreter's"
+	if code is None:
+		return 0
+	if isinstance(code, int):
+		return code & 0xff
+	print(code, file = sys.stderr)
+	return 1
+
+def warm_up():
+	"""
+	Loads what checking a package needs, so that the children of the
+	daemon start with it. It is only an optimization: anything failing
+	here fails again, and is reported, when a package is checked.
+	"""
+	import Namcap.depgraph
+	import Namcap.fileindex
+	import Namcap.ldcache
+	import Namcap.package
+	import Namcap.rules
+
+	rules = Namcap.rules.all_rules
+	for name in rules:
+		try:
+			rules.kind(name)
+		except Exception:
+			continue
+	def elftools():
+		import elftools.elf.dynamic
+		import elftools.elf.elffile
+		import elftools.elf.sections
+	def databases():
+		handle = Namcap.package.get_handle()
+		Namcap.package.provides_index(handle.get_localdb())
+		for db in handle.get_syncdbs():
+			Namcap.package.get_syncdb(db.name)
+	for step in (elftools, databases, Namcap.depgraph.local_graph,
+			Namcap.fileindex.local_file_index, Namcap.ldcache.load_ld_cache):
+		try:
+			step()
+		except Exception:
+			continue
+
+def database_state():
+	"Changes whenever the local or sync databases change"
+	import Namcap.resultcache
+	try:
+		return Namcap.resultcache.database_fingerprint()
+	except Exception:
+		return None
+
+class Server(object):
+	"namcapd, answering the requests of namcap-client on a UNIX socket"
+	def __init__(self, path, script = None):
+		if script is None:
+			import importlib.util
+			script = importlib.util.find_spec('namcap').origin
+		self.path = path
+		self.script = script
+		with open(script) as f:
+			self.code = compile(f.read(), script, 'exec')
+		self.sock = None
+		self.loaded = False
+		self.state = None
+
+	def load(self):
+		"Loads namcap, again if the pacman databases changed since"
+		state = database_state()
+		if self.loaded:
+			if state == self.state:
+				return
+			import Namcap.package
+			Namcap.package.reset_handle()
+		warm_up()
+		self.loaded = True
+		self.state = state
+
+	def bind(self):
+		"Listens on the socket, replacing the one of a daemon no longer running"
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(self.path)
+		except OSError:
+			try:
+				os.unlink(self.path)
+			except FileNotFoundError:
+				pass
+		else:
+			raise OSError("namcapd is already running")
+		finally:
+			probe.close()
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		# only the user running the daemon may connect
+		umask = os.umask(0o177)
+		try:
+			self.sock.bind(self.path)
+		finally:
+			os.umask(umask)
+		self.sock.listen(16)
+
+	def close(self):
+		if self.sock is not None:
+			self.sock.close()
+			self.sock = None
+			try:
+				os.unlink(self.path)
+			except OSError:
+				pass
+
+	def serve_forever(self):
+		# children are reaped by the kernel
+		signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+		while True:
+			conn, address = self.sock.accept()
+			try:
+				self.handle(conn)
+			except (OSError, ProtocolError):
+				pass
+			finally:
+				conn.close()
+
+	def _allowed(self, conn):
+		creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+				struct.calcsize('3i'))
+		pid, uid, gid = struct.unpack('3i', creds)
+		return uid == os.getuid()
+
+	def handle(self, conn):
+		"Forks a child running the request of a client"
+		if not self._allowed(conn):
+			return
+		request, fds = receive_message(conn, 3)
+		if request is None:
+			return
+		try:
+			if len(fds) != 3:
+				raise ProtocolError("the standard streams are missing")
+			self.load()
+			if os.fork() == 0:
+				try:
+					self.sock.close()
+					try:
+						status = self.run(request, fds)
+					except BaseException:
+						import traceback
+						traceback.print_exc()
+						sys.stderr.flush()
+						status = 1
+					send_message(conn, {'status': status})
+				finally:
+					os._exit(0)
+		finally:
+			for fd in fds:
+				os.close(fd)
+
+	def run(self, request, fds):
+		"""
+		Runs namcap in a child of the daemon, on the streams and with the
+		command line of the client. Returns its exit status.
+		"""
+		signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+		signal.signal(signal.SIGTERM, signal.SIG_DFL)
+		signal.signal(signal.SIGINT, signal.default_int_handler)
+		for target, fd in enumerate(fds):
+			os.dup2(fd, target)
+		os.chdir(request['cwd'])
+		os.environ.clear()
+		os.environ.update(request['environ'])
+		# like the streams the interpreter would have opened
+		(out_encoding, out_errors), (err_encoding, err_errors) = request['streams']
+		sys.stdout = open(1, 'w', buffering = 1 if os.isatty(1) else -1,
+				encoding = out_encoding, errors = out_errors, closefd = False)
+		sys.stderr = open(2, 'w', buffering = 1,
+				encoding = err_encoding, errors = err_errors, closefd = False)
+		sys.argv = [self.script] + request['argv']
+		# multiprocessing finds the functions of namcap -j in __main__
+		main = types.ModuleType('__main__')
+		main.__file__ = self.script
+		main.__builtins__ = __builtins__
+		sys.modules['__main__'] = main
+		try:
+			exec(self.code, main.__dict__)
+			status = 0
+		except SystemExit as e:
+			status = _exit_status(e.code)
+		except BaseException as e:
+			import traceback
+			# from namcap.py on, as the interpreter would print it
+			traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+			status = 1
+		finally:
+			import Namcap.pkgbuild
+			Namcap.pkgbuild.close_pool()
+		for stream in (sys.stdout, sys.stderr):
+			try:
+				stream.flush()
+			except OSError:
+				status = status or 1
+		return status
+
+def client(argv):
+	"""
+	Runs namcap with the arguments argv through namcapd, or by itself if
+	namcapd is not running. Returns the exit status of namcap.
+	"""
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(default_socket())
+	except OSError:
+		sock.close()
+		os.execvp(sys.executable, [sys.executable, '-m', 'namcap'] + argv)
+	with sock:
+		send_message(sock, {
+			'argv': argv,
+			'cwd': os.getcwd(),
+			'environ': dict(os.environ),
+			'streams': [[sys.stdout.encoding, sys.stdout.errors],
+				[sys.stderr.encoding, sys.stderr.errors]],
+		}, [0, 1, 2])
+		try:
+			response, fds = receive_message(sock)
+		except ProtocolError:
+			response = None
+	if response is None:
+		print("Error: namcapd did not answer", file = sys.stderr)
+		return 1
+	return response['status']
+
+def usage():
+	print("Usage: %s [-s socket]" % os.path.basename(sys.argv[0]))
+	print("")
+	print("Serves the requests of namcap-client, on SOCKET or on")
+	print("%s by default" % default_socket())
+	sys.exit(2)
+
+def main(argv):
+	if argv[:1] == ['--client']:
+		return client(argv[1:])
+
+	import getopt
+	try:
+		optlist, args = getopt.getopt(argv, "hs:", ["help", "socket="])
+	except getopt.GetoptError:
+		usage()
+	path = default_socket()
+	for i, k in optlist:
+		if i in ('-s', '--socket'):
+			path = k
+		if i in ('-h', '--help'):
+			usage()
+	if args:
+		usage()
+
+	server = Server(path)
+	server.load()
+	try:
+		server.bind()
+	except OSError as e:
+		print("Error: Cannot listen on %s: %s" % (path, e.strerror or e))
+		return 1
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.close()
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
+
+# vim: set ts=4 sw=4 noet:
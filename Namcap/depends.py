@@ -24,7 +24,7 @@
 import re
 from Namcap.ruleclass import *
 import Namcap.tags
-from Namcap import package
+from Namcap import depgraph, package
 
 # manual overrides for relationships outside the normal metadata
 implicit_provides = {
@@ -33,17 +33,7 @@ implicit_provides = {
 
 def single_covered(depend):
 	"Returns full coverage tree of one package, with loops broken"
-	covered = set()
-	todo = set([depend])
-	while todo:
-		i = todo.pop()
-		covered.add(i)
-		pac = package.load_from_db(i)
-		if pac is None:
-			continue
-		todo |= set(pac["depends"]) - covered
-
-	return covered - set([depend])
+	return set(depgraph.local_graph().covered(depend))
 
 def getcovered(dependlist):
 	"""
@@ -51,9 +41,10 @@ def getcovered(dependlist):
 	from self-loops (iterable of package names)
 	"""
 
+	graph = depgraph.local_graph()
 	covered = set()
 	for d in dependlist:
-		covered |= single_covered(d)
+		covered |= graph.covered(d)
 	return covered
 
 def getcustom(pkginfo):
@@ -70,12 +61,12 @@ def getprovides(depends):
 		provides[i] = set()
 		if i in implicit_provides:
 			provides[i].update(implicit_provides[i])
-		pac = package.load_from_db(i)
-		if pac is None:
-			continue
-		if not pac["provides"]:
-			continue
-		provides[i].update(pac["provides"])
+		with package.alpm_lock:
+			pac = package.find_db_package(i)
+			if pac is None:
+				continue
+			pac_provides = pac.provides
+		provides[i].update(package.strip_depend_info(p) for p in pac_provides)
 	return provides
 
 def analyze_depends(pkginfo):
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Transitive closure of the dependencies of installed packages
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+The dependency graph of the local database, explored on demand. Cycles
+are condensed into strongly connected components, whose closures are
+computed once and shared by all the packages checked while the database
+does not change.
+"""
+
+import threading
+
+import Namcap.package
+from Namcap.fileindex import local_db_fingerprint
+
+def local_depends(name):
+	"The dependencies of the installed package named or providing name"
+	with Namcap.package.alpm_lock:
+		p = Namcap.package.find_db_package(name)
+		if p is None:
+			return []
+		depends = p.depends
+	return [Namcap.package.strip_depend_info(d) for d in depends]
+
+class DependencyGraph(object):
+	"""
+	Memoized reachability in the graph given by a successors function
+	(name => iterable of names), unknown names having no successors
+	"""
+	def __init__(self, successors, fingerprint = None):
+		self.fingerprint = fingerprint
+		self._successors = successors
+		self._edges = {}
+		# name => frozenset of the names reachable from it, itself included
+		self._reach = {}
+		self._lock = threading.Lock()
+
+	def _edges_of(self, name):
+		edges = self._edges.get(name)
+		if edges is None:
+			edges = self._edges[name] = set(self._successors(name))
+		return edges
+
+	def reach(self, root):
+		"The names reachable from root, root included"
+		with self._lock:
+			if root not in self._reach:
+				self._explore(root)
+			return self._reach[root]
+
+	def _explore(self, root):
+		# iterative Tarjan, the components found below root being done first
+		index = {root: 0}
+		low = {root: 0}
+		stack = [root]
+		onstack = set(stack)
+		work = [(root, iter(self._edges_of(root)))]
+		while work:
+			node, edges = work[-1]
+			for succ in edges:
+				if succ in self._reach:
+					continue
+				if succ not in index:
+					index[succ] = low[succ] = len(index)
+					stack.append(succ)
+					onstack.add(succ)
+					work.append((succ, iter(self._edges_of(succ))))
+					break
+				if succ in onstack:
+					low[node] = min(low[node], index[succ])
+			else:
+				work.pop()
+				if work:
+					parent = work[-1][0]
+					low[parent] = min(low[parent], low[node])
+				if low[node] == index[node]:
+					self._close_component(node, stack, onstack)
+
+	def _close_component(self, node, stack, onstack):
+		members = set()
+		while True:
+			member = stack.pop()
+			onstack.discard(member)
+			members.add(member)
+			if member == node:
+				break
+		reach = set(members)
+		for member in members:
+			for succ in self._edges[member]:
+				if succ not in members:
+					reach |= self._reach[succ]
+		reach = frozenset(reach)
+		for member in members:
+			self._reach[member] = reach
+
+	def covered(self, name):
+		"The names reachable from name, without name itself"
+		return self.reach(name) - {name}
+
+_graph = None
+_lock = threading.Lock()
+
+def local_graph():
+	"The dependency graph of the local database, rebuilt when it changes"
+	global _graph
+	fingerprint = local_db_fingerprint(Namcap.package.get_dbpath())
+	with _lock:
+		if _graph is None or _graph.fingerprint != fingerprint:
+			_graph = DependencyGraph(local_depends, fingerprint)
+		return _graph
+
+# vim: set ts=4 sw=4 noet:
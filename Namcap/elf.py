@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - shared ELF file summaries
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Parses ELF files once and lets every rule query the result.
+"""
+
+import struct
+
+from Namcap.util import is_elf
+
+SHT_DYNSYM = 11
+SHN_UNDEF = 0
+# STB_GLOBAL, STB_WEAK, STB_GNU_UNIQUE
+EXPORTED_BINDINGS = (1, 2, 10)
+# STV_DEFAULT, STV_PROTECTED
+EXPORTED_VISIBILITIES = (0, 3)
+
+class ELFSummary(object):
+	"""
+	The parts of an ELF file namcap rules are interested in, read with
+	a single walk over its sections and segments:
+
+	* elfclass: 32 or 64
+	* e_machine: the architecture ('EM_X86_64', 'EM_AARCH64'...)
+	* e_type: the object type ('ET_EXEC', 'ET_DYN'...)
+	* dynamic_tags: the set of dynamic tags present ('DT_TEXTREL'...)
+	* needed, rpaths, runpaths: DT_NEEDED, DT_RPATH and DT_RUNPATH values
+	* segment_flags: a dictionary { p_type => p_flags }
+	* has_symtab: whether a .symtab section is present
+	"""
+	__slots__ = ('elfclass', 'e_machine', 'e_type', 'dynamic_tags', 'needed',
+			'rpaths', 'runpaths', 'segment_flags', 'has_symtab')
+
+	def __init__(self, fileobj):
+		# pyelftools is slow to import, only do it once an ELF file shows up
+		from elftools.elf.elffile import ELFFile
+		from elftools.elf.dynamic import DynamicSection
+		from elftools.elf.sections import SymbolTableSection
+
+		elffile = ELFFile(fileobj)
+		self.elfclass = elffile.elfclass
+		self.e_machine = elffile.header['e_machine']
+		self.e_type = elffile.header['e_type']
+		self.dynamic_tags = set()
+		self.needed = []
+		self.rpaths = []
+		self.runpaths = []
+		self.has_symtab = False
+		for section in elffile.iter_sections():
+			if isinstance(section, DynamicSection):
+				for tag in section.iter_tags():
+					d_tag = tag.entry.d_tag
+					self.dynamic_tags.add(d_tag)
+					if d_tag == 'DT_NEEDED':
+						self.needed.append(tag.needed)
+					elif d_tag == 'DT_RPATH':
+						self.rpaths.extend(tag.rpath.split(':'))
+					elif d_tag == 'DT_RUNPATH':
+						self.runpaths.extend(tag.runpath.split(':'))
+			elif isinstance(section, SymbolTableSection):
+				if section['sh_entsize'] != 0 and section.name == '.symtab':
+					self.has_symtab = True
+		self.segment_flags = {}
+		for segment in elffile.iter_segments():
+			self.segment_flags[segment['p_type']] = segment['p_flags']
+
+	@property
+	def textrel(self):
+		return 'DT_TEXTREL' in self.dynamic_tags
+
+	@property
+	def bind_now(self):
+		return 'DT_BIND_NOW' in self.dynamic_tags
+
+	@property
+	def debug(self):
+		return 'DT_DEBUG' in self.dynamic_tags
+
+class DynamicSymbols(object):
+	"""
+	The names of the dynamic symbols of an ELF file:
+
+	* undefined: the symbols it needs from other objects
+	* exported: the symbols other objects can bind to
+	"""
+	__slots__ = ('undefined', 'exported')
+
+	def __init__(self, fileobj):
+		self.undefined = set()
+		self.exported = set()
+		# symbol tables of libraries are large: the headers are read and the
+		# symbols decoded in bulk, without going through pyelftools objects
+		fileobj.seek(0)
+		ident = fileobj.read(16)
+		if len(ident) < 16 or ident[4] not in (1, 2) or ident[5] not in (1, 2):
+			return
+		order = '<' if ident[5] == 1 else '>'
+		if ident[4] == 2:
+			header, shdr = 'HHIQQQIHHHHHH', 'IIQQQQIIQQ'
+			fmt, name_at, info_at, other_at, shndx_at = 'IBBHQQ', 0, 1, 2, 3
+		else:
+			header, shdr = 'HHIIIIIHHHHHH', 'IIIIIIIIII'
+			fmt, name_at, info_at, other_at, shndx_at = 'IIIBBH', 0, 3, 4, 5
+		header = struct.Struct(order + header)
+		shdr = struct.Struct(order + shdr)
+		fmt = struct.Struct(order + fmt)
+
+		fields = fileobj.read(header.size)
+		if len(fields) < header.size:
+			return
+		fields = header.unpack(fields)
+		shoff, shentsize, shnum = fields[5], fields[10], fields[11]
+		if shoff == 0 or shentsize < shdr.size:
+			return
+		def contents(sh):
+			fileobj.seek(sh[4])
+			return fileobj.read(sh[5])
+		fileobj.seek(shoff)
+		table = fileobj.read(shentsize)
+		if len(table) < shdr.size:
+			return
+		if shnum == 0:
+			# more sections than fit in e_shnum, the count is in section 0
+			shnum = shdr.unpack_from(table)[5]
+		table += fileobj.read(max(shnum - 1, 0) * shentsize)
+		shnum = len(table) // shentsize
+		for i in range(shnum):
+			sh = shdr.unpack_from(table, i * shentsize)
+			if sh[1] != SHT_DYNSYM or sh[6] >= shnum:
+				continue
+			strtab = contents(shdr.unpack_from(table, sh[6] * shentsize))
+			data = contents(sh)
+			data = data[:len(data) - len(data) % fmt.size]
+			for sym in fmt.iter_unpack(data):
+				name = sym[name_at]
+				if name == 0:
+					continue
+				end = strtab.find(b'\0', name)
+				name = strtab[name:end if end >= 0 else None].decode('utf-8', 'replace')
+				if sym[shndx_at] == SHN_UNDEF:
+					self.undefined.add(name)
+				elif (sym[info_at] >> 4 in EXPORTED_BINDINGS
+						and sym[other_at] & 0x3 in EXPORTED_VISIBILITIES):
+					self.exported.add(name)
+
+def dynamic_symbols(fileobj):
+	"""
+	Returns the DynamicSymbols of a file object, None if it is not an ELF
+	file. Like elf_summary(), the result is cached with the member.
+	"""
+	cache = getattr(fileobj, 'cache', None)
+	if cache is not None and 'dynsym' in cache:
+		return cache['dynsym']
+	symbols = None
+	if is_elf(fileobj):
+		symbols = DynamicSymbols(fileobj)
+		fileobj.seek(0)
+	if cache is not None:
+		cache['dynsym'] = symbols
+	return symbols
+
+def elf_summary(fileobj):
+	"""
+	Returns the ELFSummary of a file object, None if it is not an ELF file.
+
+	File objects handed out by Namcap.ruleclass.scan_tarball() share a
+	cache, so that each member is only parsed once whatever the number
+	of rules asking for it.
+	"""
+	cache = getattr(fileobj, 'cache', None)
+	if cache is not None and 'elf' in cache:
+		return cache['elf']
+	summary = None
+	if is_elf(fileobj):
+		summary = ELFSummary(fileobj)
+		fileobj.seek(0)
+	if cache is not None:
+		cache['elf'] = summary
+	return summary
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Index of the files owned by installed packages
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+The local pacman database is indexed as a sorted table of (path, owner)
+pairs. The table is saved in the cache directory, memory-mapped and
+searched in place, and only rebuilt when the database changes.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import Namcap.package
+import Namcap.util
+
+MAGIC = b'NMCPIDX1'
+# magic, database fingerprint, number of entries, number of owners
+HEADER = struct.Struct('<8s32sII')
+# path offset, owner number
+ENTRY = struct.Struct('<II')
+OFFSET = struct.Struct('<I')
+
+def _encode(s):
+	return s.encode('utf-8', 'surrogateescape')
+
+def _decode(b):
+	return b.decode('utf-8', 'surrogateescape')
+
+class FileIndex(object):
+	"A sorted table of (path, owner) pairs read from a buffer"
+	def __init__(self, buf):
+		if len(buf) < HEADER.size:
+			raise ValueError("truncated file index")
+		magic, self.fingerprint, self._count, nowners = HEADER.unpack_from(buf)
+		if magic != MAGIC:
+			raise ValueError("not a file index")
+		self._buf = buf
+		owners = HEADER.size + self._count * ENTRY.size
+		self._strings = owners + nowners * OFFSET.size
+		self._owners = [_decode(self._string(OFFSET.unpack_from(buf, owners + i * OFFSET.size)[0]))
+				for i in range(nowners)]
+
+	def __len__(self):
+		return self._count
+
+	def _string(self, offset):
+		start = self._strings + offset
+		return self._buf[start:self._buf.find(b'\0', start)]
+
+	def _entry(self, i):
+		offset, owner = ENTRY.unpack_from(self._buf, HEADER.size + i * ENTRY.size)
+		return self._string(offset), owner
+
+	def _first(self, key):
+		"The first entry whose path is not lower than key"
+		lo, hi = 0, self._count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self._entry(mid)[0] < key:
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo
+
+	def owners(self, path):
+		"The packages owning path"
+		key = _encode(path)
+		result = []
+		for i in range(self._first(key), self._count):
+			p, owner = self._entry(i)
+			if p != key:
+				break
+			result.append(self._owners[owner])
+		return result
+
+	def with_prefix(self, prefix):
+		"Yields the (path, owner) pairs whose path starts with prefix"
+		key = _encode(prefix)
+		for i in range(self._first(key), self._count):
+			p, owner = self._entry(i)
+			if not p.startswith(key):
+				break
+			yield _decode(p), self._owners[owner]
+
+def build_index(packages, fingerprint):
+	"Returns the contents of the index of the files of packages"
+	owners = []
+	pairs = []
+	for pkg in packages:
+		for fname, fsize, fmode in pkg.files:
+			pairs.append((_encode(fname), len(owners)))
+		owners.append(pkg.name)
+	pairs.sort()
+
+	strings = bytearray()
+	offsets = {}
+	def add(s):
+		if s not in offsets:
+			offsets[s] = len(strings)
+			strings.extend(s + b'\0')
+		return offsets[s]
+
+	entries = b''.join(ENTRY.pack(add(p), owner) for p, owner in pairs)
+	owner_offsets = b''.join(OFFSET.pack(add(_encode(o))) for o in owners)
+	return b''.join([HEADER.pack(MAGIC, fingerprint, len(pairs), len(owners)),
+		entries, owner_offsets, bytes(strings)])
+
+def local_db_fingerprint(dbpath):
+	"""
+	A digest of the modification times of the local database and of its
+	package directories, None if it cannot be read
+	"""
+	local = os.path.join(dbpath, 'local')
+	h = hashlib.sha256()
+	try:
+		h.update(b'%d\0' % os.stat(local).st_mtime_ns)
+		for entry in sorted(os.scandir(local), key = lambda e: e.name):
+			h.update(b'%s %d\0' % (_encode(entry.name), entry.stat().st_mtime_ns))
+	except OSError:
+		return None
+	return h.digest()
+
+def index_path(dbpath):
+	name = hashlib.sha256(_encode(os.path.abspath(dbpath))).hexdigest()[:16]
+	return os.path.join(Namcap.util.cache_dir(), 'files-%s.idx' % name)
+
+def load_index(dbpath, fingerprint):
+	"Maps the saved index of dbpath if it is up to date, rebuilds it otherwise"
+	path = index_path(dbpath)
+	if fingerprint is not None:
+		try:
+			with open(path, 'rb') as f:
+				index = FileIndex(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+			if index.fingerprint == fingerprint:
+				return index
+		except (OSError, ValueError, struct.error):
+			pass
+
+	with Namcap.package.alpm_lock:
+		data = build_index(Namcap.package.get_installed_packages(),
+				fingerprint or bytes(32))
+	if fingerprint is not None:
+		# replace the saved index atomically, other namcap processes may
+		# be reading it
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok = True)
+			with tempfile.NamedTemporaryFile(dir = os.path.dirname(path),
+					delete = False) as f:
+				f.write(data)
+			os.replace(f.name, path)
+		except OSError:
+			pass
+	return FileIndex(data)
+
+_index = None
+_lock = threading.Lock()
+
+def local_file_index():
+	"The index of the files of installed packages, shared by all rules"
+	global _index
+	dbpath = Namcap.package.get_dbpath()
+	fingerprint = local_db_fingerprint(dbpath)
+	with _lock:
+		if _index is None or _index.fingerprint != (fingerprint or bytes(32)):
+			_index = load_index(dbpath, fingerprint)
+		return _index
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Reuse of the analysis of members unchanged since the last build
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+What the rules derive from the contents of a member (its ELF headers,
+dynamic symbols, magic bytes or shebang, see MemberData.cache) only
+depends on those contents. It is saved for every package checked, by
+the sha256 digests listed in .MTREE. When the next build of the package
+is checked, the members whose digest did not change get those facts
+back, and are not read from the archive unless a rule needs more.
+"""
+
+import ast
+import os
+import tempfile
+
+import Namcap.elf
+import Namcap.util
+import Namcap.version
+
+# classes of the facts that are saved, which only hold literals
+STORED_CLASSES = dict((cls.__name__, cls)
+		for cls in (Namcap.elf.ELFSummary, Namcap.elf.DynamicSymbols))
+
+# other facts are only saved if they are one of these
+LITERAL_TYPES = (type(None), bool, int, float, str, bytes)
+
+def storable(value):
+	"Tells whether a fact can be saved"
+	return (type(value).__name__ in STORED_CLASSES
+			or isinstance(value, LITERAL_TYPES))
+
+def encode(value):
+	"A literal representing a fact"
+	if type(value).__name__ in STORED_CLASSES:
+		return ('object', type(value).__name__,
+				dict((slot, getattr(value, slot)) for slot in value.__slots__))
+	return ('value', value)
+
+def decode(literal):
+	"The fact represented by the result of encode()"
+	if literal[0] == 'object':
+		obj = STORED_CLASSES[literal[1]].__new__(STORED_CLASSES[literal[1]])
+		for slot, value in literal[2].items():
+			setattr(obj, slot, value)
+		return obj
+	return literal[1]
+
+def mtree_digests(mtree):
+	"""
+	Returns { member name => (sha256 digest, size) } from a
+	Namcap.mtree.Mtree, which may be None
+	"""
+	if mtree is None:
+		return {}
+	return dict((entry.name, (entry.sha256digest, entry.size))
+			for entry in mtree
+			# only regular files have a digest
+			if entry.sha256digest is not None and entry.size is not None)
+
+class MemberFacts(object):
+	"""
+	The facts known about the members of a package: those of its
+	previous build, by (digest, size), and those found while checking it
+	"""
+	def __init__(self, digests, previous = None):
+		self.digests = digests
+		self.previous = previous or {}
+		self.current = {}
+
+	def _key(self, entry):
+		key = self.digests.get(entry.name)
+		if key is None or key[1] != entry.size:
+			return None
+		return key
+
+	def known(self, entry):
+		"The facts about a member saved by the previous build, if any"
+		key = self._key(entry)
+		if key is None:
+			return {}
+		return self.previous.get(key, {})
+
+	def record(self, entry, facts):
+		"Keeps what the rules derived from the contents of a member"
+		key = self._key(entry)
+		if key is not None and facts:
+			self.current[key] = dict(facts)
+
+class FactStore(object):
+	"The facts of the last build of each package, one file per package"
+	def __init__(self, directory = None):
+		if directory is None:
+			directory = os.path.join(Namcap.util.cache_dir(), 'members')
+		self.directory = directory
+
+	def _path(self, pkgname):
+		# the name comes from the package, keep it in the directory
+		return os.path.join(self.directory, pkgname.replace('/', '_') + '.facts')
+
+	def load(self, pkgname):
+		"Returns the facts saved for pkgname, by (digest, size)"
+		try:
+			with open(self._path(pkgname)) as f:
+				version, entries = ast.literal_eval(f.read())
+			if version != Namcap.version.get_version():
+				return {}
+			return dict((key, dict((name, decode(value))
+				for name, value in facts.items()))
+				for key, facts in entries.items())
+		except (OSError, ValueError, SyntaxError, TypeError, KeyError,
+				IndexError, AttributeError, MemoryError, RecursionError):
+			return {}
+
+	def save(self, pkgname, facts):
+		"Replaces the facts saved for pkgname"
+		entries = {}
+		for key, member_facts in facts.items():
+			entries[key] = dict((name, encode(value))
+					for name, value in member_facts.items() if storable(value))
+		path = self._path(pkgname)
+		try:
+			os.makedirs(self.directory, exist_ok = True)
+			with tempfile.NamedTemporaryFile('w', dir = self.directory,
+					delete = False) as f:
+				f.write(repr((Namcap.version.get_version(), entries)))
+			os.replace(f.name, path)
+		except OSError:
+			pass
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Reader for the dynamic linker cache
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Reads the binary /etc/ld.so.cache written by ldconfig into a dictionary
+{ architecture => { soname => path } }, as `ldconfig -p` would print it.
+"""
+
+import os
+import struct
+import threading
+
+import Namcap.profile
+
+LD_SO_CACHE = '/etc/ld.so.cache'
+
+OLD_MAGIC = b'ld.so-1.7.0'
+NEW_MAGIC = b'glibc-ld.so.cache1.1'
+# magic, number of libraries
+OLD_HEADER = struct.Struct('=11sxI')
+# flags, key, value
+OLD_ENTRY = struct.Struct('=iII')
+# magic, number of libraries, length of strings, flags, extension offset
+NEW_HEADER = struct.Struct('=20sIIB3xI12x')
+# flags, key, value, osversion, hwcap
+NEW_ENTRY = struct.Struct('=iIIIQ')
+
+FLAG_TYPE_MASK = 0x00ff
+FLAG_ELF_TYPES = (1, 2, 3)
+FLAG_ARCH_MASK = 0xff00
+
+# architecture bits of the entry flags, see sysdeps/generic/ldconfig.h
+# entries without any are the 32-bit libraries of x86 hosts
+CACHE_ARCHITECTURES = {
+	0x0000: 'i686',
+	0x0100: 'sparc64',
+	0x0200: 'ia64',
+	0x0300: 'x86-64',
+	0x0400: 's390x',
+	0x0500: 'ppc64',
+	0x0600: 'mips64-n32',
+	0x0700: 'mips64',
+	0x0800: 'x32',
+	0x0900: 'armhf',
+	0x0a00: 'aarch64',
+	0x0b00: 'armsf',
+	0x0c00: 'mips-nan2008',
+	0x0d00: 'mips64-n32-nan2008',
+	0x0e00: 'mips64-nan2008',
+	0x0f00: 'riscv-soft',
+	0x1000: 'riscv',
+	0x1100: 'loongarch-soft',
+	0x1200: 'loongarch',
+}
+
+# (e_machine, elfclass) of ELF files => their architecture in the cache
+ELF_ARCHITECTURES = {
+	('EM_386', 32): 'i686',
+	('EM_X86_64', 64): 'x86-64',
+	('EM_X86_64', 32): 'x32',
+	('EM_AARCH64', 64): 'aarch64',
+	('EM_ARM', 32): 'armhf',
+	('EM_PPC64', 64): 'ppc64',
+	('EM_S390', 64): 's390x',
+	('EM_SPARCV9', 64): 'sparc64',
+	('EM_IA_64', 64): 'ia64',
+	('EM_RISCV', 32): 'riscv',
+	('EM_RISCV', 64): 'riscv',
+	('EM_LOONGARCH', 64): 'loongarch',
+}
+
+def elf_architecture(elfclass, e_machine):
+	"The architecture of the cache entries usable by an ELF file"
+	try:
+		return ELF_ARCHITECTURES[(e_machine, elfclass)]
+	except KeyError:
+		return {32: 'i686', 64: 'x86-64'}[elfclass]
+
+def _string(data, offset):
+	return data[offset:data.index(b'\0', offset)].decode('utf-8', 'surrogateescape')
+
+def parse_ld_cache(data):
+	"""
+	Parses the contents of a ld.so.cache file. Like the dynamic linker, the
+	first entry for a soname wins, libraries for optional hardware
+	capabilities only being used when there is nothing else.
+	"""
+	start = data.find(NEW_MAGIC)
+	if start >= 0:
+		magic, nlibs, len_strings, flags, ext = NEW_HEADER.unpack_from(data, start)
+		entries = ((NEW_ENTRY.unpack_from(data, start + NEW_HEADER.size + i * NEW_ENTRY.size))
+				for i in range(nlibs))
+		strings = start
+	elif data.startswith(OLD_MAGIC):
+		magic, nlibs = OLD_HEADER.unpack_from(data)
+		entries = ((OLD_ENTRY.unpack_from(data, OLD_HEADER.size + i * OLD_ENTRY.size) + (0, 0))
+				for i in range(nlibs))
+		strings = OLD_HEADER.size + nlibs * OLD_ENTRY.size
+	else:
+		raise ValueError("not a ld.so.cache file")
+
+	libraries = {}
+	hwcap_libraries = {}
+	for flags, key, value, osversion, hwcap in entries:
+		if flags & FLAG_TYPE_MASK not in FLAG_ELF_TYPES:
+			continue
+		architecture = CACHE_ARCHITECTURES.get(flags & FLAG_ARCH_MASK)
+		if architecture is None:
+			continue
+		target = hwcap_libraries if hwcap else libraries
+		target.setdefault(architecture, {}).setdefault(
+				_string(data, strings + key), _string(data, strings + value))
+	for architecture, libs in hwcap_libraries.items():
+		known = libraries.setdefault(architecture, {})
+		for soname, path in libs.items():
+			known.setdefault(soname, path)
+	return libraries
+
+_cache = {}
+_lock = threading.Lock()
+
+def load_ld_cache(path = LD_SO_CACHE):
+	"""
+	Returns the parsed ld.so.cache, which is only read again when its
+	modification time changes. A missing or unreadable cache is empty.
+	"""
+	try:
+		mtime = os.stat(path).st_mtime_ns
+	except OSError:
+		return {}
+	with _lock:
+		cached = _cache.get(path)
+		if cached is None or cached[0] != mtime:
+			try:
+				with Namcap.profile.stage('ld.so.cache'), open(path, 'rb') as f:
+					libraries = parse_ld_cache(f.read())
+			except (OSError, ValueError, struct.error):
+				libraries = {}
+			cached = _cache[path] = (mtime, libraries)
+		return cached[1]
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Checks of packages needing only their .PKGINFO and .MTREE
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+makepkg puts .PKGINFO and .MTREE at the front of packages, and .MTREE
+describes every member of the archive. Rules that never look at the
+contents of members (metadata_only) can be run on members built from
+the .MTREE records, the rest of the archive not even being decompressed.
+"""
+
+import tarfile
+
+import Namcap.archive
+import Namcap.mtree
+import Namcap.package
+from Namcap.ruleclass import PkgInfoRule, TarballRule
+
+MTREE_TYPES = {
+	'file': tarfile.REGTYPE,
+	'dir': tarfile.DIRTYPE,
+	'link': tarfile.SYMTYPE,
+	'char': tarfile.CHRTYPE,
+	'block': tarfile.BLKTYPE,
+	'fifo': tarfile.FIFOTYPE,
+}
+
+def metadata_capable(rule):
+	"""
+	Tells whether a rule, or rule class, can be run without the contents
+	of the members
+	"""
+	cls = rule if isinstance(rule, type) else type(rule)
+	if issubclass(cls, PkgInfoRule):
+		return True
+	return (issubclass(cls, TarballRule) and cls.metadata_only
+			and cls.analyze is TarballRule.analyze and not cls.needs_content)
+
+def mtree_member(mtree_entry):
+	"A TarInfo describing a Namcap.mtree.MtreeEntry, None if there is none"
+	mtree_type = mtree_entry.type or 'file'
+	name = mtree_entry.name
+	if mtree_type not in MTREE_TYPES or not name or name == '.':
+		return None
+	entry = tarfile.TarInfo(name)
+	entry.type = MTREE_TYPES[mtree_type]
+	entry.mode = 0o644 if mtree_entry.mode is None else mtree_entry.mode
+	entry.uid = mtree_entry.uid or 0
+	entry.gid = mtree_entry.gid or 0
+	entry.uname = mtree_entry.uname
+	if entry.uname is None:
+		entry.uname = 'root' if entry.uid == 0 else ''
+	entry.gname = mtree_entry.gname
+	if entry.gname is None:
+		entry.gname = 'root' if entry.gid == 0 else ''
+	entry.mtime = int(mtree_entry.time or 0)
+	if entry.type == tarfile.REGTYPE:
+		entry.size = mtree_entry.size or 0
+	if entry.type == tarfile.SYMTYPE:
+		entry.linkname = mtree_entry.link or ''
+	return entry
+
+def mtree_members(mtree, skip = ()):
+	"""
+	Returns the TarInfo objects described by a Namcap.mtree.Mtree, but
+	those whose name is in skip
+	"""
+	members = []
+	for mtree_entry in mtree:
+		entry = mtree_member(mtree_entry)
+		if entry is not None and entry.name not in skip:
+			members.append(entry)
+	return members
+
+def load_metadata(path):
+	"""
+	Reads the dot files at the front of a package archive. Returns the
+	PacmanPackage of its .PKGINFO and the list of its members, the dot
+	files themselves followed by those described by its .MTREE, or None
+	if the archive does not start with both.
+	"""
+	try:
+		tar = Namcap.archive.open_stream(path)
+	except (OSError, tarfile.TarError):
+		return None
+	if tar is None:
+		return None
+	dotfiles = []
+	contents = {}
+	try:
+		for entry in tar:
+			if not entry.name.startswith('.'):
+				break
+			dotfiles.append(entry)
+			if entry.name in ('.PKGINFO', '.MTREE'):
+				contents[entry.name] = tar.extractfile(entry).read()
+	except (tarfile.TarError,) + Namcap.archive.DECOMPRESSION_ERRORS:
+		return None
+	finally:
+		tar.close()
+	if '.PKGINFO' not in contents or '.MTREE' not in contents:
+		return None
+
+	names = set(entry.name for entry in dotfiles)
+	mtree = Namcap.mtree.Mtree(contents['.MTREE'])
+	if not mtree.entries:
+		return None
+	pkginfo = Namcap.package.load_from_pkginfo(
+			contents['.PKGINFO'].decode('utf-8', 'ignore'), '.INSTALL' in names)
+	pkginfo.mtree = mtree
+	return pkginfo, dotfiles + mtree_members(mtree, names)
+
+# vim: set ts=4 sw=4 noet:
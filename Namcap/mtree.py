@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Parsing of the .MTREE of packages
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+The .MTREE of a package is decompressed and parsed line by line, into
+MtreeEntry objects holding the keywords makepkg writes. Each package has
+a single Mtree, attached to its PacmanPackage by load_from_tarfile(), and
+only parsed once some code asks for its entries.
+"""
+
+import io
+import re
+import threading
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+
+def _string(value):
+	return value.decode('utf-8', 'surrogateescape')
+
+ESCAPES = {b'\\': b'\\', b'a': b'\a', b'b': b'\b', b'f': b'\f', b'n': b'\n',
+		b'r': b'\r', b's': b' ', b't': b'\t', b'v': b'\v'}
+ESCAPE_RE = re.compile(rb'\\([0-7]{3}|.)', re.DOTALL)
+
+def _escape(m):
+	code = m.group(1)
+	if len(code) == 3:
+		return bytes([int(code, 8) & 0xff])
+	return ESCAPES.get(code, code)
+
+def unescape(value):
+	"Decodes a path of a .MTREE, with its backslash escapes (\\ooo...)"
+	if b'\\' in value:
+		value = ESCAPE_RE.sub(_escape, value)
+	# like tarfile
+	return value.decode('utf-8', 'surrogateescape')
+
+# keyword => (attribute, conversion)
+KEYWORDS = {
+	b'type': ('type', _string),
+	b'mode': ('mode', lambda value: int(value, 8)),
+	b'uid': ('uid', int),
+	b'gid': ('gid', int),
+	b'uname': ('uname', _string),
+	b'gname': ('gname', _string),
+	b'time': ('time', float),
+	b'size': ('size', int),
+	b'link': ('link', unescape),
+	b'md5digest': ('md5digest', _string),
+	b'md5': ('md5digest', _string),
+	b'sha256digest': ('sha256digest', _string),
+	b'sha256': ('sha256digest', _string),
+}
+ATTRIBUTES = ('type', 'mode', 'uid', 'gid', 'uname', 'gname', 'time', 'size',
+		'link', 'md5digest', 'sha256digest')
+
+class MtreeEntry(object):
+	"""
+	A path of a .MTREE and its keywords, None when they are not given.
+	The path is as written, e.g. ./usr/bin/foo, but for the escapes.
+
+	Most users only look at a few entries, so the keywords of an entry
+	are only converted once one of its attributes is asked for.
+	"""
+	__slots__ = ('path', '_keywords', '_defaults') + ATTRIBUTES
+
+	def __init__(self, path, keywords, defaults):
+		self.path = path
+		self._keywords = keywords
+		self._defaults = defaults
+
+	def __getattr__(self, attribute):
+		# only called for the attributes that are not set yet
+		if attribute not in ATTRIBUTES or self._keywords is None:
+			raise AttributeError(attribute)
+		values = _keywords(self._keywords.split(), dict(self._defaults))
+		for name in ATTRIBUTES:
+			setattr(self, name, values.get(name))
+		self._keywords = self._defaults = None
+		return getattr(self, attribute)
+
+	@property
+	def name(self):
+		"The path as a tarball member name, e.g. usr/bin/foo"
+		if self.path.startswith('./'):
+			return self.path[2:]
+		return self.path
+
+	def __repr__(self):
+		return 'MtreeEntry(%r)' % self.path
+
+def _keywords(words, values):
+	"""
+	Adds the converted values of keyword=value words to the values dict,
+	invalid ones left out
+	"""
+	for word in words:
+		keyword, sep, value = word.partition(b'=')
+		conversion = KEYWORDS.get(keyword)
+		if conversion is not None:
+			try:
+				values[conversion[0]] = conversion[1](value)
+			except ValueError:
+				pass
+	return values
+
+def _lines(fileobj):
+	"""
+	Yields the logical lines of a gzipped .MTREE file object, joining
+	continued lines, as it decompresses it
+	"""
+	decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+	pending = b''
+	while True:
+		chunk = fileobj.read(CHUNK_SIZE)
+		if not chunk:
+			break
+		while chunk:
+			pending += decompressor.decompress(chunk)
+			# concatenated gzip members
+			chunk = decompressor.unused_data
+			if chunk:
+				decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+		lines = pending.split(b'\n')
+		pending = lines.pop()
+		yield from lines
+	if not decompressor.eof:
+		raise EOFError("truncated .MTREE")
+	if pending:
+		yield pending
+
+def _logical_lines(lines):
+	continued = b''
+	for line in lines:
+		if line.endswith(b'\\') and not line.endswith(b'\\\\'):
+			continued += line[:-1]
+			continue
+		yield continued + line
+		continued = b''
+	if continued:
+		yield continued
+
+def parse(fileobj):
+	"""
+	Yields the MtreeEntry objects of a gzipped .MTREE file object,
+	decompressing it as it goes. Raises OSError, EOFError or zlib.error
+	on invalid gzip data.
+	"""
+	defaults = {}
+	for line in _logical_lines(_lines(fileobj)):
+		head, sep, keywords = line.lstrip().partition(b' ')
+		if not head or head.startswith(b'#'):
+			continue
+		if not head.startswith(b'/'):
+			yield MtreeEntry(unescape(head), keywords, defaults)
+			continue
+		# entries keep the defaults they were given
+		defaults = dict(defaults)
+		if head == b'/set':
+			_keywords(keywords.split(), defaults)
+		elif head == b'/unset':
+			for keyword in keywords.split():
+				if keyword == b'all':
+					defaults.clear()
+				elif keyword in KEYWORDS:
+					defaults.pop(KEYWORDS[keyword][0], None)
+
+class Mtree(object):
+	"The .MTREE of a package, parsed on first use"
+	def __init__(self, data):
+		self._data = data
+		self._entries = None
+		self._lock = threading.Lock()
+
+	@property
+	def entries(self):
+		"""
+		The list of MtreeEntry objects of the .MTREE, empty if it cannot
+		be parsed
+		"""
+		with self._lock:
+			if self._entries is None:
+				try:
+					self._entries = list(parse(io.BytesIO(self._data)))
+				except (OSError, EOFError, zlib.error):
+					self._entries = []
+				self._data = None
+			return self._entries
+
+	def __iter__(self):
+		return iter(self.entries)
+
+# vim: set ts=4 sw=4 noet:
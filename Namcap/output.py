@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Structured output of the messages
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+With --format=jsonl, each message is written as a JSON object on a line
+of its own, holding the package, the rule, the severity, the tag and its
+arguments, rather than the text of the tags file.
+"""
+
+import json
+import sys
+
+FORMATS = ('text', 'jsonl')
+
+SEVERITIES = {'E': 'error', 'W': 'warning', 'I': 'info'}
+
+BUFFER_SIZE = 64 * 1024
+
+def message_record(package, rule, key, msg):
+	"""
+	The record of a message (tag, data) of a rule, key being E, W or I.
+	The tag is its first word, e.g. dangling-symlink for
+	"dangling-symlink %s points to %s".
+	"""
+	tag, data = msg
+	if isinstance(data, (tuple, list)):
+		args = list(data)
+	else:
+		args = [data]
+	return {
+		'package': package,
+		'rule': rule,
+		'severity': SEVERITIES[key],
+		'tag': tag.split(' ', 1)[0],
+		'args': args,
+	}
+
+def error_record(package, tag):
+	"""
+	The record of an error keeping a package from being checked, e.g.
+	invalid-package, which no rule reports
+	"""
+	return {
+		'package': package,
+		'rule': None,
+		'severity': 'error',
+		'tag': tag,
+		'args': [],
+	}
+
+class JsonLinesWriter(object):
+	"""
+	Writes records as JSON Lines, buffering them until buffer_size
+	characters are waiting or until flush(). Without a stream, the
+	sys.stdout of the time of the flush is written to.
+	"""
+	def __init__(self, stream = None, buffer_size = BUFFER_SIZE):
+		self.stream = stream
+		self.buffer_size = buffer_size
+		# arguments the rules did not make strings still get written
+		self._encoder = json.JSONEncoder(separators = (',', ':'), default = str)
+		self._lines = []
+		self._size = 0
+
+	def write(self, record):
+		line = self._encoder.encode(record) + '\n'
+		self._lines.append(line)
+		self._size += len(line)
+		if self._size >= self.buffer_size:
+			self.flush()
+
+	def flush(self):
+		if not self._lines:
+			return
+		stream = self.stream or sys.stdout
+		stream.write(''.join(self._lines))
+		stream.flush()
+		self._lines = []
+		self._size = 0
+
+# vim: set ts=4 sw=4 noet:
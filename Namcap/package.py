@@ -21,18 +21,54 @@
 
 import os
 import sys
-import subprocess
 import re
 import collections
-import gzip
-
-import pyalpm
-_pyalpm_version_tuple = tuple(int(n) for n in pyalpm.version().split('.'))
-if _pyalpm_version_tuple < (0, 5):
-	raise DeprecationWarning("pyalpm versions <0.5 are no longer supported")
-
-import pycman.config
-pyalpm_handle = pycman.config.init_with_config('/etc/pacman.conf')
+import threading
+
+import Namcap.mtree
+import Namcap.pkgbuild
+
+_pyalpm_handle = None
+# libalpm is not documented as thread-safe, and rules run on several
+# threads: pyalpm is only called with this lock held, including to read
+# the attributes of its packages, which libalpm loads lazily
+alpm_lock = threading.RLock()
+
+def get_handle():
+	"Returns the pyalpm handle, pyalpm being only set up on first use."
+	global _pyalpm_handle
+	with alpm_lock:
+		if _pyalpm_handle is None:
+			import pyalpm
+			_pyalpm_version_tuple = tuple(int(n) for n in pyalpm.version().split('.'))
+			if _pyalpm_version_tuple < (0, 5):
+				raise DeprecationWarning("pyalpm versions <0.5 are no longer supported")
+
+			import pycman.config
+			_pyalpm_handle = pycman.config.init_with_config('/etc/pacman.conf')
+		return _pyalpm_handle
+
+def get_dbpath():
+	"The database directory of the pyalpm handle"
+	with alpm_lock:
+		return get_handle().dbpath
+
+def reset_handle():
+	"""
+	Drops the pyalpm handle and what was looked up with it, so that a
+	long-running process sees the databases as they are now
+	"""
+	global _pyalpm_handle
+	with alpm_lock:
+		_pyalpm_handle = None
+		_syncdbs.clear()
+		_provides_indexes.clear()
+
+def __getattr__(name):
+	# pyalpm_handle used to be created when importing this module
+	if name == 'pyalpm_handle':
+		return get_handle()
+	raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 DEPENDS_RE = re.compile("([^<>=:]+)([<>]?=.*)?(: .*)?")
 
@@ -80,6 +116,8 @@ class PacmanPackage(collections.MutableMapping):
 		self.is_split = False
 		# a dictionary { package => [reasons why it is needed] }
 		self.detected_deps = collections.defaultdict(list)
+		# the Namcap.mtree.Mtree of a package tarball
+		self.mtree = None
 		self._data = {}
 
 		# Init from a dictionary
@@ -183,17 +221,9 @@ class PacmanPackage(collections.MutableMapping):
 
 def load_from_pkgbuild(path):
 	# Load all the data like we normally would
-	workingdir = os.path.dirname(path)
-	if workingdir == '':
-		workingdir = None
-	filename = os.path.basename(path)
-	process = subprocess.Popen(['parsepkgbuild', filename],
-			stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=workingdir)
-	out, err = process.communicate()
-	out = out.decode('utf-8', 'ignore')
-	err = err.decode('utf-8', 'ignore')
+	returncode, out, err = Namcap.pkgbuild.parse_pkgbuild(path)
 	# this means parsepkgbuild returned an error, so we are not valid
-	if process.returncode > 0:
+	if returncode > 0:
 		if out:
 			print("Error:", out)
 		if err:
@@ -213,80 +243,228 @@ def load_from_alpm(pmpkg):
 			'depends', 'desc', 'files', 'groups',
 			'has_scriptlet', 'size', 'licenses',
 			'optdepends', 'packager', 'provides', 'replaces']
-	values = dict((v, getattr(pmpkg, v)) for v in variables)
+	with alpm_lock:
+		values = dict((v, getattr(pmpkg, v)) for v in variables)
 
-	# arch is a list for PKGBUILDs, we do the same for tarball packages
-	values['arch'] = [pmpkg.arch]
-	# also drop md5sums for backed up files
-	values['backup'] = [name for (name, md5) in pmpkg.backup]
+		# arch is a list for PKGBUILDs, we do the same for tarball packages
+		values['arch'] = [pmpkg.arch]
+		# also drop md5sums for backed up files
+		values['backup'] = [name for (name, md5) in pmpkg.backup]
 
 	return PacmanPackage(data = values)
 
 def load_from_tarball(path):
-	try:
-		p = pyalpm_handle.load_pkg(path)
-	except pyalpm.error:
-		return None
+	handle = get_handle()
+	import pyalpm
+	with alpm_lock:
+		try:
+			p = handle.load_pkg(path)
+		except pyalpm.error:
+			return None
 
-	return load_from_alpm(p)
+		return load_from_alpm(p)
 
-def load_from_db(pkgname, dbname = None):
-	if dbname is None:
-		# default is loading local database
-		db = pyalpm_handle.get_localdb()
-	else:
-		db = pyalpm_handle.register_syncdb(dbname, 0)
-	p = db.get_pkg(pkgname)
+def load_from_pkginfo(pkginfo, has_scriptlet = False):
+	"""
+	Builds a package from the contents of a .PKGINFO file, with the same
+	variables as load_from_alpm() apart from the file list
+	"""
+	values = collections.defaultdict(list)
+	for line in pkginfo.splitlines():
+		m = re.match('(.*) = (.*)', line)
+		if m is not None and m.group(2) != '':
+			values[m.group(1)].append(m.group(2))
+
+	def first(key):
+		return values[key][0] if values[key] else None
+
+	data = {
+		'name': first('pkgname'),
+		'version': first('pkgver'),
+		'desc': first('pkgdesc'),
+		'url': first('url'),
+		'packager': first('packager'),
+		'size': int(first('size') or 0),
+		'arch': [first('arch')],
+		'has_scriptlet': has_scriptlet,
+	}
+	for var, key in [('conflicts', 'conflict'), ('depends', 'depend'),
+			('groups', 'group'), ('licenses', 'license'),
+			('optdepends', 'optdepend'), ('provides', 'provides'),
+			('replaces', 'replaces'), ('backup', 'backup')]:
+		data[var] = values[key]
+	return PacmanPackage(data = data)
+
+def load_from_tarfile(tar):
+	"""
+	Loads the metadata of a package from an already opened tarball.
 
-	if p is None:
-		p = lookup_provider(pkgname, db)
-	if p is not None:
-		p = load_from_alpm(p)
-	return p
+	makepkg stores the dot files at the start of the archive, so only those
+	are read and the rules can go on with the same archive afterwards.
+	Returns None if the archive has no .PKGINFO. The .MTREE is kept,
+	unparsed, as the mtree attribute of the package.
+	"""
+	pkginfo = None
+	mtree = None
+	dotfiles = set()
+	for entry in tar:
+		if not entry.name.startswith('.'):
+			break
+		dotfiles.add(entry.name)
+		if entry.name == '.PKGINFO':
+			pkginfo = tar.extractfile(entry).read()
+		elif entry.name == '.MTREE':
+			mtree = tar.extractfile(entry).read()
+	if pkginfo is None:
+		# not built by makepkg, look through the whole archive
+		try:
+			pkginfo = tar.extractfile('.PKGINFO').read()
+		except KeyError:
+			return None
+		dotfiles = set(tar.getnames())
+		if '.MTREE' in dotfiles:
+			mtree = tar.extractfile('.MTREE').read()
+	pkginfo = pkginfo.decode('utf-8', 'ignore')
+	pkg = load_from_pkginfo(pkginfo, '.INSTALL' in dotfiles)
+	if mtree is not None:
+		pkg.mtree = Namcap.mtree.Mtree(mtree)
+	return pkg
+
+TESTING_DBS = ('testing', 'multilib-testing', 'community-testing')
+
+_syncdbs = {}
+
+def get_syncdb(dbname):
+	"Returns the sync database dbname, registering it once per process."
+	with alpm_lock:
+		db = _syncdbs.get(dbname)
+		if db is None:
+			for d in get_handle().get_syncdbs():
+				if d.name == dbname:
+					db = d
+					break
+			else:
+				db = get_handle().register_syncdb(dbname, 0)
+			_syncdbs[dbname] = db
+		return db
+
+def get_testing_dbs():
+	"The testing databases configured in pacman.conf"
+	with alpm_lock:
+		return [get_syncdb(db.name) for db in get_handle().get_syncdbs()
+				if db.name in TESTING_DBS]
+
+def find_db_package(pkgname, dbname = None):
+	"""
+	Finds the pyalpm package named or providing pkgname, None if not found.
+	Its attributes are to be read with alpm_lock held.
+	"""
+	with alpm_lock:
+		if dbname is None:
+			# default is loading local database
+			db = get_handle().get_localdb()
+		else:
+			db = get_syncdb(dbname)
+		p = db.get_pkg(pkgname)
+
+		if p is None:
+			p = lookup_provider(pkgname, db)
+		return p
+
+def load_from_db(pkgname, dbname = None):
+	with alpm_lock:
+		p = find_db_package(pkgname, dbname)
+		if p is not None:
+			p = load_from_alpm(p)
+		return p
 
 def load_testing_package(pkgname):
 	"Loads the testing version of a package, None if not found."
-	testing_dbs = [db
-			for db in pyalpm_handle.get_syncdbs()
-			if db.name in ('testing', 'multilib-testing', 'community-testing')]
-	for db in testing_dbs:
-		p = db.get_pkg(pkgname)
-		if p is not None:
-			return load_from_alpm(p)
+	with alpm_lock:
+		for db in get_testing_dbs():
+			p = db.get_pkg(pkgname)
+			if p is not None:
+				return load_from_alpm(p)
+
+def get_versions(names, dbs):
+	"""
+	Returns a dictionary { name => version } of the packages named in
+	names found in a list of databases, the first database having priority
+	"""
+	versions = {}
+	with alpm_lock:
+		for db in dbs:
+			for name in names:
+				if name not in versions:
+					p = db.get_pkg(name)
+					if p is not None:
+						versions[name] = p.version
+	return versions
+
+def testing_releases(names):
+	"""
+	Returns the names, in order, whose installed package is the version
+	found in a testing database
+	"""
+	testing = get_versions(names, get_testing_dbs())
+	releases = []
+	with alpm_lock:
+		for name in names:
+			if name not in testing:
+				continue
+			p = find_db_package(name)
+			if p is not None and p.version == testing[name]:
+				releases.append(name)
+	return releases
 
 def get_installed_packages():
-	return pyalpm_handle.get_localdb().pkgcache
+	"The installed pyalpm packages, to be read with alpm_lock held"
+	with alpm_lock:
+		return get_handle().get_localdb().pkgcache
+
+def db_state(db):
+	"A value changing whenever the packages of a database change"
+	with alpm_lock:
+		dbpath = get_dbpath()
+		name = db.name
+	if name == 'local':
+		path = os.path.join(dbpath, 'local')
+	else:
+		path = os.path.join(dbpath, 'sync', name + '.db')
+	try:
+		return os.stat(path).st_mtime_ns
+	except OSError:
+		return None
+
+_provides_indexes = {}
+
+def provides_index(db):
+	"""
+	Returns a dictionary { name => [packages providing it] } for a database,
+	versions being stripped from the provides. It is built once per
+	database state.
+	"""
+	state = db_state(db)
+	with alpm_lock:
+		cached = _provides_indexes.get(db.name)
+		if cached is None or cached[0] != state:
+			index = {}
+			for pkg in db.pkgcache:
+				for provide in pkg.provides:
+					try:
+						name = strip_depend_info(provide)
+					except ValueError:
+						continue
+					providers = index.setdefault(name, [])
+					if not providers or providers[-1] is not pkg:
+						providers.append(pkg)
+			cached = _provides_indexes[db.name] = (state, index)
+		return cached[1]
 
 def lookup_provider(pkgname, db):
-	for pkg in db.pkgcache:
-		if pkgname in pkg.provides:
-			return pkg
-
-def mtree_line(line):
-	"returns head, {key:value}"
-	# todo, un-hex the escaped chars
-	head,_,kvs = line.partition(' ')
-	kvs = dict(kv.split('=') for kv in kvs.split(' '))
-	return head, kvs
-
-def load_mtree(tar):
-	"takes a tar object, returns (path, {attributes})"
-	if '.MTREE' not in tar.getnames():
-		raise StopIteration
-	zfile = tar.extractfile('.MTREE')
-	text = gzip.open(zfile).read().decode("utf-8")
-	defaults = {}
-	for line in text.split('\n'):
-		if not line:
-			continue
-		if line.startswith('#'):
-			continue
-		head, kvs = mtree_line(line)
-		if head == '/set':
-			defaults = kvs
-		attr = {}
-		attr.update(defaults)
-		attr.update(kvs)
-		yield head, attr
+	"The first package of db providing pkgname, None if there is none"
+	providers = provides_index(db).get(pkgname)
+	if providers:
+		return providers[0]
 
 # vim: set ts=4 sw=4 noet:
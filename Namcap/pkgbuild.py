@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Evaluation of PKGBUILDs by parsepkgbuild
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+PKGBUILDs are sourced by parsepkgbuild in a restricted bash. Rather than
+starting it for every PKGBUILD, a pool of long-lived workers
+(`parsepkgbuild --worker`) evaluates each one in a fresh subshell. A
+worker is replaced after a number of jobs or as soon as one fails.
+"""
+
+import atexit
+import os
+import re
+import subprocess
+import threading
+
+import Namcap.profile
+import Namcap.staticpkgbuild
+
+# number of PKGBUILDs parsed by a worker before it is replaced
+WORKER_JOBS = 256
+
+class WorkerError(Exception):
+	"The worker died or did not follow the protocol"
+
+def run_parsepkgbuild(directory, filename):
+	"""
+	Parses a PKGBUILD with a new parsepkgbuild process and returns
+	(exit status, output, error output)
+	"""
+	with Namcap.profile.stage('parsepkgbuild', children = True):
+		process = subprocess.Popen(['parsepkgbuild', filename],
+				stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=directory)
+		out, err = process.communicate()
+	return process.returncode, out, err
+
+class Worker(object):
+	"A parsepkgbuild process parsing PKGBUILDs one after another"
+	def __init__(self):
+		self.jobs = 0
+		self.token = os.urandom(16).hex()
+		self._trailer = re.compile(self.token.encode() + rb' (\d+) (\d+)\n')
+		self.process = subprocess.Popen(
+				['parsepkgbuild', '--worker', self.token],
+				stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+				stderr=subprocess.DEVNULL, cwd='/')
+
+	def parse(self, directory, filename):
+		"Same as run_parsepkgbuild(), raises WorkerError if the worker fails"
+		self.jobs += 1
+		request = '%s\n%s\n' % (os.path.abspath(directory), filename)
+		try:
+			self.process.stdin.write(request.encode('utf-8', 'surrogateescape'))
+			self.process.stdin.flush()
+		except OSError as e:
+			raise WorkerError(str(e))
+		out = []
+		while True:
+			line = self.process.stdout.readline()
+			if not line:
+				raise WorkerError("parsepkgbuild worker exited")
+			m = self._trailer.fullmatch(line)
+			if m is not None:
+				break
+			out.append(line)
+		# the output is followed by a newline before the trailer
+		out = b''.join(out)[:-1]
+		err = self.process.stdout.read(int(m.group(2)))
+		if len(err) != int(m.group(2)):
+			raise WorkerError("parsepkgbuild worker exited")
+		return int(m.group(1)), out, err
+
+	def close(self):
+		try:
+			self.process.stdin.close()
+		except OSError:
+			pass
+		try:
+			self.process.wait(timeout = 5)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+			self.process.wait()
+		self.process.stdout.close()
+
+class WorkerPool(object):
+	"""
+	Up to size workers, started on demand. A worker is closed after
+	max_jobs PKGBUILDs, when a PKGBUILD fails to parse or when it dies.
+	"""
+	def __init__(self, size = 1, max_jobs = WORKER_JOBS):
+		self.size = size
+		self.max_jobs = max_jobs
+		self.pid = os.getpid()
+		self._idle = []
+		self._lock = threading.Lock()
+		self._slots = threading.BoundedSemaphore(size)
+
+	def parse(self, directory, filename):
+		"Same as run_parsepkgbuild(), falling back to it if a worker fails"
+		if '\n' in directory or '\n' in filename:
+			return run_parsepkgbuild(directory, filename)
+		with self._slots:
+			with self._lock:
+				worker = self._idle.pop() if self._idle else None
+			try:
+				if worker is None:
+					worker = Worker()
+				# the CPU time of a worker is only known once it exits
+				with Namcap.profile.stage('parsepkgbuild worker'):
+					status, out, err = worker.parse(directory, filename)
+			except (OSError, WorkerError):
+				if worker is not None:
+					worker.close()
+				return run_parsepkgbuild(directory, filename)
+			if status != 0 or worker.jobs >= self.max_jobs:
+				worker.close()
+			else:
+				with self._lock:
+					self._idle.append(worker)
+		return status, out, err
+
+	def close(self):
+		with self._lock:
+			workers, self._idle = self._idle, []
+		for worker in workers:
+			worker.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_size = 1
+_pool_jobs = WORKER_JOBS
+
+def configure(workers = 1, max_jobs = WORKER_JOBS):
+	"Sets the number of workers and of jobs per worker of the pool"
+	global _pool_size, _pool_jobs
+	_pool_size = workers
+	_pool_jobs = max_jobs
+	close_pool()
+
+def get_pool():
+	"""
+	The pool of parsepkgbuild workers of this process, forked processes
+	getting a pool of their own
+	"""
+	global _pool
+	with _pool_lock:
+		if _pool is None or _pool.pid != os.getpid():
+			_pool = WorkerPool(_pool_size, _pool_jobs)
+		return _pool
+
+def close_pool():
+	global _pool
+	with _pool_lock:
+		pool, _pool = _pool, None
+	if pool is not None and pool.pid == os.getpid():
+		pool.close()
+
+atexit.register(close_pool)
+
+def _parse_with_bash(directory, filename):
+	status, out, err = get_pool().parse(directory, filename)
+	return status, out.decode('utf-8', 'ignore')
+
+def parse_pkgbuild(path):
+	"""
+	Evaluates a PKGBUILD and returns (exit status, output, error output)
+	of parsepkgbuild, as strings. Simple PKGBUILDs are evaluated without
+	running bash.
+	"""
+	setvars = Namcap.staticpkgbuild.bash_variables(_parse_with_bash)
+	if setvars is not None:
+		try:
+			out = Namcap.staticpkgbuild.evaluate(path, setvars)
+		except (Namcap.staticpkgbuild.Unsupported, OSError, UnicodeError):
+			pass
+		else:
+			# like the output of bash, decoded ignoring errors
+			out = out.encode('utf-8', 'surrogateescape').decode('utf-8', 'ignore')
+			return 0, out, ''
+	directory = os.path.dirname(path) or '.'
+	status, out, err = get_pool().parse(directory, os.path.basename(path))
+	return status, out.decode('utf-8', 'ignore'), err.decode('utf-8', 'ignore')
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Time spent in each stage of the checks
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Once enable() is called, the wall-clock and CPU time of each stage
+(opening archives, loading the metadata, every rule, the dependency
+analysis, external commands) is added up by stage name.
+
+Rules run on several threads at once, so the CPU time is that of the
+calling thread, plus for external commands that of the child processes
+which exited meanwhile. Nothing is recorded unless profiling is enabled.
+"""
+
+import contextlib
+import functools
+import json
+import resource
+import threading
+import time
+
+# version of the JSON reports
+REPORT_VERSION = 1
+
+# methods of the rules timed by instrument()
+RULE_METHODS = ('analyze', 'prepare', 'analyze_member', 'finalize')
+
+_lock = threading.Lock()
+# stage name => [calls, wall time, CPU time], None when disabled
+_stages = None
+# (stage name, [calls, wall time, CPU time]) of the functions of timed()
+_timers = []
+
+def enable():
+	"Starts recording, forgetting what was recorded before"
+	global _stages, _timers
+	with _lock:
+		_stages = {}
+		_timers = []
+
+def enabled():
+	return _stages is not None
+
+def add(name, calls, wall, cpu):
+	"Adds calls of a stage taking wall and cpu seconds in total"
+	with _lock:
+		if _stages is None:
+			return
+		totals = _stages.setdefault(name, [0, 0.0, 0.0])
+		totals[0] += calls
+		totals[1] += wall
+		totals[2] += cpu
+
+def _children_cpu():
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return usage.ru_utime + usage.ru_stime
+
+@contextlib.contextmanager
+def stage(name, children = False):
+	"""
+	Records the time spent in a with block, including the CPU time of
+	the child processes reaped by then if children is true
+	"""
+	if _stages is None:
+		yield
+		return
+	wall = time.perf_counter()
+	cpu = time.thread_time()
+	if children:
+		cpu -= _children_cpu()
+	try:
+		yield
+	finally:
+		cpu = time.thread_time() - cpu
+		if children:
+			cpu += _children_cpu()
+		add(name, 1, time.perf_counter() - wall, cpu)
+
+def timed(name, function):
+	"function, recording its calls as a stage"
+	if _stages is None:
+		return function
+	# the callbacks of rules are called for every member, each function
+	# adds up its own times without taking the lock
+	totals = [0, 0.0, 0.0]
+	with _lock:
+		_timers.append((name, totals))
+	perf_counter = time.perf_counter
+	thread_time = time.thread_time
+	@functools.wraps(function)
+	def wrapper(*args, **kwargs):
+		wall = perf_counter()
+		cpu = thread_time()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			totals[0] += 1
+			totals[1] += perf_counter() - wall
+			totals[2] += thread_time() - cpu
+	return wrapper
+
+def instrument(rule, name):
+	"""
+	Returns the rule, with the calls of its methods recorded under
+	"rule name" when profiling is enabled
+	"""
+	if _stages is None:
+		return rule
+	for method in RULE_METHODS:
+		if hasattr(rule, method):
+			# instance attributes, the class is left alone
+			setattr(rule, method, timed('rule ' + name, getattr(rule, method)))
+	return rule
+
+def report():
+	"""
+	The recorded times as a JSON-compatible dictionary. Reports of
+	several runs can be added up with merge().
+	"""
+	stages = {}
+	with _lock:
+		items = list((_stages or {}).items()) + _timers
+		for name, (calls, wall, cpu) in items:
+			totals = stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+			totals['calls'] += calls
+			totals['wall'] += wall
+			totals['cpu'] += cpu
+	return {'version': REPORT_VERSION, 'stages': stages}
+
+def merge(other):
+	"Adds the times of a report, e.g. of another process"
+	for name, totals in other['stages'].items():
+		add(name, totals['calls'], totals['wall'], totals['cpu'])
+
+def format_table(report):
+	"The stages of a report as a table, the longest first"
+	stages = sorted(report['stages'].items(),
+			key = lambda item: (-item[1]['wall'], item[0]))
+	width = max([len('stage')] + [len(name) for name, totals in stages])
+	lines = ['%-*s %8s %10s %10s' % (width, 'stage', 'calls', 'wall', 'cpu')]
+	for name, totals in stages:
+		lines.append('%-*s %8d %9.3fs %9.3fs' % (width, name,
+			totals['calls'], totals['wall'], totals['cpu']))
+	return '\n'.join(lines) + '\n'
+
+def write_json(report, fileobj):
+	json.dump(report, fileobj, indent = 1, sort_keys = True)
+	fileobj.write('\n')
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Cache of the results of previous checks
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+The messages namcap printed for a package are saved on disk, keyed by
+everything they depend on: the contents of the package, the namcap
+version, the selected rules, the tags file and the state of the pacman
+databases. Checking the same package again replays them without opening
+the archive. The least recently used results are dropped once the cache
+grows over its size limit.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import tempfile
+
+import Namcap.package
+import Namcap.util
+import Namcap.version
+from Namcap.fileindex import local_db_fingerprint
+
+CACHE_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def file_digest(path):
+	"The sha256 digest of the contents of a file"
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		while True:
+			chunk = f.read(CHUNK_SIZE)
+			if not chunk:
+				break
+			h.update(chunk)
+	return h.hexdigest()
+
+def database_fingerprint():
+	"""
+	A digest of the state of the local and sync databases, None if the
+	local database cannot be read
+	"""
+	dbpath = Namcap.package.get_dbpath()
+	local = local_db_fingerprint(dbpath)
+	if local is None:
+		return None
+	h = hashlib.sha256(local)
+	try:
+		for entry in sorted(os.scandir(os.path.join(dbpath, 'sync')),
+				key = lambda e: e.name):
+			h.update(b'%s %d\0' % (entry.name.encode('utf-8', 'surrogateescape'),
+				entry.stat().st_mtime_ns))
+	except OSError:
+		pass
+	return h.hexdigest()
+
+class ResultCache(object):
+	"""
+	A directory of results, each in a file named after its key. The
+	modification time of a file is the last time it was used.
+	"""
+	def __init__(self, directory = None, max_size = CACHE_SIZE):
+		if directory is None:
+			directory = os.path.join(Namcap.util.cache_dir(), 'results')
+		self.directory = directory
+		self.max_size = max_size
+		self._db_fingerprint = None
+		# estimated size of the cache, only scanned once per process
+		self._size = None
+
+	def key(self, path, rules, tags_file, machine = False):
+		"""
+		The key of the results of the rules on the package at path, None
+		if they cannot be cached. Some messages embed others, already
+		formatted, so the results depend on the tags being machine readable.
+		"""
+		if self._db_fingerprint is None:
+			self._db_fingerprint = database_fingerprint()
+			if self._db_fingerprint is None:
+				return None
+		try:
+			tags = file_digest(tags_file)
+		except OSError:
+			tags = None
+		h = hashlib.sha256()
+		for line in ['namcap %s' % Namcap.version.get_version(),
+				'package %s' % file_digest(path),
+				'rules %s' % ','.join(sorted(rules)),
+				'tags %s %s' % (tags, 'machine' if machine else 'human'),
+				'db %s' % self._db_fingerprint]:
+			h.update(line.encode('utf-8', 'surrogateescape') + b'\n')
+		return h.hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.directory, key[:2], key + '.json')
+
+	def get(self, key):
+		"""
+		Returns the package name and the list of (rule, kind, message)
+		saved under key, None if there are none
+		"""
+		path = self._path(key)
+		try:
+			with open(path) as f:
+				entry = json.load(f)
+			result = (entry['name'], [(rule, kind, ast.literal_eval(msg))
+				for rule, kind, msg in entry['messages']])
+			os.utime(path)
+		except (OSError, ValueError, SyntaxError, KeyError, TypeError):
+			return None
+		return result
+
+	def put(self, key, name, messages):
+		"Saves the package name and the (rule, kind, message) list under key"
+		path = self._path(key)
+		entry = {'name': name,
+			'messages': [(rule, kind, repr(msg)) for rule, kind, msg in messages]}
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok = True)
+			with tempfile.NamedTemporaryFile('w', dir = os.path.dirname(path),
+					delete = False) as f:
+				json.dump(entry, f)
+			os.replace(f.name, path)
+			size = os.stat(path).st_size
+		except OSError:
+			return
+		if self._size is None:
+			self._size = sum(size for mtime, size, path in self._entries())
+		else:
+			self._size += size
+		if self._size > self.max_size:
+			self.evict()
+
+	def _entries(self):
+		"Yields (mtime, size, path) for every saved result"
+		try:
+			subdirs = list(os.scandir(self.directory))
+		except OSError:
+			return
+		for subdir in subdirs:
+			try:
+				for entry in os.scandir(subdir.path):
+					st = entry.stat()
+					yield st.st_mtime_ns, st.st_size, entry.path
+			except OSError:
+				continue
+
+	def evict(self):
+		"Removes the least recently used results until the cache fits"
+		entries = sorted(self._entries())
+		total = sum(size for mtime, size, path in entries)
+		self._size = total
+		if total <= self.max_size:
+			return
+		for mtime, size, path in entries:
+			try:
+				os.unlink(path)
+			except OSError:
+				continue
+			total -= size
+			if total <= self.max_size:
+				break
+		self._size = total
+
+# vim: set ts=4 sw=4 noet:
@@ -24,9 +24,16 @@ This module defines the base classes from which Namcap rules are derived
 and how they are meant to be used.
 """
 
+import io
+import tempfile
+
 # python 3 does not need classes to derive from object
 class AbstractRule(object):
 	"The parent class of all rules"
+	# Rules adding entries to pkginfo.detected_deps must set this, so
+	# that the dependency analysis waits for them
+	writes_detected_deps = False
+
 	def __init__(self):
 		self.errors = []
 		self.warnings = []
@@ -41,7 +48,197 @@ class PkgbuildRule(AbstractRule):
 	pass
 
 class TarballRule(AbstractRule):
-	"The parent class of rules that process tarballs"
-	pass
+	"""
+	The parent class of rules that process tarballs
+
+	A tarball rule can either override analyze() and walk the tarball
+	itself, or implement the per-member callbacks below. Rules using the
+	callbacks are run together by scan_tarball(), which reads through
+	the archive only once for all of them:
+
+	* prepare(pkginfo) is called before the first member
+	* analyze_member(pkginfo, entry, fileobj) is called for every member
+	  of the archive, entry being a TarInfo object. fileobj is a readable
+	  and seekable file object for regular files when the rule sets
+	  needs_content, None otherwise.
+	* finalize(pkginfo) is called once all members have been seen
+
+	Rules using the callbacks that only look at the name, type, mode,
+	owner, size, modification time and link target of symlinks of the
+	members set metadata_only. When every rule selected does, they are
+	given the members listed in the .MTREE of the package instead of
+	those of the archive (see Namcap.metadata).
+	"""
+	needs_content = False
+	metadata_only = False
+
+	def analyze(self, pkginfo, tar):
+		scan_tarball(pkginfo, tar, [self])
+
+	def prepare(self, pkginfo):
+		pass
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		pass
+
+	def finalize(self, pkginfo):
+		pass
+
+def uses_member_callbacks(rule):
+	"Tells whether a tarball rule relies on the per-member callbacks"
+	return type(rule).analyze is TarballRule.analyze
+
+# Members smaller than this are cached in memory, larger ones on disk
+SPOOL_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+class MemberData(object):
+	"""
+	The contents of a tarball member, shared by all rules.
+
+	The member is read from the archive only as far as some rule asked
+	for, and what has been read is kept so that every rule can seek back
+	to the beginning without decompressing the archive again.
+
+	The cache dictionary holds anything derived from the contents that
+	is worth sharing between rules, e.g. the parsed ELF headers.
+	"""
+	def __init__(self, fileobj, size):
+		self.size = size
+		self.cache = {}
+		self._source = fileobj
+		self._cache = tempfile.SpooledTemporaryFile(max_size = SPOOL_SIZE)
+		self._length = 0
+
+	def _fetch(self, end):
+		"Makes sure the first end bytes of the member are cached"
+		end = min(end, self.size)
+		while self._length < end:
+			chunk = self._source.read(CHUNK_SIZE)
+			if not chunk:
+				# truncated member
+				self.size = self._length
+				break
+			self._cache.seek(self._length)
+			self._cache.write(chunk)
+			self._length += len(chunk)
+
+	def pread(self, pos, size):
+		"Reads at most size bytes starting at offset pos"
+		self._fetch(pos + size)
+		self._cache.seek(pos)
+		return self._cache.read(max(min(size, self._length - pos), 0))
+
+	def open(self, name = None):
+		"Returns a new file object over the member contents"
+		return MemberFile(self, name)
+
+	def close(self):
+		self.cache.clear()
+		self._cache.close()
+		self._source.close()
+
+class MemberFile(io.RawIOBase):
+	"A file object with its own position over some MemberData"
+	def __init__(self, data, name = None):
+		super().__init__()
+		self._data = data
+		self._pos = 0
+		self.name = name
+
+	@property
+	def cache(self):
+		"Data shared with the other file objects over the same member"
+		return self._data.cache
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def tell(self):
+		return self._pos
+
+	def seek(self, offset, whence = io.SEEK_SET):
+		if whence == io.SEEK_SET:
+			pos = offset
+		elif whence == io.SEEK_CUR:
+			pos = self._pos + offset
+		elif whence == io.SEEK_END:
+			pos = self._data.size + offset
+		else:
+			raise ValueError("invalid whence (%r)" % whence)
+		if pos < 0:
+			raise ValueError("negative seek position %d" % pos)
+		self._pos = pos
+		return pos
+
+	def readinto(self, b):
+		data = self._data.pread(self._pos, len(b))
+		b[:len(data)] = data
+		self._pos += len(data)
+		return len(data)
+
+	def readall(self):
+		return self.read(max(self._data.size - self._pos, 0))
+
+def scan_tarball(pkginfo, tar, rules):
+	"""
+	Runs tarball rules over a package, reading the archive only once.
+
+	Rules implementing the per-member callbacks are fed every member in
+	turn; a member is extracted at most once however many rules look at
+	its contents. Rules overriding analyze() are run afterwards on the
+	tarball, whose member list is then already loaded.
+	"""
+	member_rules = [r for r in rules if uses_member_callbacks(r)]
+	other_rules = [r for r in rules if not uses_member_callbacks(r)]
+
+	for rule in member_rules:
+		rule.prepare(pkginfo)
+
+	scan_members(tar, [(rule, pkginfo) for rule in member_rules])
+
+	for rule in member_rules:
+		rule.finalize(pkginfo)
+
+	for rule in other_rules:
+		rule.analyze(pkginfo, tar)
+
+def scan_members(tar, rules, facts = None):
+	"""
+	Calls analyze_member() for every member of the tarball on a list of
+	(rule, pkginfo) pairs, in a single pass over the archive.
+
+	facts is an optional Namcap.incremental.MemberFacts: the cache of the
+	members it knows starts with what was derived from the same contents
+	before, and what the rules derive is recorded in it.
+
+	Hard links come with the contents of the file they link to.
+	"""
+	if not rules:
+		return
+	content_rules = any(r.needs_content for r, _ in rules)
+	# name => size of the regular files, for the hard links to them
+	sizes = {}
+	for entry in tar:
+		data = None
+		if content_rules and entry.isfile():
+			sizes[entry.name] = entry.size
+			data = MemberData(tar.extractfile(entry), entry.size)
+			if facts is not None:
+				data.cache.update(facts.known(entry))
+		elif content_rules and entry.islnk() and entry.linkname in sizes:
+			data = MemberData(tar.extractfile(entry), sizes[entry.linkname])
+		for rule, pkginfo in rules:
+			fileobj = None
+			if rule.needs_content and data is not None:
+				fileobj = data.open(entry.name)
+			rule.analyze_member(pkginfo, entry, fileobj)
+		if data is not None:
+			if facts is not None:
+				facts.record(entry, data.cache)
+			data.close()
 
 # vim: set ts=4 sw=4 noet:
@@ -17,66 +17,208 @@
 #   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 # 
 
-from types import ModuleType
+"""
+The registry of namcap rules. Rules are known by the metadata in
+Namcap/rules/manifest.py and by the "namcap.rules" entry points of
+installed packages, and their modules are only imported once a rule
+is actually used.
+"""
+
+import collections.abc
+import importlib
+import os
+
 import Namcap.ruleclass
 
+ENTRY_POINT_GROUP = 'namcap.rules'
+
 # Tarball rules
-from . import (
-  anyelf,
-  elffiles,
-  emptydir,
-  externalhooks,
-  fhs,
-  filenames,
-  fileownership,
-  gnomemime,
-  hardlinks,
-  infodirectory,
-  javafiles,
-  kdeprograms,
-  libtool,
-  licensepkg,
-  lotsofdocs,
-  mimefiles,
-  missingbackups,
-  pathdepends,
-  perllocal,
-  permissions,
-  py_mtime,
-  rpath,
-  scrollkeeper,
-  shebangdepends,
-  sodepends,
-  symlink,
-  systemdlocation,
-  unusedsodepends
-)
+TARBALL_MODULES = [
+  'anyelf',
+  'elffiles',
+  'emptydir',
+  'externalhooks',
+  'fhs',
+  'filenames',
+  'fileownership',
+  'gnomemime',
+  'hardlinks',
+  'infodirectory',
+  'javafiles',
+  'kdeprograms',
+  'libtool',
+  'licensepkg',
+  'lotsofdocs',
+  'mimefiles',
+  'missingbackups',
+  'pathdepends',
+  'perllocal',
+  'permissions',
+  'py_mtime',
+  'rpath',
+  'scrollkeeper',
+  'shebangdepends',
+  'sodepends',
+  'symlink',
+  'systemdlocation',
+  'unusedsodepends'
+]
 
 # PKGBUILD and metadata rules
-from . import (
-  arrays,
-  badbackups,
-  carch,
-  extravars,
-  invalidstartdir,
-  makepkgfunctions,
-  missingvars,
-  pkginfo,
-  pkgnameindesc,
-  sfurl,
-  splitpkgbuild
-)
-
-all_rules = {}
-for name,value in dict(locals()).items():
-	if not isinstance(value, ModuleType):
-		continue
-	if name == "Namcap.ruleclass":
-		continue
-	for n, v in value.__dict__.items():
-		if (type(v) == type
-			and issubclass(v, Namcap.ruleclass.AbstractRule)
-			and hasattr(v, "name")):
-			all_rules[v.name] = v
+PKGBUILD_MODULES = [
+  'arrays',
+  'badbackups',
+  'carch',
+  'extravars',
+  'invalidstartdir',
+  'makepkgfunctions',
+  'missingvars',
+  'pkginfo',
+  'pkgnameindesc',
+  'sfurl',
+  'splitpkgbuild'
+]
+
+BUILTIN_MODULES = TARBALL_MODULES + PKGBUILD_MODULES
+
+def rule_kind(cls):
+	"The kind of a rule class: 'tarball', 'pkgbuild', 'pkginfo' or 'other'"
+	if issubclass(cls, Namcap.ruleclass.TarballRule):
+		return 'tarball'
+	if issubclass(cls, Namcap.ruleclass.PkgbuildRule):
+		return 'pkgbuild'
+	if issubclass(cls, Namcap.ruleclass.PkgInfoRule):
+		return 'pkginfo'
+	return 'other'
+
+class RuleRegistry(collections.abc.Mapping):
+	"""
+	A dictionary { rule name => rule class }, which only imports the
+	module of a rule when its class is looked up. Kinds, descriptions and
+	whether rules can run on the metadata of packages are answered from
+	the metadata when it is known.
+	"""
+	def __init__(self):
+		# name => [module, class name, kind, description, metadata, class]
+		self._rules = {}
+
+	def add(self, name, module, classname, kind = None, description = None,
+			metadata = None):
+		self._rules[name] = [module, classname, kind, description, metadata, None]
+
+	def __getitem__(self, name):
+		entry = self._rules[name]
+		if entry[5] is None:
+			entry[5] = getattr(importlib.import_module(entry[0]), entry[1])
+		return entry[5]
+
+	def __iter__(self):
+		return iter(self._rules)
+
+	def __len__(self):
+		return len(self._rules)
+
+	def __contains__(self, name):
+		return name in self._rules
+
+	def kind(self, name):
+		entry = self._rules[name]
+		if entry[2] is None:
+			entry[2] = rule_kind(self[name])
+		return entry[2]
+
+	def description(self, name):
+		entry = self._rules[name]
+		if entry[3] is None:
+			entry[3] = self[name].description
+		return entry[3]
+
+	def metadata_capable(self, name):
+		"Tells whether a rule runs on the .PKGINFO and .MTREE of packages alone"
+		entry = self._rules[name]
+		if entry[4] is None:
+			import Namcap.metadata
+			entry[4] = Namcap.metadata.metadata_capable(self[name])
+		return entry[4]
+
+def _entry_points():
+	"""
+	Yields the (name, value) of the entry points of installed distributions
+	for namcap rules. The metadata files are read directly, importlib.metadata
+	being slower to import than everything else namcap needs to start.
+	"""
+	import configparser
+	import glob
+	import sys
+	seen = set()
+	for path in sys.path:
+		pattern = os.path.join(glob.escape(path or '.'), '*.*-info', 'entry_points.txt')
+		for filename in sorted(glob.glob(pattern)):
+			parser = configparser.ConfigParser(delimiters = ('=',),
+					interpolation = None)
+			parser.optionxform = str
+			try:
+				parser.read(filename, encoding = 'utf-8')
+			except (configparser.Error, UnicodeDecodeError):
+				continue
+			if not parser.has_section(ENTRY_POINT_GROUP):
+				continue
+			for name, value in parser.items(ENTRY_POINT_GROUP):
+				# the first distribution on the path wins, as for imports
+				if name not in seen:
+					seen.add(name)
+					yield name, value
+
+def load_registry():
+	"""
+	Builds the registry from the manifest of the builtin rules, then from
+	the entry points of third-party packages, of the form
+	"rulename = module:RuleClass"
+	"""
+	from .manifest import RULES
+	registry = RuleRegistry()
+	for name, module, classname, kind, description, metadata in RULES:
+		registry.add(name, __name__ + '.' + module, classname, kind, description,
+				metadata)
+	for name, value in _entry_points():
+		module, _, classname = value.partition(':')
+		registry.add(name, module.strip(), classname.strip())
+	return registry
+
+def generate_manifest():
+	"Imports the builtin rule modules and returns their manifest entries"
+	import Namcap.metadata
+	rules = {}
+	for module in BUILTIN_MODULES:
+		value = importlib.import_module(__name__ + '.' + module)
+		for n, v in value.__dict__.items():
+			if (type(v) == type
+				and issubclass(v, Namcap.ruleclass.AbstractRule)
+				and hasattr(v, "name")):
+				rules[v.name] = (v.name, module, v.__name__, rule_kind(v),
+						v.description, Namcap.metadata.metadata_capable(v))
+	return list(rules.values())
+
+def write_manifest():
+	"Regenerates Namcap/rules/manifest.py after rules are added or changed"
+	path = os.path.join(os.path.dirname(__file__), 'manifest.py')
+	with open(path, 'w') as f:
+		f.write("# Generated by Namcap.rules.write_manifest(), do not edit.\n")
+		f.write("# (name, module, class, kind, description, metadata_capable)\n")
+		f.write("# of the builtin rules\n")
+		f.write("RULES = [\n")
+		for entry in generate_manifest():
+			f.write("\t%r,\n" % (entry,))
+		f.write("]\n\n# vim: set ts=4 sw=4 noet:\n")
+
+def __getattr__(name):
+	# rule modules used to be imported along with this package
+	if name in BUILTIN_MODULES:
+		return importlib.import_module(__name__ + '.' + name)
+	if name == 'all_rules':
+		global all_rules
+		all_rules = load_registry()
+		return all_rules
+	raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 # vim: set ts=4 sw=4 noet:
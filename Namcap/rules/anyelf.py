@@ -28,20 +28,22 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "anyelf"
 	description = "Check for ELF files to see if a package should be 'any' architecture"
-	def analyze(self, pkginfo, tar):
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.found_elffiles = []
+
+	def analyze_member(self, pkginfo, entry, f):
+		if not entry.isfile():
+			return
+		# Ar files (static libs) are also architecture specific (FS#24854)
+		if is_elf(f) or is_static(f):
+			self.found_elffiles.append(entry.name)
+
+	def finalize(self, pkginfo):
 		supress_name = ['^mingw-']
 		if any(re.search(s, pkginfo['name']) for s in supress_name):
 			return
-		found_elffiles = []
-
-		for entry in tar.getmembers():
-			if not entry.isfile():
-				continue
-			f = tar.extractfile(entry)
-			# Ar files (static libs) are also architecture specific (FS#24854)
-			if is_elf(f) or is_static(f):
-				found_elffiles.append(entry.name)
-			f.close()
+		found_elffiles = self.found_elffiles
 
 		if pkginfo["arch"] and pkginfo["arch"][0] == 'any':
 			self.errors = [("elffile-in-any-package %s", i)
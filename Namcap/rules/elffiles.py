@@ -20,10 +20,7 @@
 
 import os
 
-from elftools.elf.elffile import ELFFile
-from elftools.elf.dynamic import DynamicSection
-from elftools.elf.sections import SymbolTableSection
-
+from Namcap.elf import elf_summary
 from Namcap.util import is_elf, clean_filename
 from Namcap.ruleclass import *
 
@@ -37,28 +34,31 @@ questionable_dirs = ['opt/']
 class ELFPaths(TarballRule):
 	name = "elfpaths"
 	description = "Check about ELF files outside some standard paths."
-	def analyze(self, pkginfo, tar):
-		invalid_elffiles = []
-		questionable_elffiles = []
-
-		for entry in tar:
-			# is it a regular file ?
-			if not entry.isfile():
-				continue
-			# is it outside standard binary dirs ?
-			in_std_dirs = any(entry.name.startswith(d) for d in valid_dirs)
-			in_que_dirs = any(entry.name.startswith(d) for d in questionable_dirs)
-
-			if in_std_dirs:
-				continue
-			# is it an ELF file ?
-			f = tar.extractfile(entry)
-			if is_elf(f):
-				if in_que_dirs:
-					questionable_elffiles.append(entry.name)
-				else:
-					invalid_elffiles.append(entry.name)
-
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.invalid_elffiles = []
+		self.questionable_elffiles = []
+
+	def analyze_member(self, pkginfo, entry, f):
+		# is it a regular file ?
+		if not entry.isfile():
+			return
+		# is it outside standard binary dirs ?
+		in_std_dirs = any(entry.name.startswith(d) for d in valid_dirs)
+		in_que_dirs = any(entry.name.startswith(d) for d in questionable_dirs)
+
+		if in_std_dirs:
+			return
+		# is it an ELF file ?
+		if is_elf(f):
+			if in_que_dirs:
+				self.questionable_elffiles.append(entry.name)
+			else:
+				self.invalid_elffiles.append(entry.name)
+
+	def finalize(self, pkginfo):
+		invalid_elffiles = self.invalid_elffiles
+		questionable_elffiles = self.questionable_elffiles
 		que_elfdirs = [d for d in questionable_dirs if any(f.startswith(d) for f in questionable_elffiles)]
 		self.errors = [("elffile-not-in-allowed-dirs %s", i)
 				for i in invalid_elffiles]
@@ -75,27 +75,24 @@ class ELFTextRelocationRule(TarballRule):
 
 	name = "elftextrel"
 	description = "Check for text relocations in ELF files."
-
-	def analyze(self, pkginfo, tar):
-		files_with_textrel = []
-
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			fp = tar.extractfile(entry)
-			if not is_elf(fp):
-				continue
-			elffile = ELFFile(fp)
-			for section in elffile.iter_sections():
-				if not isinstance(section, DynamicSection):
-					continue
-				for tag in section.iter_tags():
-					if tag.entry.d_tag == 'DT_TEXTREL':
-						files_with_textrel.append(entry.name)
-
-		if files_with_textrel:
+	needs_content = True
+
+	def prepare(self, pkginfo):
+		self.files_with_textrel = []
+
+	def analyze_member(self, pkginfo, entry, fp):
+		if not entry.isfile():
+			return
+		elffile = elf_summary(fp)
+		if elffile is None:
+			return
+		if elffile.textrel:
+			self.files_with_textrel.append(entry.name)
+
+	def finalize(self, pkginfo):
+		if self.files_with_textrel:
 			self.warnings = [("elffile-with-textrel %s", i)
-					for i in files_with_textrel]
+					for i in self.files_with_textrel]
 
 class ELFExecStackRule(TarballRule):
 	"""
@@ -108,28 +105,25 @@ class ELFExecStackRule(TarballRule):
 
 	name = "elfexecstack"
 	description = "Check for executable stacks in ELF files."
-
-	def analyze(self, pkginfo, tar):
-		exec_stacks = []
-
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			fp = tar.extractfile(entry)
-			if not is_elf(fp):
-				continue
-			elffile = ELFFile(fp)
-			for segment in elffile.iter_segments():
-				if segment['p_type'] != 'PT_GNU_STACK':
-					continue
-
-				mode = segment['p_flags']
-				if mode & 1:
-					exec_stacks.append(entry.name)
-
-		if exec_stacks:
+	needs_content = True
+
+	def prepare(self, pkginfo):
+		self.exec_stacks = []
+
+	def analyze_member(self, pkginfo, entry, fp):
+		if not entry.isfile():
+			return
+		elffile = elf_summary(fp)
+		if elffile is None:
+			return
+		mode = elffile.segment_flags.get('PT_GNU_STACK', 0)
+		if mode & 1:
+			self.exec_stacks.append(entry.name)
+
+	def finalize(self, pkginfo):
+		if self.exec_stacks:
 			self.warnings = [("elffile-with-execstack %s", i)
-					for i in exec_stacks]
+					for i in self.exec_stacks]
 
 class ELFGnuRelroRule(TarballRule):
 	"""
@@ -140,34 +134,27 @@ class ELFGnuRelroRule(TarballRule):
 
 	name = "elfgnurelro"
 	description = "Check for FULL RELRO in ELF files."
+	needs_content = True
+
+	def prepare(self, pkginfo):
+		self.missing_relro = []
 
-	def has_bind_now(self, elffile):
-		for section in elffile.iter_sections():
-			if not isinstance(section, DynamicSection):
-				continue
-			if any(tag.entry.d_tag == 'DT_BIND_NOW' for tag in section.iter_tags()):
-				return True
-		return False
-
-	def analyze(self, pkginfo, tar):
-		missing_relro = []
-
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			fp = tar.extractfile(entry)
-			if not is_elf(fp):
-				continue
-			elffile = ELFFile(fp)
-			if any(seg['p_type'] == 'PT_GNU_RELRO' for seg in elffile.iter_segments()):
-				if self.has_bind_now(elffile):
-					continue
-
-			missing_relro.append(entry.name)
-
-		if missing_relro:
+	def analyze_member(self, pkginfo, entry, fp):
+		if not entry.isfile():
+			return
+		elffile = elf_summary(fp)
+		if elffile is None:
+			return
+		if 'PT_GNU_RELRO' in elffile.segment_flags:
+			if elffile.bind_now:
+				return
+
+		self.missing_relro.append(entry.name)
+
+	def finalize(self, pkginfo):
+		if self.missing_relro:
 			self.warnings = [("elffile-without-relro %s", i)
-					for i in missing_relro]
+					for i in self.missing_relro]
 
 class ELFUnstrippedRule(TarballRule):
 	"""
@@ -179,29 +166,24 @@ class ELFUnstrippedRule(TarballRule):
 
 	name = "elfunstripped"
 	description = "Check for unstripped ELF files."
-
-	def analyze(self, pkginfo, tar):
-		unstripped_binaries = []
-
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			fp = tar.extractfile(entry)
-			if not is_elf(fp):
-				continue
-			elffile = ELFFile(fp)
-			for section in elffile.iter_sections():
-				if not isinstance(section, SymbolTableSection):
-					continue
-
-				if section['sh_entsize'] == 0:
-					continue
-
-				if section.name == '.symtab':
-					unstripped_binaries.append(entry.name)
-		if unstripped_binaries:
+	needs_content = True
+
+	def prepare(self, pkginfo):
+		self.unstripped_binaries = []
+
+	def analyze_member(self, pkginfo, entry, fp):
+		if not entry.isfile():
+			return
+		elffile = elf_summary(fp)
+		if elffile is None:
+			return
+		if elffile.has_symtab:
+			self.unstripped_binaries.append(entry.name)
+
+	def finalize(self, pkginfo):
+		if self.unstripped_binaries:
 			self.warnings = [("elffile-unstripped %s", i)
-					for i in unstripped_binaries]
+					for i in self.unstripped_binaries]
 
 class NoPIERule(TarballRule):
 	"""
@@ -210,30 +192,23 @@ class NoPIERule(TarballRule):
 
 	name = "elfnopie"
 	description = "Check for no PIE ELF files."
-
-	def has_dt_debug(self, elffile):
-		for section in elffile.iter_sections():
-			if not isinstance(section, DynamicSection):
-				continue
-			if any(tag.entry.d_tag == 'DT_DEBUG' for tag in section.iter_tags()):
-				return True
-		return False
-
-	def analyze(self, pkginfo, tar):
-		nopie_binaries = []
-
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			fp = tar.extractfile(entry)
-			if not is_elf(fp):
-				continue
-			elffile = ELFFile(fp)
-			if elffile.header['e_type'] != 'ET_DYN' or not self.has_dt_debug(elffile):
-				nopie_binaries.append(entry.name)
-
-		if nopie_binaries:
-			self.warnings = [("elffile-nopie %s", i) for i in nopie_binaries]
+	needs_content = True
+
+	def prepare(self, pkginfo):
+		self.nopie_binaries = []
+
+	def analyze_member(self, pkginfo, entry, fp):
+		if not entry.isfile():
+			return
+		elffile = elf_summary(fp)
+		if elffile is None:
+			return
+		if elffile.e_type != 'ET_DYN' or not elffile.debug:
+			self.nopie_binaries.append(entry.name)
+
+	def finalize(self, pkginfo):
+		if self.nopie_binaries:
+			self.warnings = [("elffile-nopie %s", i) for i in self.nopie_binaries]
 
 
 # vim: set ts=4 sw=4 noet:
@@ -23,15 +23,19 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "emptydir"
 	description = "Warns about empty directories in a package"
-	def analyze(self, pkginfo, tar):
-		dirs = []
-		entries = []
-		for entry in tar:
-			if entry.isdir():
-				dirs.append(entry.name.rstrip("/"))
-			entries.append(entry.name.rstrip("/"))
-		nonemptydirs = [os.path.dirname(x) for x in entries]
+	metadata_only = True
+	def prepare(self, pkginfo):
+		self.dirs = []
+		self.entries = []
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if entry.isdir():
+			self.dirs.append(entry.name.rstrip("/"))
+		self.entries.append(entry.name.rstrip("/"))
+
+	def finalize(self, pkginfo):
+		nonemptydirs = [os.path.dirname(x) for x in self.entries]
 		self.warnings = [("empty-directory %s", d)
-				for d in (set(dirs) - set(nonemptydirs))]
+				for d in (set(self.dirs) - set(nonemptydirs))]
 
 # vim: set ts=4 sw=4 noet:
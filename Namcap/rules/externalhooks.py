@@ -38,12 +38,11 @@ class ExternalHooksRule(TarballRule):
 		'systemd-tmpfiles',
 		'vlc-cache-gen',
 	]
-	def analyze(self, pkginfo, tar):
-		if ".INSTALL" not in tar.getnames():
+	needs_content = True
+	def analyze_member(self, pkginfo, entry, f):
+		if entry.name != ".INSTALL" or f is None:
 			return
-		f = tar.extractfile(".INSTALL")
 		text = f.read().decode('utf-8', 'ignore')
-		f.close()
 		for command in self.hooked:
 			if command in text:
 				self.warnings = [('external-hooks-warning', ())]
@@ -24,7 +24,8 @@ from Namcap.ruleclass import *
 class FHSRule(TarballRule):
 	name = "directoryname"
 	description = "Checks for standard directories."
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	def prepare(self, pkginfo):
 		valid_paths = [
 				'etc/', 'opt/',
 				'lib/modules',
@@ -50,66 +51,72 @@ class FHSRule(TarballRule):
 		for pattern in custom_valid:
 			if re.search(pattern, pkginfo['name']):
 				valid_paths.extend(custom_valid[pattern])
-		for entry in tar.getmembers():
-			name = os.path.normpath(entry.name)
-			if entry.isdir():
-				name += '/'
+		self.valid_paths = valid_paths
+		self.forbidden_paths = forbidden_paths
 
-			# check for files in wrong dirs, directory itself will be
-			# catched by emptydirs rule
-			if name in forbidden_paths:
-				continue
-			bad_dirs = (name.startswith(dirname) for dirname in forbidden_paths)
-			if any(bad_dirs):
-				self.errors.append(('file-in-temporary-dir %s',	name))
-				continue
+	def analyze_member(self, pkginfo, entry, fileobj):
+		valid_paths = self.valid_paths
+		forbidden_paths = self.forbidden_paths
+		name = os.path.normpath(entry.name)
+		if entry.isdir():
+			name += '/'
 
-			# matches directory names or parent directories
-			good_dirs = (name.startswith(dirname) or dirname.startswith(name)
-				for dirname in valid_paths)
-			if not any(good_dirs):
-				self.warnings.append(("file-in-non-standard-dir %s", name))
+		# check for files in wrong dirs, directory itself will be
+		# catched by emptydirs rule
+		if name in forbidden_paths:
+			return
+		bad_dirs = (name.startswith(dirname) for dirname in forbidden_paths)
+		if any(bad_dirs):
+			self.errors.append(('file-in-temporary-dir %s',	name))
+			return
+
+		# matches directory names or parent directories
+		good_dirs = (name.startswith(dirname) or dirname.startswith(name)
+			for dirname in valid_paths)
+		if not any(good_dirs):
+			self.warnings.append(("file-in-non-standard-dir %s", name))
 
 class FHSManpagesRule(TarballRule):
 	name = "fhs-manpages"
 	description = "Verifies correct installation of man pages"
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	def analyze_member(self, pkginfo, i, fileobj):
 		gooddir = 'usr/share/man'
 		bad_dir = 'usr/man'
-		for i in tar.getmembers():
-			if not i.isfile():
-				continue
-			if i.name.startswith(gooddir):
-				continue
-			if i.name.startswith(bad_dir):
-				self.errors.append(("non-fhs-man-page %s", i.name))
-				continue
-			#Check everything else to see if it has a 'man' path component
-			if "man" in i.name.split(os.sep):
-				self.warnings.append(("potential-non-fhs-man-page %s", i.name))
+		if not i.isfile():
+			return
+		if i.name.startswith(gooddir):
+			return
+		if i.name.startswith(bad_dir):
+			self.errors.append(("non-fhs-man-page %s", i.name))
+			return
+		#Check everything else to see if it has a 'man' path component
+		if "man" in i.name.split(os.sep):
+			self.warnings.append(("potential-non-fhs-man-page %s", i.name))
 
 class FHSInfoPagesRule(TarballRule):
 	name = "fhs-infopages"
 	description = "Verifies correct installation of info pages"
-	def analyze(self, pkginfo, tar):
-		for i in tar.getmembers():
-			if not i.isfile():
-				continue
-			if i.name.startswith('usr/share/info'):
-				continue
-			if i.name.startswith('usr/info'):
-				self.errors.append(("non-fhs-info-page %s", i.name))
-				continue
-			if "info" in i.name.split(os.sep):
-				self.warnings.append(("potential-non-fhs-info-page %s", i.name))
+	metadata_only = True
+	def analyze_member(self, pkginfo, i, fileobj):
+		if not i.isfile():
+			return
+		if i.name.startswith('usr/share/info'):
+			return
+		if i.name.startswith('usr/info'):
+			self.errors.append(("non-fhs-info-page %s", i.name))
+			return
+		if "info" in i.name.split(os.sep):
+			self.warnings.append(("potential-non-fhs-info-page %s", i.name))
 
 class RubyPathsRule(TarballRule):
 	name = "rubypaths"
 	description = "Verifies correct usage of folders by ruby packages"
-	def analyze(self, pkginfo, tar):
-		for i in tar.getmembers():
-			if i.name.startswith('usr/lib/ruby/site_ruby'):
-				self.warnings.append(("site-ruby", ()))
-				return
+	metadata_only = True
+	def analyze_member(self, pkginfo, i, fileobj):
+		if self.warnings:
+			return
+		if i.name.startswith('usr/lib/ruby/site_ruby'):
+			self.warnings.append(("site-ruby", ()))
 
 # vim: set ts=4 sw=4 noet:
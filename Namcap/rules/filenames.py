@@ -29,9 +29,9 @@ VALID_CHARS = string.ascii_letters + string.digits \
 class package(TarballRule):
 	name = "filenames"
 	description = "Checks for invalid filenames."
-	def analyze(self, pkginfo, tar):
-		for i in tar.getnames():
-			if not all(c in VALID_CHARS for c in i):
-				self.warnings.append(("invalid-filename", i))
+	metadata_only = True
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if not all(c in VALID_CHARS for c in entry.name):
+			self.warnings.append(("invalid-filename", entry.name))
 
 # vim: set ts=4 sw=4 noet:
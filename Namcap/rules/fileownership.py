@@ -22,19 +22,19 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "fileownership"
 	description = "Checks file ownership."
-	def analyze(self, pkginfo, tar):
-		for i in tar.getmembers():
-			if i.uname != 'root' or i.gname != 'root':
-				uname = ""
-				gname = ""
-				if i.uname == "":
-					uname = str(i.uid)
-				else:
-					uname = i.uname
-				if i.gname == "":
-					gname = str(i.gid)
-				else:
-					gname = i.gname
-				self.errors.append(("incorrect-owner %s (%s:%s)", (i.name, uname, gname)))
+	metadata_only = True
+	def analyze_member(self, pkginfo, i, fileobj):
+		if i.uname != 'root' or i.gname != 'root':
+			uname = ""
+			gname = ""
+			if i.uname == "":
+				uname = str(i.uid)
+			else:
+				uname = i.uname
+			if i.gname == "":
+				gname = str(i.gid)
+			else:
+				gname = i.gname
+			self.errors.append(("incorrect-owner %s (%s:%s)", (i.name, uname, gname)))
 
 # vim: set ts=4 sw=4 noet:
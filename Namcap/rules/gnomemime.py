@@ -22,7 +22,8 @@ from Namcap.ruleclass import *
 class package(TarballRule):
     name = "gnomemime"
     description = "Checks for generated GNOME mime files"
-    def analyze(self, pkginfo, tar):
+    metadata_only = True
+    def analyze_member(self, pkginfo, entry, fileobj):
         mime_files = [
                 'usr/share/applications/mimeinfo.cache',
                 'usr/share/mime/XMLnamespaces', 
@@ -32,8 +33,7 @@ class package(TarballRule):
                 'usr/share/mime/subclasses'
                 ]
 
-        for i in tar.getnames():
-            if i in mime_files:
-                self.errors.append(("gnome-mime-file %s", i))
+        if entry.name in mime_files:
+            self.errors.append(("gnome-mime-file %s", entry.name))
                 
 # vim: set ts=4 sw=4 noet:
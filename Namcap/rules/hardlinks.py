@@ -23,11 +23,11 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "hardlinks"
 	description = "Look for cross-directory/partition hard links"
-	def analyze(self, pkginfo, tar):
-		hardlinks = [i for i in tar.getmembers() if i.islnk() == True]
-		for hardlink in hardlinks:
-			if dirname(hardlink.name) != dirname(hardlink.linkname):
-				self.errors.append(("cross-dir-hardlink %s %s",
-					(hardlink.name, hardlink.linkname)))
+	def analyze_member(self, pkginfo, hardlink, fileobj):
+		if not hardlink.islnk():
+			return
+		if dirname(hardlink.name) != dirname(hardlink.linkname):
+			self.errors.append(("cross-dir-hardlink %s %s",
+				(hardlink.name, hardlink.linkname)))
 
 # vim: set ts=4 sw=4 noet:
@@ -22,9 +22,9 @@ from Namcap.ruleclass import *
 class InfodirRule(TarballRule):
 	name = "infodirectory"
 	description = "Checks for info directory file."
-	def analyze(self, pkginfo, tar):
-		for i in tar.getnames():
-			if i == "usr/share/info/dir":
-				self.errors.append(("info-dir-file-present %s", i))
+	metadata_only = True
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if entry.name == "usr/share/info/dir":
+			self.errors.append(("info-dir-file-present %s", entry.name))
 
 # vim: set ts=4 sw=4 noet:
@@ -25,26 +25,28 @@ from Namcap.util import is_java
 class JavaFiles(TarballRule):
 	name = "javafiles"
 	description = "Check for existence of Java classes or JARs"
-	def analyze(self, pkginfo, tar):
-		has_java_classes = False
-		javas = []
-		for entry in tar:
-			# is it a regular file ?
-			if not entry.isfile():
-				continue
-			# is it a JAR file ?
-			if entry.name.endswith('.jar'):
-				javas.append(entry.name)
-				#self.infos.append( ('jar-file-found %s', entry.name) )
-				continue
-			# is it a CLASS file ?
-			f = tar.extractfile(entry)
-			if is_java(f):
-				javas.append(entry.name)
-				#self.infos.append( ('java-class-file-found %s', entry.name) )
-			f.close()
-		if javas:
+	writes_detected_deps = True
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.javas = []
+
+	def analyze_member(self, pkginfo, entry, f):
+		# is it a regular file ?
+		if not entry.isfile():
+			return
+		# is it a JAR file ?
+		if entry.name.endswith('.jar'):
+			self.javas.append(entry.name)
+			#self.infos.append( ('jar-file-found %s', entry.name) )
+			return
+		# is it a CLASS file ?
+		if is_java(f):
+			self.javas.append(entry.name)
+			#self.infos.append( ('java-class-file-found %s', entry.name) )
+
+	def finalize(self, pkginfo):
+		if self.javas:
 			reasons = pkginfo.detected_deps.setdefault('java-runtime', [])
-			reasons.append( ('java-runtime-needed %s', ', '.join(javas)) )
+			reasons.append( ('java-runtime-needed %s', ', '.join(self.javas)) )
 
 # vim: set ts=4 sw=4 noet:
@@ -23,9 +23,17 @@ import Namcap.depends
 class package(TarballRule):
 	name = "kdeprograms"
 	description = "Checks that KDE programs have kdebase-runtime as a dependency"
-	def analyze(self, pkginfo, tar):
-		binaries = [ f.name for f in tar
-				if f.name.startswith("usr/bin") and f.isfile() ]
+	metadata_only = True
+	writes_detected_deps = True
+	def prepare(self, pkginfo):
+		self.binaries = []
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if entry.name.startswith("usr/bin") and entry.isfile():
+			self.binaries.append(entry.name)
+
+	def finalize(self, pkginfo):
+		binaries = self.binaries
 		if len(binaries) == 0:
 			return
 		# If there are binaries, check for a kdelibs dependency
@@ -23,9 +23,9 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "libtool"
 	description = "Checks for libtool (*.la) files."
-	def analyze(self, pkginfo, tar):
-		for i in tar.getnames():
-			if re.search('\.la$', i) != None:
-				self.warnings.append(("libtool-file-present %s", i))
+	metadata_only = True
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if re.search('\.la$', entry.name) != None:
+			self.warnings.append(("libtool-file-present %s", entry.name))
 
 # vim: set ts=4 sw=4 noet:
@@ -23,11 +23,20 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "licensepkg"
 	description = "Verifies license is included in a package file"
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	def prepare(self, pkginfo):
+		self.licensepaths = []
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		x = entry.name
+		if x.startswith('usr/share/licenses') and not x.endswith('/'):
+			self.licensepaths.append(x)
+
+	def finalize(self, pkginfo):
 		if 'license' not in pkginfo or len(pkginfo["license"]) == 0:
 			self.errors.append(("missing-license", ()))
 			return
-		licensepaths = [x for x in tar.getnames() if x.startswith('usr/share/licenses') and not x.endswith('/')]
+		licensepaths = self.licensepaths
 		licensedirs = [os.path.split(os.path.split(x)[0])[1] for x in licensepaths]
 		licensefiles = [os.path.split(x)[1] for x in licensepaths]
 		# Check all licenses for validity
@@ -22,23 +22,26 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "lots-of-docs"
 	description = "See if a package is carrying more documentation than it should"
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	docdir = 'usr/share/doc'
+	def prepare(self, pkginfo):
+		self.size = 0
+		self.docsize = 0
+
+	def analyze_member(self, pkginfo, i, fileobj):
+		if i.name.startswith(self.docdir):
+			self.docsize += i.size
+		self.size += i.size
+
+	def finalize(self, pkginfo):
 		if ('name' in pkginfo and
 				(pkginfo["name"].endswith('-doc') or
 				 pkginfo["name"].endswith('-docs'))):
 			# Don't do anything if the package is called "*-doc"
 			return
-		docdir = 'usr/share/doc'
-		size = 0
-		docsize = 0
-
-		for i in tar.getmembers():
-			if i.name.startswith(docdir):
-				docsize += i.size
-			size += i.size
 
-		if size > 0:
-			ratio = docsize / float(size)
+		if self.size > 0:
+			ratio = self.docsize / float(self.size)
 			if ratio > 0.50:
 				self.warnings.append(("lots-of-docs %f", ratio * 100))
 
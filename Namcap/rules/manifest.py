@@ -0,0 +1,59 @@
+# Generated by Namcap.rules.write_manifest(), do not edit.
+# (name, module, class, kind, description, metadata_capable)
+# of the builtin rules
+RULES = [
+	('anyelf', 'anyelf', 'package', 'tarball', "Check for ELF files to see if a package should be 'any' architecture", False),
+	('elfpaths', 'elffiles', 'ELFPaths', 'tarball', 'Check about ELF files outside some standard paths.', False),
+	('elftextrel', 'elffiles', 'ELFTextRelocationRule', 'tarball', 'Check for text relocations in ELF files.', False),
+	('elfexecstack', 'elffiles', 'ELFExecStackRule', 'tarball', 'Check for executable stacks in ELF files.', False),
+	('elfgnurelro', 'elffiles', 'ELFGnuRelroRule', 'tarball', 'Check for FULL RELRO in ELF files.', False),
+	('elfunstripped', 'elffiles', 'ELFUnstrippedRule', 'tarball', 'Check for unstripped ELF files.', False),
+	('elfnopie', 'elffiles', 'NoPIERule', 'tarball', 'Check for no PIE ELF files.', False),
+	('emptydir', 'emptydir', 'package', 'tarball', 'Warns about empty directories in a package', True),
+	('externalhooks', 'externalhooks', 'ExternalHooksRule', 'tarball', 'Check the .INSTALL for commands covered by hooks', False),
+	('directoryname', 'fhs', 'FHSRule', 'tarball', 'Checks for standard directories.', True),
+	('fhs-manpages', 'fhs', 'FHSManpagesRule', 'tarball', 'Verifies correct installation of man pages', True),
+	('fhs-infopages', 'fhs', 'FHSInfoPagesRule', 'tarball', 'Verifies correct installation of info pages', True),
+	('rubypaths', 'fhs', 'RubyPathsRule', 'tarball', 'Verifies correct usage of folders by ruby packages', True),
+	('filenames', 'filenames', 'package', 'tarball', 'Checks for invalid filenames.', True),
+	('fileownership', 'fileownership', 'package', 'tarball', 'Checks file ownership.', True),
+	('gnomemime', 'gnomemime', 'package', 'tarball', 'Checks for generated GNOME mime files', True),
+	('hardlinks', 'hardlinks', 'package', 'tarball', 'Look for cross-directory/partition hard links', False),
+	('infodirectory', 'infodirectory', 'InfodirRule', 'tarball', 'Checks for info directory file.', True),
+	('javafiles', 'javafiles', 'JavaFiles', 'tarball', 'Check for existence of Java classes or JARs', False),
+	('kdeprograms', 'kdeprograms', 'package', 'tarball', 'Checks that KDE programs have kdebase-runtime as a dependency', True),
+	('libtool', 'libtool', 'package', 'tarball', 'Checks for libtool (*.la) files.', True),
+	('licensepkg', 'licensepkg', 'package', 'tarball', 'Verifies license is included in a package file', True),
+	('lots-of-docs', 'lotsofdocs', 'package', 'tarball', 'See if a package is carrying more documentation than it should', True),
+	('mimedesktop', 'mimefiles', 'MimeDesktopRule', 'tarball', 'Check for MIME desktop file depends', False),
+	('missingbackups', 'missingbackups', 'package', 'tarball', 'Backup files listed in package should exist', True),
+	('pathdepends', 'pathdepends', 'PathDependsRule', 'tarball', 'Check for simple implicit path dependencies', True),
+	('perllocal', 'perllocal', 'package', 'tarball', 'Verifies the absence of perllocal.pod.', True),
+	('permissions', 'permissions', 'package', 'tarball', 'Checks file permissions.', True),
+	('py_mtime', 'py_mtime', 'package', 'tarball', 'Check for py timestamps that are ahead of pyc/pyo timestamps', False),
+	('rpath', 'rpath', 'package', 'tarball', 'Verifies correct and secure RPATH for files.', False),
+	('scrollkeeper', 'scrollkeeper', 'package', 'tarball', "Verifies that there aren't any scrollkeeper directories.", True),
+	('shebangdepends', 'shebangdepends', 'ShebangDependsRule', 'tarball', 'Checks dependencies semi-smartly.', False),
+	('sodepends', 'sodepends', 'SharedLibsRule', 'tarball', 'Checks dependencies caused by linked shared libraries', False),
+	('symlink', 'symlink', 'package', 'tarball', 'Checks that symlinks point to the right place', False),
+	('systemdlocation', 'systemdlocation', 'systemdlocationRule', 'tarball', 'Checks for systemd files in /etc/systemd/system/', True),
+	('unusedsodepends', 'unusedsodepends', 'package', 'tarball', 'Checks for unused dependencies caused by linked shared libraries', False),
+	('array', 'arrays', 'package', 'pkgbuild', 'Verifies that array variables are actually arrays', False),
+	('badbackups', 'badbackups', 'package', 'pkgbuild', 'Checks for bad backup entries', False),
+	('carch', 'carch', 'package', 'pkgbuild', 'Verifies that no specific host type is used', False),
+	('extravars', 'extravars', 'package', 'pkgbuild', 'Verifies that extra variables start with an underscore', False),
+	('invalidstartdir', 'invalidstartdir', 'package', 'pkgbuild', 'Looks for references to $startdir', False),
+	('makepkgfunctions', 'makepkgfunctions', 'package', 'pkgbuild', 'Looks for calls to makepkg functionality', False),
+	('checksums', 'missingvars', 'ChecksumsRule', 'pkgbuild', 'Verifies checksums are included in a PKGBUILD', False),
+	('tags', 'missingvars', 'TagsRule', 'pkgbuild', 'Looks for Maintainer and Contributor comments', False),
+	('description', 'missingvars', 'DescriptionRule', 'pkgbuild', 'Verifies that the description is set in a PKGBUILD', False),
+	('capsnamespkg', 'pkginfo', 'CapsPkgnameRule', 'pkginfo', 'Verifies package name in package does not include upper case letters', True),
+	('urlpkg', 'pkginfo', 'UrlRule', 'pkginfo', 'Verifies url is included in a package file', True),
+	('license', 'pkginfo', 'LicenseRule', 'pkginfo', 'Verifies license is included in a PKGBUILD', True),
+	('pkgnameindesc', 'pkgnameindesc', 'package', 'pkginfo', 'Verifies if the package name is included on package description', True),
+	('sfurl', 'sfurl', 'package', 'pkgbuild', 'Checks for proper sourceforge URLs', False),
+	('splitpkgfunctions', 'splitpkgbuild', 'PackageFunctionsRule', 'pkgbuild', 'Checks that all package_* functions exist.', False),
+	('splitpkgmakedeps', 'splitpkgbuild', 'SplitPkgMakedepsRule', 'pkgbuild', 'Checks that a split PKGBUILD has enough makedeps.', False),
+]
+
+# vim: set ts=4 sw=4 noet:
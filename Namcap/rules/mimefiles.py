@@ -24,18 +24,23 @@ from Namcap.ruleclass import *
 class MimeDesktopRule(TarballRule):
 	name = "mimedesktop"
 	description = "Check for MIME desktop file depends"
-	def analyze(self, pkginfo, tar):
-		for entry in tar:
-			if entry.issym():
-				continue
-			if not entry.name.startswith("usr/share/applications"):
-				continue
-			if not entry.name.endswith(".desktop"):
-				continue
-			with tar.extractfile(entry) as f:
-				if not any(l.startswith(b"MimeType=") for l in f):
-					continue
-				pkginfo.detected_deps["desktop-file-utils"].append( ('desktop-file-utils-needed', ()) )
-				break
+	writes_detected_deps = True
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.found = False
+
+	def analyze_member(self, pkginfo, entry, f):
+		if self.found:
+			return
+		if f is None:
+			return
+		if not entry.name.startswith("usr/share/applications"):
+			return
+		if not entry.name.endswith(".desktop"):
+			return
+		if not any(l.startswith(b"MimeType=") for l in f):
+			return
+		pkginfo.detected_deps["desktop-file-utils"].append( ('desktop-file-utils-needed', ()) )
+		self.found = True
 
 # vim: set ts=4 sw=4 noet:
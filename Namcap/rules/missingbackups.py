@@ -22,12 +22,18 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "missingbackups"
 	description = "Backup files listed in package should exist"
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	def prepare(self, pkginfo):
+		self.found_files = set()
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.found_files.add(entry.name)
+
+	def finalize(self, pkginfo):
 		if 'backup' not in pkginfo or len(pkginfo["backup"]) == 0:
 			return
 		known_backups = set(pkginfo["backup"])
-		found_files = set(tar.getnames())
-		missing_backups = known_backups - found_files
+		missing_backups = known_backups - self.found_files
 		for backup in missing_backups:
 			self.errors.append(("missing-backup-file %s", backup))
 
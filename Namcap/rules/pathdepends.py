@@ -30,6 +30,8 @@ from Namcap.ruleclass import *
 class PathDependsRule(TarballRule):
 	name = "pathdepends"
 	description = "Check for simple implicit path dependencies"
+	metadata_only = True
+	writes_detected_deps = True
 	# list of path regex, dep name, reason tag
 	subrules = [
 	{'path': '^usr/share/glib-2\.0/schemas$',
@@ -45,8 +47,14 @@ class PathDependsRule(TarballRule):
 		'dep':'shared-mime-info',
 		'reason':'shared-mime-info-needed'},
 	]
-	def analyze(self, pkginfo, tar):
-		names = [entry.name for entry in tar]
+	def prepare(self, pkginfo):
+		self.names = []
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.names.append(entry.name)
+
+	def finalize(self, pkginfo):
+		names = self.names
 		for subrule in self.subrules:
 			pattern = re.compile(subrule['path'])
 			if any(pattern.search(n) for n in names):
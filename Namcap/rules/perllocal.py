@@ -22,9 +22,9 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "perllocal"
 	description = "Verifies the absence of perllocal.pod."
-	def analyze(self, pkginfo, tar):
-		for i in tar.getnames():
-			if i.endswith('perllocal.pod'):
-				self.errors.append(("perllocal-pod-present %s", i))
+	metadata_only = True
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if entry.name.endswith('perllocal.pod'):
+			self.errors.append(("perllocal-pod-present %s", entry.name))
 
 # vim: set ts=4 sw=4 noet:
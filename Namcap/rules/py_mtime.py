@@ -22,7 +22,7 @@ Check for py timestamps that are ahead of pyc/pyo timestamps
 """
 
 import os
-from Namcap.package import load_mtree
+import Namcap.mtree
 from Namcap.ruleclass import *
 
 def _quick_filter(names):
@@ -38,35 +38,29 @@ def _quick_filter(names):
 		return False
 	return True
 
-def _tar_timestamps(tar):
-	"takes a tar object"
-	return dict((m.name, m.mtime) for m in tar.getmembers())
+def _mtree_timestamps(mtree):
+	"takes the Namcap.mtree.Mtree, only python files are of interest"
+	return dict((e.path, e.time) for e in mtree
+			if e.path.endswith(('.py', '.pyc', '.pyo')) and e.time is not None)
 
-def _mtree_timestamps(tar):
-	"takes a tar object"
-	return dict((h, a['time']) for h,a in load_mtree(tar) if 'time' in a)
-
-def _generic_timestamps(tar):
+def _generic_timestamps(mtree_stamps, tar_stamps):
 	"works for mtree and tar"
-	if '.MTREE' in tar.getnames():
-		return _mtree_timestamps(tar)
-	return _tar_timestamps(tar)
+	if mtree_stamps is not None:
+		return mtree_stamps
+	return tar_stamps
 
-def _try_mtree(tar):
+def _try_mtree(stamps):
 	"returns True if good, False if bad, None if N/A"
-	if '.MTREE' not in tar.getnames():
+	if stamps is None:
 		return None
-	stamps = _mtree_timestamps(tar)
 	if _quick_filter(stamps.keys()):
 		return True
 	return not _mtime_filter(stamps)
 
-def _try_tar(tar):
+def _try_tar(mtimes):
 	"returns True if good, False if bad"
-	names = tar.getnames()
-	if _quick_filter(names):
+	if _quick_filter(mtimes.keys()):
 		return True
-	mtimes = _tar_timestamps(tar)
 	return not _mtime_filter(mtimes)
 
 def _split_all(path):
@@ -115,15 +109,31 @@ def _mtime_filter(mtimes):
 class package(TarballRule):
 	name = "py_mtime"
 	description = "Check for py timestamps that are ahead of pyc/pyo timestamps"
-	def analyze(self, pkginfo, tar):
-		mtree_status = _try_mtree(tar)
-		tar_status = _try_tar(tar)
+	needs_content = True
+	def prepare(self, pkginfo):
+		# shared with the other users of the .MTREE when it was loaded
+		# along with the metadata
+		self.mtree = getattr(pkginfo, 'mtree', None)
+		self.tar_stamps = {}
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.tar_stamps[entry.name] = entry.mtime
+		if entry.name == '.MTREE' and fileobj is not None and self.mtree is None:
+			self.mtree = Namcap.mtree.Mtree(fileobj.read())
+
+	def finalize(self, pkginfo):
+		self.mtree_stamps = None
+		if self.mtree is not None:
+			self.mtree_stamps = _mtree_timestamps(self.mtree)
+		mtree_status = _try_mtree(self.mtree_stamps)
+		tar_status = _try_tar(self.tar_stamps)
 		if mtree_status == False and tar_status:
 			# mtree only
 			self.warnings = [('py-mtime-mtree-warning', ())]
 		elif not tar_status:
 			# tar or both
 			self.errors = [('py-mtime-tar-error', ())]
-		self.infos = [('py-mtime-file-name %s', f[1:]) for f in _mtime_filter(_generic_timestamps(tar))]
+		stamps = _generic_timestamps(self.mtree_stamps, self.tar_stamps)
+		self.infos = [('py-mtime-file-name %s', f[1:]) for f in _mtime_filter(stamps)]
 
 # vim: set ts=4 sw=4 noet:
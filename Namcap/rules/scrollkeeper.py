@@ -23,10 +23,10 @@ from Namcap.ruleclass import *
 class package(TarballRule):
 	name = "scrollkeeper"
 	description = "Verifies that there aren't any scrollkeeper directories."
-	def analyze(self, pkginfo, tar):
-		scroll = re.compile("var.*/scrollkeeper/?$")
-		for i in tar.getnames():
-			if scroll.search(i):
-				self.errors.append(("scrollkeeper-dir-exists %s", i))
+	metadata_only = True
+	scroll = re.compile("var.*/scrollkeeper/?$")
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if self.scroll.search(entry.name):
+			self.errors.append(("scrollkeeper-dir-exists %s", entry.name))
 
 # vim: set ts=4 sw=4 noet:
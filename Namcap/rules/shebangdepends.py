@@ -23,6 +23,7 @@
 
 import os
 import shutil
+import Namcap.fileindex
 import Namcap.package
 from Namcap.util import is_script, script_type
 from Namcap.ruleclass import *
@@ -55,6 +56,7 @@ def findowners(scriptlist):
 
 	pkglist = {}
 	scriptfound = set()
+	index = Namcap.fileindex.local_file_index()
 
 	for s in scriptlist:
 		out = shutil.which(s)
@@ -63,11 +65,9 @@ def findowners(scriptlist):
 
 		# strip leading slash
 		scriptpath = out.lstrip('/')
-		for pkg in Namcap.package.get_installed_packages():
-			pkg_files = [fname for fname, fsize, fmode in pkg.files]
-			if scriptpath in pkg_files:
-				pkglist.setdefault(pkg.name, set()).add(s)
-				scriptfound.add(s)
+		for owner in index.owners(scriptpath):
+			pkglist.setdefault(owner, set()).add(s)
+			scriptfound.add(s)
 
 	orphans = list(set(scriptlist) - scriptfound)
 	return pkglist, orphans
@@ -75,15 +75,19 @@ def findowners(scriptlist):
 class ShebangDependsRule(TarballRule):
 	name = "shebangdepends"
 	description = "Checks dependencies semi-smartly."
-	def analyze(self, pkginfo, tar):
-		scriptlist = {}
+	writes_detected_deps = True
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.scriptlist = {}
+
+	def analyze_member(self, pkginfo, entry, f):
+		if not entry.isfile():
+			return
+		scanshebangs(f, entry.name, self.scriptlist)
+
+	def finalize(self, pkginfo):
+		scriptlist = self.scriptlist
 
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			f = tar.extractfile(entry)
-			scanshebangs(f, entry.name, scriptlist)
-			f.close()
 
 		# find packages owning interpreters
 		pkglist, orphans = findowners(scriptlist)
@@ -107,10 +111,7 @@ class ShebangDependsRule(TarballRule):
 			for i in orphans])
 
 		# Check for packages in testing
-		for i in scriptlist:
-			p = Namcap.package.load_testing_package(i)
-			q = Namcap.package.load_from_db(i)
-			if p != None and q != None and p["version"] == q["version"]:
-				self.warnings.append(("dependency-is-testing-release %s", i))
+		for i in Namcap.package.testing_releases(list(scriptlist)):
+			self.warnings.append(("dependency-is-testing-release %s", i))
 
 # vim: set ts=4 sw=4 noet:
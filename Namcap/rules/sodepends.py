@@ -24,52 +24,49 @@
 from collections import defaultdict
 import re
 import os
-import subprocess
+import Namcap.fileindex
 import Namcap.package
 from Namcap.ruleclass import *
-from Namcap.util import is_elf
-from Namcap.rules.rpath import get_rpaths
+from Namcap.elf import elf_summary
+from Namcap.ldcache import elf_architecture, load_ld_cache
 
-from elftools.elf.enums import ENUM_D_TAG
-from elftools.elf.elffile import ELFFile
-from elftools.elf.dynamic import DynamicSection
+def scanlibs(fileobj):
+	"""
+	Find shared libraries in a file-like binary object
+
+	returns: a tuple (architecture, [names of the needed libraries])
+	"""
+
+	elffile = elf_summary(fileobj)
+	if elffile is None:
+		return None, []
 
-libcache = {'i686': {}, 'x86-64': {}}
+	architecture = elf_architecture(elffile.elfclass, elffile.e_machine)
+	# DT_NEEDED means shared library
+	return architecture, elffile.needed
 
-def scanlibs(fileobj, filename, custom_libs):
+def resolvelibs(architecture, needed, filename, custom_libs, libcache):
 	"""
-	Find shared libraries in a file-like binary object
+	Find the paths of the shared libraries needed by a file
 
-	If it depends on a library, store that library's path.
+	If it depends on a library, store that library's path, as known
+	from custom_libs or from libcache (see Namcap.ldcache).
 
 	returns: a dictionary { library => set(ELF files using that library) }
 	"""
 
-	if not is_elf(fileobj):
-		return {}
-
-	elffile = ELFFile(fileobj)
 	sharedlibs = defaultdict(set)
-	for section in elffile.iter_sections():
-		if not isinstance(section, DynamicSection):
+	for libname in needed:
+		if libname in custom_libs:
+			sharedlibs[custom_libs[libname][1:]].add(filename)
 			continue
-		for tag in section.iter_tags():
-			# DT_NEEDED means shared library
-			if tag.entry.d_tag != 'DT_NEEDED':
-				continue
-			bitsize = elffile.elfclass
-			architecture = {32:'i686', 64:'x86-64'}[bitsize]
-			libname = tag.needed
-			if libname in custom_libs:
-				sharedlibs[custom_libs[libname][1:]].add(filename)
-				continue
-			try:
-				libpath = os.path.abspath(
-						libcache[architecture][libname])[1:]
-				sharedlibs[libpath].add(filename)
-			except KeyError:
-				# We didn't know about the library, so add it for fail later
-				sharedlibs[libname].add(filename)
+		try:
+			libpath = os.path.abspath(
+					libcache[architecture][libname])[1:]
+			sharedlibs[libpath].add(filename)
+		except KeyError:
+			# We didn't know about the library, so add it for fail later
+			sharedlibs[libname].add(filename)
 	return sharedlibs
 
 def finddepends(liblist):
@@ -97,63 +94,56 @@ def finddepends(liblist):
 	# Whether we should even look at a particular file
 	is_so = re.compile('\.so')
 
-	for pkg in Namcap.package.get_installed_packages():
-		for j, fsize, fmode in pkg.files:
+	index = Namcap.fileindex.local_file_index()
+	for k in knownlibs:
+		for j, owner in index.with_prefix(actualpath[k]):
 			if not is_so.search(j):
 				continue
 
-			for k in knownlibs:
-				# File must be an exact match or have the right .so ending numbers
-				# i.e. gpm includes libgpm.so and libgpm.so.1.19.0, but everything links to libgpm.so.1
-				# We compare find libgpm.so.1.19.0 startswith libgpm.so.1 and .19.0 matches the regexp
-				if j == actualpath[k] or (j.startswith(actualpath[k]) and so_end.match(j[len(actualpath[k]):])):
-					dependlist[pkg.name].add(k)
-					foundlibs.add(k)
+			# File must be an exact match or have the right .so ending numbers
+			# i.e. gpm includes libgpm.so and libgpm.so.1.19.0, but everything links to libgpm.so.1
+			# We compare find libgpm.so.1.19.0 startswith libgpm.so.1 and .19.0 matches the regexp
+			if j == actualpath[k] or so_end.match(j[len(actualpath[k]):]):
+				dependlist[owner].add(k)
+				foundlibs.add(k)
 
 	orphans = list(knownlibs - foundlibs)
 	return dependlist, orphans
 
-def filllibcache():
-	var = subprocess.Popen('ldconfig -p', 
-			env = {"LANG": "C"},
-			shell=True,
-			stdout=subprocess.PIPE,
-			stderr=subprocess.PIPE).communicate()
-	libline = re.compile('\s*(.*) \((.*)\) => (.*)')
-	for j in var[0].decode('ascii').splitlines():
-		g = libline.match(j)
-		if g != None:
-			if g.group(2).startswith('libc6,x86-64'):
-				libcache['x86-64'][g.group(1)] = g.group(3)
-			else:
-				# TODO: This is bogus; what do non x86-architectures print?
-				libcache['i686'][g.group(1)] = g.group(3)
-
-
 class SharedLibsRule(TarballRule):
 	name = "sodepends"
 	description = "Checks dependencies caused by linked shared libraries"
-	def analyze(self, pkginfo, tar):
+	writes_detected_deps = True
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.libcache = load_ld_cache()
+		self.pkg_so_files = []
+		self.elffiles = []
+
+	def analyze_member(self, pkginfo, entry, f):
+		if '.so' in entry.name:
+			self.pkg_so_files.append('/' + entry.name)
+		if not entry.isfile():
+			return
+		elffile = elf_summary(f)
+		if elffile is None:
+			return
+		# find anything that could be rpath related
+		architecture, needed = scanlibs(f)
+		self.elffiles.append((entry.name, elffile.rpaths, architecture, needed))
+
+	def finalize(self, pkginfo):
 		liblist = {}
 		dependlist = {}
-		filllibcache()
-		os.environ['LC_ALL'] = 'C'
-		pkg_so_files = ['/' + n for n in tar.getnames() if '.so' in n]
 
-		for entry in tar:
-			if not entry.isfile():
-				continue
-			f = tar.extractfile(entry)
-			# find anything that could be rpath related
+		# libraries of the package itself are only known after the scan
+		for filename, rpaths, architecture, needed in self.elffiles:
 			rpath_files = {}
-			if is_elf(f):
-				rpaths = list(get_rpaths(f))
-				f.seek(0)
-				for n in pkg_so_files:
-					if any(n.startswith(rp) for rp in rpaths):
-						rpath_files[os.path.basename(n)] = n
-			liblist.update(scanlibs(f, entry.name, rpath_files))
-			f.close()
+			for n in self.pkg_so_files:
+				if any(n.startswith(rp) for rp in rpaths):
+					rpath_files[os.path.basename(n)] = n
+			liblist.update(resolvelibs(architecture, needed, filename,
+				rpath_files, self.libcache))
 
 		# Ldd all the files and find all the link and script dependencies
 		dependlist, orphans = finddepends(liblist)
@@ -175,10 +165,7 @@ class SharedLibsRule(TarballRule):
 				self.infos.append(("link-level-dependence %s in %s", (pkg, str(files))))
 
 		# Check for packages in testing
-		for i in dependlist.keys():
-			p = Namcap.package.load_testing_package(i)
-			q = Namcap.package.load_from_db(i)
-			if p is not None and q is not None and p["version"] == q["version"] :
-				self.warnings.append(("dependency-is-testing-release %s", i))
+		for i in Namcap.package.testing_releases(list(dependlist.keys())):
+			self.warnings.append(("dependency-is-testing-release %s", i))
 
 # vim: set ts=4 sw=4 noet:
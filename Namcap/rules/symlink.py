@@ -23,8 +23,14 @@ from Namcap.package import load_from_db
 class package(TarballRule):
 	name = "symlink"
 	description = "Checks that symlinks point to the right place"
-	def analyze(self, pkginfo, tar):
-		filenames = set(s.name for s in tar)
+	def prepare(self, pkginfo):
+		self.members = []
+
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.members.append(entry)
+
+	def finalize(self, pkginfo):
+		filenames = set(s.name for s in self.members)
 		depfilenames = set()
 		for d in pkginfo['depends']:
 			p = load_from_db(d)
@@ -32,7 +38,7 @@ class package(TarballRule):
 				continue
 			depfilenames |= set(name for name,_,_ in p['files'])
 		filenames |= depfilenames
-		for i in tar:
+		for i in self.members:
 			if i.issym():
 				self.infos.append(("symlink-found %s points to %s", (i.name, i.linkname)))
 				linktarget = i.linkname
@@ -23,7 +23,8 @@ from Namcap.ruleclass import *
 class systemdlocationRule(TarballRule):
 	name = "systemdlocation"
 	description = "Checks for systemd files in /etc/systemd/system/"
-	def analyze(self, pkginfo, tar):
+	metadata_only = True
+	def analyze_member(self, pkginfo, entry, fileobj):
 		# don't have this warning for the systemd package
 		if 'name' in pkginfo:
 			if pkginfo['name'] == 'systemd':
@@ -32,15 +33,14 @@ class systemdlocationRule(TarballRule):
 		if 'provides' in pkginfo:
 			if 'systemd' in pkginfo['provides']:
 				return
-		for entry in tar:
-			# ignore the actual directory, as that's handled by emptydirs
-			if entry.isdir():
-				continue;
+		# ignore the actual directory, as that's handled by emptydirs
+		if entry.isdir():
+			return
 
-			name = os.path.normpath(entry.name)
+		name = os.path.normpath(entry.name)
 
-			# check for files in /etc/systemd/system/
-			if name.startswith('etc/systemd/system/'):
-				self.warnings.append(("systemd-location %s", name))
+		# check for files in /etc/systemd/system/
+		if name.startswith('etc/systemd/system/'):
+			self.warnings.append(("systemd-location %s", name))
 
 # vim: set ts=4 sw=4 noet:
@@ -18,59 +18,143 @@
 #   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 #
 
-import os, subprocess, re
-import tempfile
-from Namcap.util import is_elf, clean_filename
+import os
+import threading
+from Namcap.elf import dynamic_symbols, elf_summary
+from Namcap.ldcache import elf_architecture, load_ld_cache
 from Namcap.ruleclass import *
 
-libre = re.compile('^\t(/.*)')
-lddfail = re.compile('^\tnot a dynamic executable')
+# where the dynamic linker looks after the ld.so.cache
+DEFAULT_LIBRARY_DIRS = ['/usr/lib', '/lib', '/usr/lib64', '/lib64']
 
-def get_unused_sodepends(filename):
-	p = subprocess.Popen(["ldd", "-r", "-u", filename],
-		env={'LANG': 'C'},
-		stdout=subprocess.PIPE,
-		stderr=subprocess.PIPE)
-	var = p.communicate()
-	if p.returncode == 0:
-		return
-	for j in var[0].decode('ascii').splitlines():
-		# Don't raise an error, as the executable might be a valid ELF file,
-		# just not a dynamically linked one
-		n = lddfail.search(j)
-		if n is not None:
-			return
+# (path, mtime, size) => symbols exported by a library
+_exports = {}
+# (path, mtime, size) => (ELF class, machine) of a library
+_architectures = {}
+_exports_lock = threading.Lock()
+
+def library_exports(path):
+	"""
+	Returns the set of symbols exported by an installed library, None if
+	it cannot be read. Tables are kept for the whole process.
+	"""
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	key = (path, st.st_mtime_ns, st.st_size)
+	with _exports_lock:
+		if key in _exports:
+			return _exports[key]
+	try:
+		with open(path, 'rb') as f:
+			symbols = dynamic_symbols(f)
+	except Exception:
+		# pyelftools raises various errors on broken files
+		symbols = None
+	exports = frozenset(symbols.exported) if symbols is not None else None
+	with _exports_lock:
+		_exports[key] = exports
+	return exports
+
+def library_architecture(path):
+	"""
+	Returns the (ELF class, machine) of an installed library, None if it
+	is not an ELF file or cannot be read
+	"""
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	key = (path, st.st_mtime_ns, st.st_size)
+	with _exports_lock:
+		if key in _architectures:
+			return _architectures[key]
+	try:
+		with open(path, 'rb') as f:
+			summary = elf_summary(f)
+	except Exception:
+		summary = None
+	architecture = None
+	if summary is not None:
+		architecture = (summary.elfclass, summary.e_machine)
+	with _exports_lock:
+		_architectures[key] = architecture
+	return architecture
+
+def find_library(name, elffile, libcache):
+	"""
+	Returns the path the dynamic linker would load a DT_NEEDED entry from.
+	Like the dynamic linker, libraries of another ELF class or machine
+	are skipped.
+	"""
+	def loadable(path):
+		return (os.path.isfile(path) and library_architecture(path)
+				== (elffile.elfclass, elffile.e_machine))
+	if '/' in name:
+		return name if loadable(name) else None
+	# DT_RPATH is ignored when there is a DT_RUNPATH. Paths relative to
+	# $ORIGIN point inside the package, which is not installed.
+	searchpath = elffile.runpaths or elffile.rpaths
+	for d in searchpath:
+		if d.startswith('/') and '$' not in d:
+			path = os.path.join(d, name)
+			if loadable(path):
+				return path
+	architecture = elf_architecture(elffile.elfclass, elffile.e_machine)
+	path = libcache.get(architecture, {}).get(name)
+	if path is not None:
+		return path
+	for d in DEFAULT_LIBRARY_DIRS:
+		path = os.path.join(d, name)
+		if loadable(path):
+			return path
+	return None
+
+def get_unused_sodepends(elffile, symbols, libcache):
+	"""
+	Yields the paths of the DT_NEEDED libraries none of the undefined
+	symbols of a file binds to. A symbol binds to the first library
+	defining it, in DT_NEEDED order like the dynamic linker. Libraries
+	which cannot be found or read are left alone.
+	"""
+	libraries = []
+	for name in elffile.needed:
+		path = find_library(name, elffile, libcache)
+		if path is None or any(path == p for p, e in libraries):
+			continue
+		exports = library_exports(path)
+		if exports is not None:
+			libraries.append((path, exports))
 
-		n = libre.search(j)
-		if n is not None:
-			yield n.group(1)
+	used = set()
+	for symbol in symbols.undefined:
+		for path, exports in libraries:
+			if symbol in exports:
+				used.add(path)
+				break
+	for path, exports in libraries:
+		if path not in used:
+			yield path
 
 class package(TarballRule):
 	name = "unusedsodepends"
 	description = "Checks for unused dependencies caused by linked shared libraries"
-	def analyze(self, pkginfo, tar):
-		for entry in tar:
-			if not entry.isfile():
-				continue
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.libcache = load_ld_cache()
 
-			# is it an ELF file ?
-			f = tar.extractfile(entry)
-			if not is_elf(f):
-				f.close()
-				continue
-			elf = f.read()
-			f.close()
-
-			# write it to a temporary file
-			f = tempfile.NamedTemporaryFile(delete = False)
-			f.write(elf)
-			f.close()
-
-			os.chmod(f.name, 0o755)
+	def analyze_member(self, pkginfo, entry, f):
+		if not entry.isfile():
+			return
 
-			for lib in get_unused_sodepends(f.name):
-				self.warnings.append(("unused-sodepend %s %s", (lib, entry.name)))
+		# is it a dynamically linked ELF file ?
+		elffile = elf_summary(f)
+		if elffile is None or not elffile.needed:
+			return
+		symbols = dynamic_symbols(f)
 
-			os.unlink(f.name)
+		for lib in get_unused_sodepends(elffile, symbols, self.libcache):
+			self.warnings.append(("unused-sodepend %s %s", (lib, entry.name)))
 
 # vim: set ts=4 sw=4 noet:
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - concurrent execution of the rules of a package
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Runs the rules of a binary package concurrently.
+
+The archive itself is read by a single thread, since tarfile objects
+cannot be shared. Everything else, i.e. the metadata rules and the
+finalize() step of tarball rules, where most of the database lookups
+and external commands happen, is run on a pool of worker threads.
+The database lookups themselves are serialized by
+Namcap.package.alpm_lock, libalpm not being known to be thread-safe.
+
+Rules writing to pkginfo.detected_deps (writes_detected_deps) are
+producers for the dependency analysis. Each of them works on its own
+copy of detected_deps, merged back in rule order when they are all
+done, so that the reasons given in messages do not depend on thread
+scheduling. Namcap.depends.analyze_depends() starts at that point,
+while the other rules may still be running.
+"""
+
+import collections
+import concurrent.futures
+import copy
+import os
+
+import Namcap.depends
+import Namcap.profile
+from Namcap.ruleclass import *
+
+WORKERS = min(8, os.cpu_count() or 1)
+
+def private_deps(pkginfo):
+	"Returns a copy of pkginfo sharing its metadata but not detected_deps"
+	clone = copy.copy(pkginfo)
+	clone.detected_deps = collections.defaultdict(list)
+	return clone
+
+def merge_deps(pkginfo, clones):
+	"Adds the dependencies detected in copies of pkginfo to pkginfo"
+	for clone in clones:
+		for dep, reasons in clone.detected_deps.items():
+			pkginfo.detected_deps.setdefault(dep, []).extend(reasons)
+
+def _run_sequence(calls):
+	for function, args in calls:
+		function(*args)
+
+def run_rules(pkginfo, tar, rules, workers = WORKERS, facts = None):
+	"""
+	Runs PkgInfoRule and TarballRule objects over a binary package, then
+	the dependency analysis. Messages are left in the rule objects, the
+	result of analyze_depends() is returned. facts is passed on to
+	scan_members().
+	"""
+	clones = []
+	rule_pkginfo = []
+	for rule in rules:
+		if rule.writes_detected_deps or (isinstance(rule, TarballRule)
+				and not uses_member_callbacks(rule)):
+			# rules not using the member callbacks are unknown ground
+			clone = private_deps(pkginfo)
+			clones.append(clone)
+			rule_pkginfo.append((rule, clone, True))
+		else:
+			rule_pkginfo.append((rule, pkginfo, False))
+
+	member_rules = [(r, p, producer) for r, p, producer in rule_pkginfo
+			if isinstance(r, TarballRule) and uses_member_callbacks(r)]
+	whole_rules = [(r, p) for r, p, _ in rule_pkginfo
+			if isinstance(r, TarballRule) and not uses_member_callbacks(r)]
+
+	producers = []
+	others = []
+	with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+		for rule, info, producer in rule_pkginfo:
+			if isinstance(rule, PkgInfoRule):
+				future = executor.submit(rule.analyze, info, None)
+				(producers if producer else others).append(future)
+
+		for rule, info, _ in member_rules:
+			rule.prepare(info)
+		with Namcap.profile.stage('scan_members'):
+			scan_members(tar, [(rule, info) for rule, info, _ in member_rules],
+					facts)
+		for rule, info, producer in member_rules:
+			future = executor.submit(rule.finalize, info)
+			(producers if producer else others).append(future)
+
+		# the tarball cannot be used by several threads at once
+		if whole_rules:
+			producers.append(executor.submit(_run_sequence,
+				[(rule.analyze, (info, tar)) for rule, info in whole_rules]))
+
+		for future in producers:
+			future.result()
+		merge_deps(pkginfo, clones)
+		depends = executor.submit(Namcap.profile.timed('analyze_depends',
+			Namcap.depends.analyze_depends), pkginfo)
+
+		for future in others:
+			future.result()
+		return depends.result()
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,754 @@
+# -*- coding: utf-8 -*-
+#
+# namcap - Static evaluation of simple PKGBUILDs
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""
+Most PKGBUILDs only assign strings and arrays. This module evaluates that
+subset of bash (quoting, parameter and brace expansion, word splitting,
+and the assignments made by the package_* functions of split PKGBUILDs)
+and produces the output parsepkgbuild.sh would print, without starting
+bash. Anything it cannot evaluate exactly raises Unsupported, and the
+PKGBUILD is then given to bash.
+"""
+
+import glob
+import os
+import re
+import tempfile
+import threading
+
+import Namcap.util
+
+class Unsupported(Exception):
+	"The PKGBUILD uses shell features the static evaluator does not handle"
+
+MAKEPKG_CONF = '/etc/makepkg.conf'
+
+ASSIGNMENT = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)(\+?)=')
+VARIABLE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)(?:\[(@|\*|[0-9]+)\])?')
+NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+NAME_CHARACTER = re.compile(r'[A-Za-z0-9_]')
+FUNCNAME = r'[A-Za-z_][A-Za-z0-9_.@+:-]*'
+FUNCTION = re.compile(r'(?:function[ \t]+)?(%s)[ \t]*\([ \t]*\)[ \t]*\n?[ \t]*\{(?=[ \t\n])'
+		r'|function[ \t]+(%s)[ \t]*\n?[ \t]*\{(?=[ \t\n])' % (FUNCNAME, FUNCNAME))
+FUNCTION_LINE = re.compile(r'^(?:function[ \t]+)?%s[ \t]*\([ \t]*\)' % FUNCNAME, re.M)
+FUNCTION_END = re.compile(r'^\}[ \t]*(?:#.*)?$', re.M)
+IFS_WHITESPACE = re.compile(r'[ \t\n]+')
+ECHO_OPTION = re.compile(r'-[neE]+')
+METACHARACTERS = ' \t\n;&|()<>'
+
+KEYWORDS = {'if', 'then', 'else', 'elif', 'fi', 'for', 'while', 'until',
+		'do', 'done', 'case', 'esac', 'select', 'function', 'in', 'time',
+		'{', '}', '[[', ']]', '!', 'coproc'}
+BUILTINS = {'.', '[', 'alias', 'bg', 'bind', 'break', 'builtin', 'caller',
+		'command', 'compgen', 'complete', 'compopt', 'continue', 'declare',
+		'dirs', 'disown', 'echo', 'enable', 'eval', 'exec', 'exit', 'export',
+		'fc', 'fg', 'getopts', 'hash', 'help', 'history', 'jobs', 'kill', 'let',
+		'local', 'logout', 'mapfile', 'popd', 'printf', 'pushd', 'pwd', 'read',
+		'readarray', 'readonly', 'set', 'shift', 'shopt', 'source', 'suspend',
+		'test', 'times', 'trap', 'type', 'typeset', 'ulimit', 'umask',
+		'unalias', 'unset', 'wait'}
+
+# arrays printed by parsepkgbuild.sh after %FORCE%, in order
+ARRAY_FIELDS = [('depends', 'DEPENDS'),
+		('makedepends', 'MAKEDEPENDS'), ('optdepends', 'OPTDEPENDS'),
+		('conflicts', 'CONFLICTS'), ('provides', 'PROVIDES'),
+		('backup', 'BACKUP'), ('options', 'OPTIONS'), ('source', 'SOURCE'),
+		('validpgpkeys', 'VALIDGPGKEYS'), ('md5sums', 'MD5SUMS'),
+		('sha1sums', 'SHA1SUMS'), ('sha256sums', 'SHA256SUMS'),
+		('sha384sums', 'SHA384SUMS'), ('sha512sums', 'SHA512SUMS')]
+
+class Return(Exception):
+	"`return` in a function body"
+
+class Lexer(object):
+	"""
+	Splits shell code into tokens: ('word', parts), ('array', name,
+	append, words), ('op', operator) and ('eof',). Parts of words are
+	('lit', text) for unquoted text, ('q', text) for quoted text,
+	('var', name, index, quoted, braced) for parameter expansions and
+	('complex', text, quoted) for the ones which cannot be evaluated.
+	"""
+	def __init__(self, text):
+		self.text = text
+		self.pos = 0
+
+	def peek(self):
+		return self.text[self.pos] if self.pos < len(self.text) else ''
+
+	def skip_blanks(self):
+		text = self.text
+		while self.pos < len(text):
+			if text[self.pos] in ' \t':
+				self.pos += 1
+			elif text.startswith('\\\n', self.pos):
+				self.pos += 2
+			else:
+				break
+
+	def skip_lines(self):
+		"Skips blanks, comments and empty lines"
+		while True:
+			self.skip_blanks()
+			c = self.peek()
+			if c == '#':
+				self.skip_comment()
+			elif c in ('\n', ';'):
+				self.pos += 1
+			else:
+				break
+
+	def skip_comment(self):
+		end = self.text.find('\n', self.pos)
+		self.pos = len(self.text) if end < 0 else end
+
+	def token(self):
+		self.skip_blanks()
+		c = self.peek()
+		if not c:
+			return ('eof',)
+		if c == '#':
+			self.skip_comment()
+			return self.token()
+		two = self.text[self.pos:self.pos + 2]
+		if two in ('&&', '||', '>>'):
+			self.pos += 2
+			return ('op', two)
+		if two in (';;', '<<', '<(', '>(', '&>'):
+			raise Unsupported(two)
+		if c == '&':
+			raise Unsupported(c)
+		if c in METACHARACTERS:
+			self.pos += 1
+			return ('op', c)
+		return self.word()
+
+	def word(self):
+		text = self.text
+		parts = []
+		def literal(s):
+			if parts and parts[-1][0] == 'lit':
+				parts[-1] = ('lit', parts[-1][1] + s)
+			else:
+				parts.append(('lit', s))
+		while self.pos < len(text):
+			c = text[self.pos]
+			if c == '(' and len(parts) == 1 and parts[0][0] == 'lit':
+				m = ASSIGNMENT.fullmatch(parts[0][1])
+				if m is not None:
+					self.pos += 1
+					return ('array', m.group(1), bool(m.group(2)), self.array())
+			if c in METACHARACTERS:
+				break
+			if c == '\\':
+				if text.startswith('\\\n', self.pos):
+					self.pos += 2
+				elif self.pos + 1 < len(text):
+					parts.append(('q', text[self.pos + 1]))
+					self.pos += 2
+				else:
+					literal(c)
+					self.pos += 1
+			elif c == "'":
+				end = text.find("'", self.pos + 1)
+				if end < 0:
+					raise Unsupported("unterminated quote")
+				parts.append(('q', text[self.pos + 1:end]))
+				self.pos = end + 1
+			elif c == '"':
+				self.pos += 1
+				self.double_quoted(parts)
+			elif c == '$':
+				part = self.dollar(False)
+				if part[0] == 'lit':
+					literal(part[1])
+				else:
+					parts.append(part)
+			elif c == '`':
+				raise Unsupported("command substitution")
+			else:
+				literal(c)
+				self.pos += 1
+		return ('word', parts)
+
+	def double_quoted(self, parts):
+		text = self.text
+		buf = []
+		only_text = True
+		while True:
+			if self.pos >= len(text):
+				raise Unsupported("unterminated quote")
+			c = text[self.pos]
+			if c == '"':
+				self.pos += 1
+				break
+			if c == '\\' and self.pos + 1 < len(text):
+				n = text[self.pos + 1]
+				if n in '$`"\\':
+					buf.append(n)
+				elif n != '\n':
+					buf.append(c + n)
+				self.pos += 2
+			elif c == '$':
+				part = self.dollar(True)
+				if part[0] == 'lit':
+					buf.append(part[1])
+				else:
+					if buf:
+						parts.append(('q', ''.join(buf)))
+						buf = []
+					parts.append(part)
+					only_text = False
+			elif c == '`':
+				raise Unsupported("command substitution")
+			else:
+				buf.append(c)
+				self.pos += 1
+		# "" is an empty word of its own, unlike "${empty[@]}"
+		if buf or only_text:
+			parts.append(('q', ''.join(buf)))
+
+	def dollar(self, quoted):
+		"Reads a parameter expansion, self.pos being on the $"
+		text = self.text
+		self.pos += 1
+		c = self.peek()
+		if c == '{':
+			depth = 0
+			for end in range(self.pos, len(text)):
+				if text[end] == '{':
+					depth += 1
+				elif text[end] == '}':
+					depth -= 1
+					if depth == 0:
+						break
+			else:
+				raise Unsupported("unterminated parameter expansion")
+			content = text[self.pos + 1:end]
+			self.pos = end + 1
+			m = VARIABLE.fullmatch(content)
+			if m is not None:
+				return ('var', m.group(1), m.group(2), quoted, True)
+			if ('$(' in content or '`' in content
+					or re.match(r'[A-Za-z_][A-Za-z0-9_]*:?[=?]', content)):
+				raise Unsupported("parameter expansion with side effects")
+			return ('complex', content, quoted)
+		if c == '(':
+			raise Unsupported("command substitution")
+		if not quoted and c in ('"', "'"):
+			raise Unsupported("$'' quoting")
+		m = NAME.match(text, self.pos)
+		if m is not None:
+			self.pos = m.end()
+			return ('var', m.group(), None, quoted, False)
+		if c and (c.isdigit() or c in '@*#?$!-'):
+			self.pos += 1
+			return ('complex', c, quoted)
+		return ('lit', '$')
+
+	def array(self):
+		"Reads the words of an array assignment, up to the closing parenthesis"
+		words = []
+		while True:
+			tok = self.token()
+			if tok[0] == 'word':
+				words.append(tok[1])
+			elif tok == ('op', ')'):
+				return words
+			elif tok != ('op', '\n'):
+				raise Unsupported("unexpected %r in an array" % (tok,))
+
+	def command(self):
+		"""
+		Reads a simple command, returns its words and array assignments
+		and the operator ending it ('\\n', ';', '&&', '||' or 'eof')
+		"""
+		items = []
+		while True:
+			tok = self.token()
+			if tok[0] in ('word', 'array'):
+				items.append(tok)
+			elif tok[0] == 'eof':
+				return items, 'eof'
+			elif tok[1] in ('\n', ';', '&&', '||'):
+				return items, tok[1]
+			else:
+				raise Unsupported("unexpected %r" % tok[1])
+
+	def function(self):
+		"""
+		Reads a function definition at the current position, if any, and
+		returns (name, body). Only the usual layouts are recognized, the
+		body of a function spanning several lines ending with a line
+		holding a lone closing brace.
+		"""
+		m = FUNCTION.match(self.text, self.pos)
+		if m is None:
+			return None
+		name = m.group(1) or m.group(2)
+		start = m.end()
+		eol = self.text.find('\n', start)
+		if eol < 0:
+			eol = len(self.text)
+		# function on a single line
+		depth = 1
+		for i in range(start, eol):
+			if self.text[i] == '{':
+				depth += 1
+			elif self.text[i] == '}':
+				depth -= 1
+				if depth == 0:
+					self.pos = i + 1
+					return name, self.text[start:i]
+		end = FUNCTION_END.search(self.text, eol)
+		if end is None:
+			raise Unsupported("cannot find the end of %s()" % name)
+		body = self.text[start:end.start()]
+		if '<<' in body or FUNCTION_LINE.search(body):
+			raise Unsupported("cannot find the end of %s()" % name)
+		self.pos = end.start() + 1
+		return name, body
+
+class Evaluator(object):
+	"""
+	Evaluates assignments into a dictionary { name => list of values },
+	scalars being arrays of a single value like in bash.
+	"""
+	def __init__(self, directory, reserved = frozenset(), environ = None):
+		self.directory = directory
+		# variables set by bash, which are not evaluated
+		self.reserved = reserved
+		# initial values of the variables, instead of those of bash
+		self.environ = environ
+		self.variables = {}
+		self.functions = {}
+
+	def lookup(self, name, index = None):
+		values = self.variables.get(name)
+		if values is None:
+			if self.environ is not None:
+				values = self.environ.get(name, [])
+			elif name == 'CARCH':
+				carch = get_carch()
+				if carch is None:
+					raise Unsupported("cannot read CARCH")
+				values = [carch]
+			elif name in self.reserved:
+				raise Unsupported("$%s" % name)
+			else:
+				values = []
+		if index is None:
+			return values[:1]
+		if index == '@':
+			return values
+		if index == '*':
+			raise Unsupported("${%s[*]}" % name)
+		index = int(index)
+		return values[index:index + 1]
+
+	def scalar(self, parts):
+		"The value of a word in an assignment, which is not split"
+		value = []
+		for part in parts:
+			if part[0] in ('lit', 'q'):
+				if part[0] == 'lit' and '~' in part[1]:
+					raise Unsupported("tilde expansion")
+				value.append(part[1])
+			elif part[0] == 'var':
+				value.append(' '.join(self.lookup(part[1], part[2])))
+			else:
+				raise Unsupported("${%s}" % part[1])
+		return ''.join(value)
+
+	def fields(self, parts):
+		"The words a word expands to"
+		result = []
+		atoms = []
+		for part in parts:
+			if part[0] == 'lit':
+				if part[1].startswith('~') and not atoms:
+					raise Unsupported("tilde expansion")
+				atoms.extend(part[1])
+			else:
+				atoms.append(part)
+		for alternative in brace_expansion(atoms):
+			result.extend(self.split(variable_names(alternative)))
+		for field in result:
+			self.check_glob(field)
+		return result
+
+	def split(self, atoms):
+		"Parameter expansion and word splitting"
+		fields = []
+		cur = None
+		for atom in atoms:
+			if isinstance(atom, str):
+				cur = (cur or '') + atom
+			elif atom[0] == 'q':
+				cur = (cur or '') + atom[1]
+			elif atom[0] == 'var' and atom[3]:
+				values = self.lookup(atom[1], atom[2])
+				if atom[2] == '@':
+					if values:
+						cur = (cur or '') + values[0]
+						for v in values[1:]:
+							fields.append(cur)
+							cur = v
+				else:
+					cur = (cur or '') + (values[0] if values else '')
+			elif atom[0] == 'var':
+				text = ' '.join(self.lookup(atom[1], atom[2]))
+				if text[:1] in (' ', '\t', '\n') and cur is not None:
+					fields.append(cur)
+					cur = None
+				words = [w for w in IFS_WHITESPACE.split(text) if w]
+				for k, w in enumerate(words):
+					if k > 0:
+						fields.append(cur)
+						cur = None
+					cur = (cur or '') + w
+				if text[-1:] in (' ', '\t', '\n') and cur is not None:
+					fields.append(cur)
+					cur = None
+			else:
+				raise Unsupported("${%s}" % atom[1])
+		if cur is not None:
+			fields.append(cur)
+		return fields
+
+	def check_glob(self, word):
+		"Gives up on words bash would replace by the files they match"
+		if glob.has_magic(word) and glob.glob(os.path.join(self.directory, word)):
+			raise Unsupported("pathname expansion")
+
+	def assign(self, item):
+		if item[0] == 'array':
+			tok, name, append, words = item
+			values = []
+			for word in words:
+				values.extend(self.fields(word))
+		else:
+			parts = item[1]
+			m = ASSIGNMENT.match(parts[0][1])
+			name, append = m.group(1), bool(m.group(2))
+			rest = parts[0][1][m.end():]
+			value = self.scalar(([('lit', rest)] if rest else []) + parts[1:])
+		if name in self.reserved:
+			raise Unsupported("assignment to %s" % name)
+		old = self.variables.get(name)
+		if old is None and self.environ is not None:
+			old = self.environ.get(name)
+		old = list(old or [])
+		if item[0] == 'array':
+			self.variables[name] = old + values if append else values
+		elif not old:
+			self.variables[name] = [value]
+		else:
+			old[0] = old[0] + value if append else value
+			self.variables[name] = old
+
+	def is_assignment(self, item):
+		return item[0] == 'array' or (item[1] and item[1][0][0] == 'lit'
+				and ASSIGNMENT.match(item[1][0][1]) is not None)
+
+	def command(self, items, toplevel):
+		"Runs a simple command and returns its exit status"
+		assignments = []
+		while items and self.is_assignment(items[0]):
+			assignments.append(items.pop(0))
+		if not items:
+			for item in assignments:
+				self.assign(item)
+			return 0
+		if toplevel or any(item[0] != 'word' for item in items):
+			raise Unsupported("command")
+		name = items[0][1]
+		if not all(part[0] in ('lit', 'q') for part in name):
+			raise Unsupported("command name")
+		name = ''.join(part[1] for part in name)
+		if name == 'return':
+			raise Return()
+		if name in (':', 'true'):
+			return 0
+		if name == 'false':
+			return 1
+		if name == 'cd' or '/' in name:
+			# refused by the restricted shell
+			return 1
+		if (name in BUILTINS or name in KEYWORDS or name in self.functions
+				or '=' in name or not name):
+			raise Unsupported("command %s" % name)
+		# not found in the empty PATH of parsepkgbuild
+		return 127
+
+	def run(self, text, toplevel = True):
+		"Evaluates the top level of a PKGBUILD or a function body"
+		lexer = Lexer(text)
+		status = 0
+		last = None
+		while True:
+			lexer.skip_lines()
+			function = lexer.function()
+			if function is not None:
+				if not toplevel:
+					raise Unsupported("nested function")
+				self.functions[function[0]] = function[1]
+				continue
+			items, op = lexer.command()
+			if not items:
+				if last is not None or op in ('&&', '||'):
+					raise Unsupported("syntax error")
+			elif toplevel and (last is not None or op in ('&&', '||')):
+				raise Unsupported("command list")
+			elif last is None or (last == '&&') == (status == 0):
+				status = self.command(items, toplevel)
+			last = op if op in ('&&', '||') else None
+			if op == 'eof':
+				return
+
+	def call(self, name):
+		"Runs a function defined by the PKGBUILD"
+		try:
+			self.run(self.functions[name], toplevel = False)
+		except Return:
+			pass
+
+def variable_names(atoms):
+	"""
+	Bash expands braces before parameters: $a{b,c} is $ab $ac. Appends
+	the name characters following a $name to its name.
+	"""
+	result = []
+	for atom in atoms:
+		last = result[-1] if result else None
+		if (isinstance(atom, str) and isinstance(last, tuple) and last[0] == 'var'
+				and not last[3] and not last[4] and NAME_CHARACTER.match(atom)):
+			result[-1] = ('var', last[1] + atom) + last[2:]
+		else:
+			result.append(atom)
+	return result
+
+def brace_expansion(atoms):
+	"""
+	Brace expansion of a word given as a list of atoms: characters for
+	the unquoted parts, tuples for the others
+	"""
+	for i, atom in enumerate(atoms):
+		if atom != '{':
+			continue
+		depth = 0
+		commas = []
+		for j in range(i, len(atoms)):
+			if atoms[j] == '{':
+				depth += 1
+			elif atoms[j] == '}':
+				depth -= 1
+				if depth == 0:
+					break
+			elif atoms[j] == ',' and depth == 1:
+				commas.append(j)
+		else:
+			continue
+		if not commas:
+			if '..' in ''.join(a for a in atoms[i:j] if isinstance(a, str)):
+				raise Unsupported("sequence expression")
+			continue
+		result = []
+		bounds = [i] + commas + [j]
+		for start, end in zip(bounds, bounds[1:]):
+			result.extend(brace_expansion(atoms[:i] + atoms[start + 1:end] + atoms[j + 1:]))
+		return result
+	return [atoms]
+
+def echo_words(value, glob_check):
+	"What `echo $i` prints"
+	words = [w for w in IFS_WHITESPACE.split(value) if w]
+	for w in words:
+		glob_check(w)
+	if words and ECHO_OPTION.fullmatch(words[0]):
+		raise Unsupported("echo option")
+	return ' '.join(words)
+
+def echo_escapes(value):
+	"What `echo -e` prints, as long as there is nothing to interpret"
+	if '\\' in value:
+		raise Unsupported("echo -e escapes")
+	return value
+
+def pkginfo(evaluator, setvars):
+	"The output of the pkginfo function of parsepkgbuild.sh"
+	def first(name):
+		values = evaluator.lookup(name)
+		return values[0] if values else ''
+	out = []
+	if first('pkgname'):
+		out.append('%%NAME%%\n%s\n\n' % echo_escapes(first('pkgname')))
+		out.append('%%VERSION%%\n%s-%s\n\n' % (echo_escapes(first('pkgver')),
+			echo_escapes(first('pkgrel'))))
+	if first('pkgdesc'):
+		out.append('%%DESC%%\n%s\n\n' % echo_escapes(first('pkgdesc')))
+	def split_field(name, tag):
+		if first(name):
+			out.append('%%%s%%\n' % tag)
+			for value in evaluator.lookup(name, '@'):
+				for word in IFS_WHITESPACE.split(value):
+					if word:
+						out.append(echo_words(word, evaluator.check_glob) + '\n')
+			out.append('\n')
+	def array_field(name, tag):
+		if first(name):
+			out.append('%%%s%%\n' % tag)
+			for value in evaluator.lookup(name, '@'):
+				out.append(echo_words(value, evaluator.check_glob) + '\n')
+			out.append('\n')
+	split_field('groups', 'GROUPS')
+	if first('url'):
+		out.append('%%URL%%\n%s\n\n' % echo_escapes(first('url')))
+	split_field('license', 'LICENSE')
+	split_field('arch', 'ARCH')
+	for name, tag in (('builddate', 'BUILDDATE'), ('packager', 'PACKAGER')):
+		if first(name):
+			out.append('%%%s%%\n%s\n\n' % (tag, echo_escapes(first(name))))
+	array_field('replaces', 'REPLACES')
+	if first('force'):
+		out.append('%FORCE%\n\n')
+	for name, tag in ARRAY_FIELDS:
+		array_field(name, tag)
+	if first('install'):
+		out.append('%%INSTALL%%\n%s\n\n' % echo_escapes(first('install')))
+	names = (setvars | set(evaluator.variables)) - {'i'}
+	out.append('%SETVARS%\n')
+	out.extend(name + '\n' for name in sorted(names))
+	return ''.join(out)
+
+_bash_variables = None
+_carch = None
+_lock = threading.Lock()
+
+def get_carch():
+	"The CARCH parsepkgbuild gets from makepkg.conf, None if unknown"
+	global _carch
+	with _lock:
+		if _carch is None:
+			environ = dict((k, [v]) for k, v in os.environ.items())
+			evaluator = Evaluator('/', environ = environ)
+			try:
+				with open(MAKEPKG_CONF, errors = 'surrogateescape') as f:
+					evaluator.run(f.read())
+			except OSError:
+				pass
+			except Unsupported:
+				_carch = False
+			if _carch is None:
+				_carch = (evaluator.lookup('CARCH') or [''])[0]
+		return _carch if _carch is not False else None
+
+def bash_variables(parse):
+	"""
+	The variables bash itself sets in parsepkgbuild.sh, found by having
+	parse() (the usual parser, returning its exit status and output)
+	evaluate an empty PKGBUILD. They are saved in the cache directory
+	until bash changes.
+	"""
+	global _bash_variables
+	with _lock:
+		if _bash_variables is not None:
+			return _bash_variables
+		try:
+			st = os.stat('/bin/bash')
+			key = 'bash %d %d\n' % (st.st_mtime_ns, st.st_size)
+		except OSError:
+			key = None
+		path = os.path.join(Namcap.util.cache_dir(), 'bash-variables')
+		if key is not None:
+			try:
+				with open(path) as f:
+					if f.readline() == key:
+						_bash_variables = frozenset(f.read().split())
+						return _bash_variables
+			except OSError:
+				pass
+		with tempfile.TemporaryDirectory() as tmpdir:
+			with open(os.path.join(tmpdir, 'PKGBUILD'), 'w') as f:
+				f.write('pkgname=x\npkgver=1\npkgrel=1\n')
+			status, out = parse(tmpdir, 'PKGBUILD')
+		if status != 0 or '%SETVARS%\n' not in out:
+			return None
+		names = out.split('%SETVARS%\n', 1)[1].split()
+		_bash_variables = frozenset(names) - {'pkgname', 'pkgver', 'pkgrel'}
+		if key is not None:
+			try:
+				os.makedirs(os.path.dirname(path), exist_ok = True)
+				with tempfile.NamedTemporaryFile('w', dir = os.path.dirname(path),
+						delete = False) as f:
+					f.write(key + '\n'.join(sorted(_bash_variables)) + '\n')
+				os.replace(f.name, path)
+			except OSError:
+				pass
+		return _bash_variables
+
+def evaluate(path, setvars):
+	"""
+	Returns what parsepkgbuild would print for a PKGBUILD, setvars being
+	the variables set by bash itself. Raises Unsupported when bash is
+	needed.
+	"""
+	directory = os.path.dirname(os.path.abspath(path))
+	# as read by bash, carriage returns included
+	with open(path, errors = 'surrogateescape', newline = '') as f:
+		text = f.read()
+	if '\0' in text:
+		raise Unsupported("NUL character")
+	if '\r' in text:
+		# bash keeps them in words, e.g. the pkgname of a CRLF PKGBUILD
+		raise Unsupported("carriage return")
+	evaluator = Evaluator(directory, reserved = setvars)
+	evaluator.run(text)
+	def first(name):
+		values = evaluator.lookup(name)
+		return values[0] if values else ''
+	if not first('pkgname') or not first('pkgver') or not first('pkgrel'):
+		raise Unsupported("invalid PKGBUILD")
+	if not first('pkgbase'):
+		return pkginfo(evaluator, setvars)
+
+	out = ['%%SPLIT%%\n1\n\n%%BASE%%\n%s\n\n' % echo_escapes(first('pkgbase'))]
+	names = []
+	for value in evaluator.lookup('pkgname', '@'):
+		names.extend(w for w in IFS_WHITESPACE.split(value) if w)
+	for name in names:
+		evaluator.check_glob(name)
+	evaluator.variables['_namcap_pkgnames'] = names
+	del evaluator.variables['pkgname']
+	out.append('%NAMES%\n')
+	out.extend(echo_words(name, evaluator.check_glob) + '\n' for name in names)
+	out.append('\n')
+	out.append(pkginfo(evaluator, setvars))
+	for name in names:
+		out.append('\0\n')
+		evaluator.variables['_namcap_subpkg'] = [name]
+		evaluator.variables['pkgname'] = [name]
+		function = 'package_' + name
+		if function in evaluator.functions:
+			evaluator.call(function)
+		out.append(pkginfo(evaluator, setvars))
+		out.append('%%PKGFUNCTION%%\n%s\n\n' % ('function'
+			if function in evaluator.functions else 'undefined'))
+	return ''.join(out)
+
+# vim: set ts=4 sw=4 noet:
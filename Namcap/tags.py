@@ -23,13 +23,15 @@
 import os
 
 tags = {}
+tags_loaded = False
 
 DEFAULT_TAGS = "/usr/share/namcap/namcap-tags"
 
 def load_tags(filename = None, machine = False):
 	"Loads tags from the given filename"
-	global tags
+	global tags, tags_loaded
 	tags = {}
+	tags_loaded = True
 	if filename is None:
 		filename = DEFAULT_TAGS
 
@@ -47,18 +49,22 @@ def load_tags(filename = None, machine = False):
 		else:
 			tags[machinetag] = humantag
 
+def load_default_tags():
+	"Loads the default tags, if they have not been loaded yet"
+	if tags_loaded:
+		return
+	if os.path.exists(DEFAULT_TAGS):
+		load_tags(DEFAULT_TAGS)
+	elif os.path.exists("namcap-tags"):
+		load_tags("namcap-tags")
+
 def format_message(msg):
 	"""
 	Formats a tuple (tag, data)
 	"""
+	# the default tags are only read once a message is formatted
+	load_default_tags()
 	tag, data = msg
 	return (tags[tag] % data)
 
-# Try to load tags by default
-if os.path.exists(DEFAULT_TAGS):
-	load_tags(DEFAULT_TAGS)
-elif os.path.exists("namcap-tags"):
-	load_tags("namcap-tags")
-
-
 # vim: set ts=4 sw=4 noet:
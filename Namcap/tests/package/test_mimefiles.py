@@ -19,7 +19,13 @@
 # 
 
 import os
+import shutil
+import tarfile
+import tempfile
+import unittest
 from Namcap.tests.makepkg import MakepkgTest
+from Namcap.tests.synthpkg import make_tarball
+import Namcap.package
 import Namcap.rules.mimefiles
 
 class MimeFilesTest(MakepkgTest):
@@ -59,4 +65,26 @@ package() {
 		self.assertEqual(r.warnings, [])
 		self.assertEqual(r.infos, [])
 
+class MimeFilesHardlinkTest(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_hardlinked_desktop(self):
+		"Desktop file hard linked to a file outside of usr/share/applications"
+		tarname = os.path.join(self.tmpdir, "test.tar.gz")
+		make_tarball(tarname, [("usr/share/foobar/foobar.desktop",
+				b"[Desktop Entry]\nMimeType=application/pdf\n")],
+				[("usr/share/applications/foobar.desktop",
+				"usr/share/foobar/foobar.desktop")])
+		pkg = Namcap.package.PacmanPackage({'name': 'foobar'})
+		r = Namcap.rules.mimefiles.MimeDesktopRule()
+		with tarfile.open(tarname) as tar:
+			r.analyze(pkg, tar)
+		self.assertEqual(pkg.detected_deps,
+				{"desktop-file-utils": [('desktop-file-utils-needed', ())] }
+				)
+
 # vim: set ts=4 sw=4 noet:
@@ -66,5 +66,11 @@ package() {
 		])
 		self.assertEqual(w, [])
 
+	def test_environment(self):
+		"Other rules run meanwhile, the environment is left alone"
+		environment = dict(os.environ)
+		Namcap.rules.sodepends.SharedLibsRule().prepare(None)
+		self.assertEqual(dict(os.environ), environment)
+
 # vim: set ts=4 sw=4 noet:
 
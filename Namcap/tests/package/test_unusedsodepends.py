@@ -21,8 +21,15 @@
 #
 
 import os
+import shutil
+import tempfile
+import types
+import unittest
 from Namcap.tests.makepkg import MakepkgTest
+from Namcap.elf import elf_summary
+from Namcap.ldcache import load_ld_cache
 import Namcap.rules.unusedsodepends
+from Namcap.tests.synthpkg import elf_library
 
 class UnusedSodependsTest(MakepkgTest):
 	pkgbuild = """
@@ -62,5 +69,64 @@ package() {
 		])
 		self.assertEqual(r.infos, [])
 
+class UnusedSodependsSymbolsTest(unittest.TestCase):
+	def setUp(self):
+		with open("/bin/sh", "rb") as f:
+			summary = elf_summary(f)
+		self.libcache = load_ld_cache()
+		self.elffile = types.SimpleNamespace(needed = ["libm.so.6", "libc.so.6"],
+				rpaths = [], runpaths = [], elfclass = summary.elfclass,
+				e_machine = summary.e_machine)
+		self.libs = [Namcap.rules.unusedsodepends.find_library(name,
+				self.elffile, self.libcache) for name in self.elffile.needed]
+		if None in self.libs:
+			self.skipTest("libm and libc are not installed")
+
+	def unused(self, *undefined):
+		symbols = types.SimpleNamespace(undefined = set(undefined))
+		return list(Namcap.rules.unusedsodepends.get_unused_sodepends(
+				self.elffile, symbols, self.libcache))
+
+	def test_used(self):
+		self.assertEqual(self.unused("cos", "malloc"), [])
+
+	def test_unused(self):
+		libm, libc = self.libs
+		self.assertEqual(self.unused("malloc"), [libm])
+		self.assertEqual(self.unused(), [libm, libc])
+
+	def test_missing_library(self):
+		self.elffile.needed.append("libnamcap-missing.so.1")
+		self.assertEqual(self.unused("cos", "malloc"), [])
+
+class FindLibraryTest(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		library = elf_library("libnamcap.so.1", 64)
+		# the same library, built for aarch64
+		other = library[:18] + (183).to_bytes(2, 'little') + library[20:]
+		self.dirs = []
+		for name, data in [("other", other), ("native", library)]:
+			directory = os.path.join(self.tmpdir, name)
+			os.mkdir(directory)
+			with open(os.path.join(directory, "libnamcap.so.1"), "wb") as f:
+				f.write(data)
+			self.dirs.append(directory)
+		self.elffile = types.SimpleNamespace(needed = ["libnamcap.so.1"],
+				rpaths = [], runpaths = self.dirs, elfclass = 64,
+				e_machine = 'EM_X86_64')
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_architecture(self):
+		"Libraries of another machine are skipped, like by the dynamic linker"
+		find_library = Namcap.rules.unusedsodepends.find_library
+		other, native = [os.path.join(d, "libnamcap.so.1") for d in self.dirs]
+		self.assertEqual(find_library("libnamcap.so.1", self.elffile, {}), native)
+		self.assertIsNone(find_library(other, self.elffile, {}))
+		self.elffile.runpaths = self.dirs[:1]
+		self.assertNotEqual(find_library("libnamcap.so.1", self.elffile, {}), other)
+
 # vim: set ts=4 sw=4 noet:
 
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - synthetic package generator
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+"""
+Builds packages like makepkg would, without makepkg nor a compiler: the
+.PKGINFO, a .MTREE describing every member, and members of a given
+shape (regular files spread over directories, ELF shared libraries,
+scripts, symlinks). The same shape always gives the same package.
+"""
+
+import gzip
+import hashlib
+import io
+import lzma
+import random
+import struct
+import tarfile
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+# timestamp of every member and of the build
+BUILDDATE = 1500000000
+
+DIRECTORY_FANOUT = 4
+
+SHEBANGS = [b'#!/bin/sh', b'#!/usr/bin/python3', b'#!/usr/bin/env perl',
+		b'#!/usr/bin/bash']
+
+def compress(data, compression):
+	"""
+	Compresses a tarball with the default levels of makepkg, compression
+	being gz, xz, zst or ''
+	"""
+	if compression == 'gz':
+		return gzip.compress(data, compresslevel = 6, mtime = 0)
+	if compression == 'xz':
+		return lzma.compress(data, preset = 6)
+	if compression == 'zst':
+		if zstandard is None:
+			raise RuntimeError("the zstandard module is needed for .zst packages")
+		return zstandard.ZstdCompressor(level = 3).compress(data)
+	if not compression:
+		return data
+	raise ValueError("unknown compression %s" % compression)
+
+# ELF64 little endian structures
+EHDR = struct.Struct('<16sHHIQQQIHHHHHH')
+PHDR = struct.Struct('<IIQQQQQQ')
+SHDR = struct.Struct('<IIQQQQIIQQ')
+SYM = struct.Struct('<IBBHQQ')
+DYN = struct.Struct('<qQ')
+
+PT_LOAD, PT_DYNAMIC = 1, 2
+PT_GNU_STACK, PT_GNU_RELRO = 0x6474e551, 0x6474e552
+SHT_PROGBITS, SHT_STRTAB, SHT_DYNAMIC, SHT_DYNSYM = 1, 3, 6, 11
+DT_NULL, DT_NEEDED, DT_STRTAB, DT_SYMTAB = 0, 1, 5, 6
+DT_STRSZ, DT_SYMENT, DT_SONAME, DT_BIND_NOW = 10, 11, 14, 24
+
+def _align(data, alignment = 8):
+	return data + b'\0' * (-len(data) % alignment)
+
+class _StringTable(object):
+	def __init__(self):
+		self.data = b'\0'
+	def add(self, string):
+		offset = len(self.data)
+		self.data += string.encode() + b'\0'
+		return offset
+
+def elf_library(soname, size, needed = ('libc.so.6',), exports = 4,
+		imports = ('malloc', 'free'), seed = 0):
+	"""
+	A minimal x86_64 shared library, with a dynamic section and symbols,
+	padded to about size bytes of code
+	"""
+	dynstr = _StringTable()
+	needed_offsets = [dynstr.add(name) for name in needed]
+	soname_offset = dynstr.add(soname)
+	symbols = [SYM.pack(0, 0, 0, 0, 0, 0)]
+	for name in imports:
+		# global function, undefined
+		symbols.append(SYM.pack(dynstr.add(name), 0x12, 0, 0, 0, 0))
+	for i in range(exports):
+		symbols.append(SYM.pack(dynstr.add('%s_%d' % (soname.split('.')[0], i)),
+			0x12, 0, 1, 0x1000 + 16 * i, 16))
+	shstrtab = _StringTable()
+	section_names = [shstrtab.add(name) for name in
+			('.text', '.dynstr', '.dynsym', '.dynamic', '.shstrtab')]
+
+	text_offset = EHDR.size + 4 * PHDR.size
+	text = random.Random(seed).randbytes(max(size, 16))
+	dynstr_offset = text_offset + len(text)
+	dynstr_data = _align(dynstr.data)
+	dynsym_offset = dynstr_offset + len(dynstr_data)
+	dynsym_data = b''.join(symbols)
+	dynamic_offset = dynsym_offset + len(dynsym_data)
+	dynamic = [(DT_NEEDED, offset) for offset in needed_offsets]
+	dynamic += [(DT_SONAME, soname_offset), (DT_STRTAB, dynstr_offset),
+			(DT_SYMTAB, dynsym_offset), (DT_STRSZ, len(dynstr.data)),
+			(DT_SYMENT, SYM.size), (DT_BIND_NOW, 0), (DT_NULL, 0)]
+	dynamic_data = b''.join(DYN.pack(tag, value) for tag, value in dynamic)
+	shstrtab_offset = dynamic_offset + len(dynamic_data)
+	shstrtab_data = _align(shstrtab.data)
+	shoff = shstrtab_offset + len(shstrtab_data)
+
+	# the whole file is mapped at address 0
+	load_size = shstrtab_offset
+	phdrs = [
+		PHDR.pack(PT_LOAD, 7, 0, 0, 0, load_size, load_size, 0x1000),
+		PHDR.pack(PT_DYNAMIC, 6, dynamic_offset, dynamic_offset, dynamic_offset,
+			len(dynamic_data), len(dynamic_data), 8),
+		PHDR.pack(PT_GNU_STACK, 6, 0, 0, 0, 0, 0, 16),
+		PHDR.pack(PT_GNU_RELRO, 4, dynamic_offset, dynamic_offset,
+			dynamic_offset, len(dynamic_data), len(dynamic_data), 1),
+	]
+	shdrs = [
+		SHDR.pack(0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+		SHDR.pack(section_names[0], SHT_PROGBITS, 6, text_offset, text_offset,
+			len(text), 0, 0, 16, 0),
+		SHDR.pack(section_names[1], SHT_STRTAB, 2, dynstr_offset, dynstr_offset,
+			len(dynstr.data), 0, 0, 1, 0),
+		SHDR.pack(section_names[2], SHT_DYNSYM, 2, dynsym_offset, dynsym_offset,
+			len(dynsym_data), 2, 1, 8, SYM.size),
+		SHDR.pack(section_names[3], SHT_DYNAMIC, 3, dynamic_offset,
+			dynamic_offset, len(dynamic_data), 2, 0, 8, DYN.size),
+		SHDR.pack(section_names[4], SHT_STRTAB, 0, 0, shstrtab_offset,
+			len(shstrtab.data), 0, 0, 1, 0),
+	]
+	ehdr = EHDR.pack(b'\x7fELF\x02\x01\x01' + b'\0' * 9, 3, 62, 1, 0,
+			EHDR.size, shoff, 0, EHDR.size, PHDR.size, len(phdrs), SHDR.size,
+			len(shdrs), len(shdrs) - 1)
+	return b''.join([ehdr] + phdrs + [text, dynstr_data, dynsym_data,
+		dynamic_data, shstrtab_data] + shdrs)
+
+class Shape(object):
+	"""
+	What a synthetic package is made of:
+
+	* files: number of regular files of file_size bytes, spread over
+	  directories depth levels deep
+	* elves: number of ELF shared libraries of about elf_size bytes
+	* scripts: number of executable scripts with a shebang
+	* symlinks: number of symlinks, to the files
+	"""
+	def __init__(self, files = 10, file_size = 1024, depth = 2, elves = 0,
+			elf_size = 16 * 1024, scripts = 0, symlinks = 0):
+		self.files = files
+		self.file_size = file_size
+		self.depth = depth
+		self.elves = elves
+		self.elf_size = elf_size
+		self.scripts = scripts
+		self.symlinks = symlinks
+
+	def __repr__(self):
+		return 'Shape(%s)' % ', '.join('%s=%r' % item
+				for item in sorted(vars(self).items()))
+
+def _directory(name, index, depth):
+	parts = ['usr', 'share', name]
+	for level in range(depth):
+		parts.append('d%d' % (index // DIRECTORY_FANOUT ** level % DIRECTORY_FANOUT))
+	return '/'.join(parts)
+
+def package_members(name, shape):
+	"""
+	Returns the members of a package of a given shape, as a list of
+	(TarInfo, contents or None), without the dot files
+	"""
+	files = {}
+	rng = random.Random(name)
+	for i in range(shape.files):
+		# text-like data, compressible as real files are
+		words = b' '.join(b'%x' % rng.getrandbits(16)
+				for _ in range(shape.file_size // 4 + 1))
+		files['%s/file%d.txt' % (_directory(name, i, shape.depth), i)] = \
+				(words[:shape.file_size], 0o644)
+	for i in range(shape.elves):
+		soname = 'lib%s%d.so.1' % (name, i)
+		files['usr/lib/' + soname] = (elf_library(soname, shape.elf_size,
+			seed = '%s%d' % (name, i)), 0o755)
+	for i in range(shape.scripts):
+		shebang = SHEBANGS[i % len(SHEBANGS)]
+		files['usr/bin/%s-script%d' % (name, i)] = \
+				(shebang + b'\necho %d\n' % i, 0o755)
+
+	directories = set()
+	for path in files:
+		path = path.rsplit('/', 1)[0]
+		while path and path not in directories:
+			directories.add(path)
+			path = path.rpartition('/')[0]
+	if shape.symlinks:
+		directories.add('usr/share/%s/links' % name)
+
+	members = []
+	def member(path, member_type, mode, size = 0):
+		entry = tarfile.TarInfo(path)
+		entry.type = member_type
+		entry.mode = mode
+		entry.size = size
+		entry.mtime = BUILDDATE
+		entry.uname = entry.gname = 'root'
+		return entry
+	for path in sorted(directories):
+		members.append((member(path, tarfile.DIRTYPE, 0o755), None))
+	for path, (data, mode) in sorted(files.items()):
+		members.append((member(path, tarfile.REGTYPE, mode, len(data)), data))
+	targets = sorted(files)
+	for i in range(shape.symlinks):
+		entry = member('usr/share/%s/links/link%d' % (name, i),
+				tarfile.SYMTYPE, 0o777)
+		entry.linkname = '/' + targets[i % len(targets)] if targets else 'missing'
+		members.append((entry, None))
+	return members
+
+def pkginfo(name, members, arch = 'x86_64'):
+	"The .PKGINFO of a package"
+	size = sum(entry.size for entry, data in members)
+	return ('# Generated by namcap tests\n'
+			'pkgname = %s\npkgbase = %s\npkgver = 1.0-1\n'
+			'pkgdesc = Synthetic package\nurl = https://example.org/\n'
+			'builddate = %d\npackager = Namcap Tests <namcap@example.org>\n'
+			'size = %d\narch = %s\nlicense = GPL\ndepend = glibc\n'
+			% (name, name, BUILDDATE, size, arch)).encode()
+
+def mtree(members):
+	"The gzipped .MTREE listing members, like bsdtar writes it for makepkg"
+	lines = ['#mtree', '/set type=file uid=0 gid=0 mode=644']
+	for entry, data in members:
+		path = './' + entry.name
+		if entry.isdir():
+			lines.append('%s time=%d.0 mode=%o type=dir'
+					% (path, entry.mtime, entry.mode))
+		elif entry.issym():
+			lines.append('%s time=%d.0 mode=%o type=link link=%s'
+					% (path, entry.mtime, entry.mode, entry.linkname))
+		else:
+			mode = '' if entry.mode == 0o644 else ' mode=%o' % entry.mode
+			lines.append('%s time=%d.0%s size=%d md5digest=%s sha256digest=%s'
+					% (path, entry.mtime, mode, entry.size,
+						hashlib.md5(data).hexdigest(),
+						hashlib.sha256(data).hexdigest()))
+	return gzip.compress(('\n'.join(lines) + '\n').encode(), mtime = 0)
+
+def make_tarball(path, members, hardlinks = (), compression = 'gz'):
+	"""
+	Writes a tarball, to a path or a binary file object, from a list of
+	(name, contents or None for a directory) followed by a list of
+	(name, target) hard links. compression is that of tarfile, '' for none.
+	"""
+	if isinstance(path, str):
+		tar = tarfile.open(path, 'w:' + compression)
+	else:
+		tar = tarfile.open(fileobj = path, mode = 'w:' + compression)
+	with tar:
+		for name, data in members:
+			info = tarfile.TarInfo(name)
+			if data is None:
+				info.type = tarfile.DIRTYPE
+				tar.addfile(info)
+			else:
+				info.size = len(data)
+				tar.addfile(info, io.BytesIO(data))
+		for name, target in hardlinks:
+			info = tarfile.TarInfo(name)
+			info.type = tarfile.LNKTYPE
+			info.linkname = target
+			tar.addfile(info)
+
+def build_package(path, shape, name = 'synthetic', compression = None):
+	"""
+	Writes a package of the given shape to path, compressed according to
+	its extension unless compression is given
+	"""
+	if compression is None:
+		compression = path.rsplit('.', 1)[-1]
+		if compression == 'tar':
+			compression = ''
+	members = package_members(name, shape)
+	dotfiles = [('.PKGINFO', pkginfo(name, members)),
+			('.MTREE', mtree(members))]
+	buf = io.BytesIO()
+	with tarfile.open(fileobj = buf, mode = 'w', format = tarfile.GNU_FORMAT) as tar:
+		for dotfile, data in dotfiles:
+			entry = tarfile.TarInfo(dotfile)
+			entry.size = len(data)
+			entry.mtime = BUILDDATE
+			entry.uname = entry.gname = 'root'
+			tar.addfile(entry, io.BytesIO(data))
+		for entry, data in members:
+			tar.addfile(entry, None if data is None else io.BytesIO(data))
+	with open(path, 'wb') as f:
+		f.write(compress(buf.getvalue(), compression))
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the opening of package archives
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import mmap
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import Namcap.archive
+from Namcap.archive import open_archive
+from Namcap.tests.synthpkg import make_tarball
+
+class OpenArchiveTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.contents = os.urandom(100000)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def make_package(self, compression):
+		path = os.path.join(self.tmpdir, "test.pkg.tar")
+		if compression:
+			path += "." + compression
+		make_tarball(path, [(".PKGINFO", self.contents),
+			("usr/lib/libfoo.so", self.contents)], compression = compression)
+		return path
+
+	def check(self, tar):
+		# members can be read in any order
+		self.assertEqual(tar.extractfile("usr/lib/libfoo.so").read(),
+				self.contents)
+		self.assertEqual(tar.extractfile(".PKGINFO").read(), self.contents)
+
+	def test_formats(self):
+		for compression in ("gz", "bz2", "xz"):
+			tar = open_archive(self.make_package(compression))
+			self.assertIsInstance(tar.fileobj, io.BytesIO)
+			self.check(tar)
+			tar.close()
+			self.assertTrue(tar.fileobj.closed)
+
+	def test_scratch_file(self):
+		tar = open_archive(self.make_package("xz"), spool_size = 4096)
+		self.assertIsInstance(tar.fileobj, mmap.mmap)
+		self.check(tar)
+		tar.close()
+
+	@unittest.skipIf(Namcap.archive.zstandard is None, "zstandard is missing")
+	def test_zstd(self):
+		zstandard = Namcap.archive.zstandard
+		tarname = self.make_package("")
+		with open(tarname, "rb") as f:
+			data = f.read()
+		path = tarname + ".zst"
+		with open(path, "wb") as f:
+			f.write(zstandard.ZstdCompressor().compress(data))
+		with open_archive(path) as tar:
+			self.check(tar)
+		# frames needing a larger window than allowed are rejected
+		params = zstandard.ZstdCompressionParameters.from_level(3,
+				window_log = 28)
+		cobj = zstandard.ZstdCompressor(compression_params = params).compressobj()
+		with open(path, "wb") as f:
+			f.write(cobj.compress(data) + cobj.flush())
+		self.assertRaises(tarfile.ReadError, open_archive, path)
+
+	def test_uncompressed(self):
+		with open_archive(self.make_package("")) as tar:
+			self.check(tar)
+
+	def test_invalid(self):
+		path = os.path.join(self.tmpdir, "test.pkg.tar.xz")
+		with open(path, "wb") as f:
+			f.write(b"\xfd7zXZ\x00 truncated")
+		self.assertRaises(tarfile.ReadError, open_archive, path)
+		with open(path, "wb") as f:
+			f.write(b"not a tarball")
+		self.assertRaises(tarfile.ReadError, open_archive, path)
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - command line
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from Namcap.tests.synthpkg import Shape, build_package
+
+basepath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+class CommandLineTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.env = dict(os.environ)
+		# the order of some messages depends on the hashes of strings
+		self.env['PYTHONHASHSEED'] = '0'
+		self.env['PYTHONWARNINGS'] = 'ignore'
+		self.env['PYTHONPATH'] = os.pathsep.join(filter(None,
+			[basepath, self.env.get('PYTHONPATH')]))
+		self.package = os.path.join(self.tmpdir, 'synthetic-1.0-1-x86_64.pkg.tar.gz')
+		build_package(self.package, Shape(files = 20, elves = 2, scripts = 2, symlinks = 2))
+		self.bad = os.path.join(self.tmpdir, 'bad-1.0-1-x86_64.pkg.tar.gz')
+		with open(self.bad, 'wb') as f:
+			f.write(b'\x1f\x8b\x08\x00' + b'not a package' * 20)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def run_namcap(self, *args):
+		p = subprocess.run([sys.executable, '-m', 'namcap',
+			'-t', os.path.join(basepath, 'namcap-tags')] + list(args),
+			env = self.env, cwd = self.tmpdir, capture_output = True)
+		return p.returncode, p.stdout.decode('utf-8'), p.stderr.decode('utf-8')
+
+	def test_jsonl_errors(self):
+		status, out, err = self.run_namcap('--format=jsonl', self.bad, self.package)
+		self.assertEqual(status, 1)
+		records = [json.loads(line) for line in out.splitlines()]
+		self.assertEqual(records[0], {'package': self.bad, 'rule': None,
+			'severity': 'error', 'tag': 'cannot-process', 'args': []})
+		self.assertTrue(all(r['package'] == 'synthetic' for r in records[1:]))
+		self.assertTrue(records[1:])
+
+	def test_jobs(self):
+		other = os.path.join(self.tmpdir, 'other-1.0-1-x86_64.pkg.tar.gz')
+		build_package(other, Shape(files = 5, elves = 1, symlinks = 1), name = 'other')
+		packages = [self.package, self.bad, other, self.package]
+		for options, package in [([], lambda line: line.split(' ', 1)[0]),
+				(['--format=jsonl'], lambda line: json.loads(line)['package'])]:
+			serial = self.run_namcap(*options + packages)
+			# in command-line order, the status being the highest of all
+			self.assertEqual(serial[0], 1)
+			order = [package(line) for line in serial[1].splitlines()]
+			order = [p for i, p in enumerate(order) if i == 0 or order[i - 1] != p]
+			self.assertEqual(order[0], 'synthetic')
+			self.assertEqual(order[2:], ['other', 'synthetic'])
+			self.assertEqual(self.run_namcap(*options + ['-j', '2'] + packages), serial)
+			self.assertEqual(self.run_namcap(*options + ['-j', '4'] + packages), serial)
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - namcapd and its client
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from Namcap.daemon import HEADER, ProtocolError, receive_message, send_message
+from Namcap.tests.synthpkg import Shape, build_package
+
+basepath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+class MessageTests(unittest.TestCase):
+	def setUp(self):
+		self.left, self.right = socket.socketpair()
+
+	def tearDown(self):
+		self.left.close()
+		self.right.close()
+
+	def test_roundtrip(self):
+		message = {'argv': ['-i', 'caf\xe9.pkg.tar.zst'], 'environ': {'A': 'x' * 200000}}
+		r, w = os.pipe()
+		try:
+			send_message(self.left, message, [w])
+			self.left.shutdown(socket.SHUT_WR)
+			received, fds = receive_message(self.right, 3)
+			self.assertEqual(received, message)
+			self.assertEqual(len(fds), 1)
+			os.write(fds[0], b'ok')
+			os.close(fds[0])
+			self.assertEqual(os.read(r, 2), b'ok')
+		finally:
+			os.close(r)
+			os.close(w)
+
+	def test_closed(self):
+		self.left.close()
+		self.assertEqual(receive_message(self.right), (None, []))
+
+	def test_invalid(self):
+		self.left.sendall(HEADER.pack(10) + b'{"a"')
+		self.left.close()
+		self.assertRaises(ProtocolError, receive_message, self.right)
+
+class DaemonTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.env = dict(os.environ)
+		self.env['NAMCAPD_SOCKET'] = os.path.join(self.tmpdir, 'namcapd.socket')
+		# the order of some messages depends on the hashes of strings
+		self.env['PYTHONHASHSEED'] = '0'
+		self.env['PYTHONWARNINGS'] = 'ignore'
+		self.env['PYTHONPATH'] = os.pathsep.join(filter(None,
+			[basepath, self.env.get('PYTHONPATH')]))
+		self.package = os.path.join(self.tmpdir, 'synthetic-1.0-1-x86_64.pkg.tar.gz')
+		build_package(self.package, Shape(files = 20, elves = 2, scripts = 2, symlinks = 2))
+		self.daemon = None
+
+	def tearDown(self):
+		if self.daemon is not None:
+			self.daemon.terminate()
+			self.daemon.wait()
+		shutil.rmtree(self.tmpdir)
+
+	def run_namcap(self, command):
+		args = ['-t', os.path.join(basepath, 'namcap-tags'), '-i', self.package]
+		p = subprocess.run([sys.executable] + command + args,
+				env = self.env, cwd = self.tmpdir, capture_output = True)
+		return p.returncode, p.stdout, p.stderr
+
+	def start_daemon(self):
+		self.daemon = subprocess.Popen([sys.executable, '-m', 'Namcap.daemon'],
+				env = self.env, cwd = self.tmpdir)
+		for i in range(200):
+			if os.path.exists(self.env['NAMCAPD_SOCKET']):
+				return
+			self.assertIsNone(self.daemon.poll())
+			time.sleep(0.05)
+		self.fail("namcapd did not start")
+
+	def test_client(self):
+		expected = self.run_namcap(['-m', 'namcap'])
+		self.assertTrue(expected[1])
+		self.start_daemon()
+		for i in range(2):
+			self.assertEqual(self.run_namcap(['-m', 'Namcap.daemon', '--client']), expected)
+
+	def test_fallback(self):
+		# without namcapd, the client runs namcap itself
+		self.assertEqual(self.run_namcap(['-m', 'Namcap.daemon', '--client']),
+				self.run_namcap(['-m', 'namcap']))
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the dependency closure
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import random
+import unittest
+
+from Namcap.depgraph import DependencyGraph
+
+def bfs_covered(graph, depend):
+	"The coverage as computed before the graph existed"
+	covered = set()
+	todo = set([depend])
+	while todo:
+		i = todo.pop()
+		covered.add(i)
+		todo |= set(graph.get(i, [])) - covered
+	return covered - set([depend])
+
+class DependencyGraphTests(unittest.TestCase):
+	def setUp(self):
+		self.calls = []
+		self.graph = {
+			"app": ["gtk", "python"],
+			"gtk": ["glib", "pango"],
+			"pango": ["glib", "cairo"],
+			"cairo": ["glib"],
+			"glib": ["glibc"],
+			"python": ["glibc", "python-extra"],
+			"python-extra": ["python"],
+			"glibc": [],
+		}
+
+	def successors(self, name):
+		self.calls.append(name)
+		return self.graph.get(name, [])
+
+	def test_covered(self):
+		g = DependencyGraph(self.successors)
+		self.assertEqual(g.covered("app"), {"gtk", "python", "glib", "pango",
+			"cairo", "glibc", "python-extra"})
+		self.assertEqual(g.covered("pango"), {"glib", "cairo", "glibc"})
+		self.assertEqual(g.covered("unknown"), set())
+
+	def test_cycle(self):
+		g = DependencyGraph(self.successors)
+		self.assertEqual(g.covered("python"), {"glibc", "python-extra"})
+		self.assertEqual(g.covered("python-extra"), {"glibc", "python"})
+		self.assertIs(g.reach("python"), g.reach("python-extra"))
+
+	def test_memoized(self):
+		g = DependencyGraph(self.successors)
+		g.covered("app")
+		g.covered("gtk")
+		g.covered("app")
+		self.assertEqual(sorted(self.calls), sorted(self.graph))
+
+	def test_random(self):
+		rng = random.Random(42)
+		names = ["p%d" % i for i in range(60)]
+		for trial in range(20):
+			self.graph = dict((n, rng.sample(names, rng.randint(0, 3)))
+					for n in names)
+			g = DependencyGraph(self.successors)
+			for n in rng.sample(names, len(names)):
+				self.assertEqual(g.covered(n), bfs_covered(self.graph, n))
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the shared ELF summaries
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import unittest
+
+import Namcap.elf
+from Namcap.ruleclass import MemberData
+
+class ELFSummaryTests(unittest.TestCase):
+	def setUp(self):
+		with open("/bin/sh", "rb") as f:
+			self.contents = f.read()
+
+	def test_summary(self):
+		summary = Namcap.elf.elf_summary(io.BytesIO(self.contents))
+		self.assertIn(summary.elfclass, (32, 64))
+		self.assertIn(summary.e_type, ('ET_EXEC', 'ET_DYN'))
+		self.assertTrue(any(lib.startswith("libc.") for lib in summary.needed))
+
+	def test_not_elf(self):
+		self.assertIsNone(Namcap.elf.elf_summary(io.BytesIO(b"#!/bin/sh\n")))
+
+	def test_shared(self):
+		data = MemberData(io.BytesIO(self.contents), len(self.contents))
+		f1, f2 = data.open(), data.open()
+		s1 = Namcap.elf.elf_summary(f1)
+		s2 = Namcap.elf.elf_summary(f2)
+		self.assertIs(s1, s2)
+		self.assertEqual(f1.tell(), 0)
+		data.close()
+
+class DynamicSymbolsTests(unittest.TestCase):
+	def setUp(self):
+		with open("/bin/sh", "rb") as f:
+			self.contents = f.read()
+
+	def test_symbols(self):
+		symbols = Namcap.elf.dynamic_symbols(io.BytesIO(self.contents))
+		self.assertIn("malloc", symbols.undefined)
+		self.assertNotIn("malloc", symbols.exported)
+
+	def test_not_elf(self):
+		self.assertIsNone(Namcap.elf.dynamic_symbols(io.BytesIO(b"#!/bin/sh\n")))
+
+	def test_truncated(self):
+		symbols = Namcap.elf.dynamic_symbols(io.BytesIO(self.contents[:100]))
+		self.assertEqual(symbols.undefined, set())
+
+# vim: set ts=4 sw=4 noet:
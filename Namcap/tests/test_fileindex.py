@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the index of installed files
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import mmap
+import os
+import shutil
+import tempfile
+import unittest
+
+from Namcap.fileindex import FileIndex, build_index, local_db_fingerprint
+
+class FakePackage(object):
+	def __init__(self, name, files):
+		self.name = name
+		self.files = [(f, 0, 0o644) for f in files]
+
+packages = [
+	FakePackage("zlib", ["usr/", "usr/lib/", "usr/lib/libz.so",
+		"usr/lib/libz.so.1", "usr/lib/libz.so.1.2.8"]),
+	FakePackage("bash", ["usr/", "usr/bin/", "usr/bin/bash"]),
+	FakePackage("libzip", ["usr/", "usr/lib/", "usr/lib/libzip.so.4"]),
+]
+
+class FileIndexTests(unittest.TestCase):
+	def setUp(self):
+		self.index = FileIndex(build_index(packages, b'\0' * 32))
+
+	def test_owners(self):
+		self.assertEqual(self.index.owners("usr/bin/bash"), ["bash"])
+		self.assertEqual(sorted(self.index.owners("usr/lib/")),
+				["libzip", "zlib"])
+		self.assertEqual(self.index.owners("usr/bin/sh"), [])
+		self.assertEqual(self.index.owners("zzz"), [])
+
+	def test_with_prefix(self):
+		self.assertEqual(list(self.index.with_prefix("usr/lib/libz.so.1")),
+				[("usr/lib/libz.so.1", "zlib"), ("usr/lib/libz.so.1.2.8", "zlib")])
+		self.assertEqual([owner for path, owner in
+			self.index.with_prefix("usr/lib/libz")],
+			["zlib", "zlib", "zlib", "libzip"])
+
+	def test_mapped(self):
+		with tempfile.TemporaryFile() as f:
+			f.write(build_index(packages, b'\1' * 32))
+			f.flush()
+			index = FileIndex(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+		self.assertEqual(index.fingerprint, b'\1' * 32)
+		self.assertEqual(len(index), 11)
+		self.assertEqual(index.owners("usr/lib/libzip.so.4"), ["libzip"])
+
+	def test_invalid(self):
+		self.assertRaises(ValueError, FileIndex, b"")
+		self.assertRaises(ValueError, FileIndex, b"\0" * 100)
+
+class FingerprintTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		os.makedirs(os.path.join(self.tmpdir, "local", "zlib-1.2.8-1"))
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_changes(self):
+		before = local_db_fingerprint(self.tmpdir)
+		self.assertEqual(before, local_db_fingerprint(self.tmpdir))
+		pkgdir = os.path.join(self.tmpdir, "local", "zlib-1.2.8-1")
+		os.utime(pkgdir, ns = (0, 0))
+		self.assertNotEqual(before, local_db_fingerprint(self.tmpdir))
+
+	def test_missing(self):
+		self.assertIsNone(local_db_fingerprint(os.path.join(self.tmpdir, "nope")))
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - reuse of the analysis of unchanged members
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from Namcap.elf import DynamicSymbols
+from Namcap.incremental import FactStore, MemberFacts, mtree_digests
+from Namcap.mtree import Mtree
+from Namcap.ruleclass import TarballRule, scan_members
+from Namcap.tests import synthpkg
+from Namcap.util import is_elf, script_type
+
+def make_tarball(members):
+	"An opened tarball of a list of (name, contents), with a .MTREE"
+	mtree = ['#mtree', '/set type=file uid=0 gid=0 mode=644']
+	for name, data in members:
+		mtree.append('./%s size=%d sha256digest=%s' % (name, len(data),
+			hashlib.sha256(data).hexdigest()))
+	mtree = gzip.compress('\n'.join(mtree).encode() + b'\n')
+	buf = io.BytesIO()
+	synthpkg.make_tarball(buf, [('.MTREE', mtree)] + members, compression = '')
+	buf.seek(0)
+	return tarfile.open(fileobj = buf)
+
+def digests(tar):
+	return mtree_digests(Mtree(tar.extractfile('.MTREE').read()))
+
+class ContentsRule(TarballRule):
+	name = "contents"
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.elves = []
+		self.scripts = {}
+	def analyze_member(self, pkginfo, entry, fileobj):
+		if fileobj is None:
+			return
+		if is_elf(fileobj):
+			self.elves.append(entry.name)
+		self.scripts[entry.name] = script_type(fileobj)
+
+class IncrementalTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def scan(self, tar, facts):
+		rule = ContentsRule()
+		rule.prepare(None)
+		scan_members(tar, [(rule, None)], facts)
+		return rule
+
+	def test_digests(self):
+		tar = make_tarball([('usr/bin/prog', b'\x7fELF' + b'\0' * 100)])
+		found = digests(tar)
+		self.assertEqual(list(found), ['usr/bin/prog'])
+		self.assertEqual(found['usr/bin/prog'][1], 104)
+		self.assertEqual(mtree_digests(None), {})
+
+	def test_reuse(self):
+		members = [('usr/bin/prog', b'\x7fELF' + b'\0' * 100),
+				('usr/bin/script', b'#!/usr/bin/env python\n')]
+		tar = make_tarball(members)
+		facts = MemberFacts(digests(tar))
+		rule = self.scan(tar, facts)
+		self.assertEqual(rule.elves, ['usr/bin/prog'])
+		self.assertEqual(rule.scripts['usr/bin/script'], 'python')
+
+		store = FactStore(self.tmpdir)
+		store.save('foo', facts.current)
+		previous = store.load('foo')
+		self.assertEqual(previous, facts.current)
+
+		# the same digests with other contents, only trusted for
+		# members of the same size
+		tar = make_tarball(members)
+		changed = make_tarball([('usr/bin/prog', b'\0' * 104),
+			('usr/bin/script', b'#!/bin/sh\n')])
+		rule = self.scan(changed, MemberFacts(digests(tar), previous))
+		self.assertEqual(rule.elves, ['usr/bin/prog'])
+		self.assertEqual(rule.scripts['usr/bin/script'], 'sh')
+
+	def test_objects(self):
+		symbols = DynamicSymbols.__new__(DynamicSymbols)
+		symbols.undefined = {'malloc'}
+		symbols.exported = set()
+		store = FactStore(self.tmpdir)
+		store.save('foo', {('0' * 64, 1): {'dynsym': symbols, 'elf': None}})
+		loaded = store.load('foo')[('0' * 64, 1)]
+		self.assertIsNone(loaded['elf'])
+		self.assertEqual(loaded['dynsym'].undefined, {'malloc'})
+		self.assertEqual(loaded['dynsym'].exported, set())
+
+	def test_unreadable(self):
+		store = FactStore(self.tmpdir)
+		self.assertEqual(store.load('foo'), {})
+		with open(os.path.join(self.tmpdir, 'foo.facts'), 'w') as f:
+			f.write("('3', {")
+		self.assertEqual(store.load('foo'), {})
+
+# vim: set ts=4 sw=4 noet:
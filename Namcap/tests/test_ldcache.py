@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the dynamic linker cache reader
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Namcap.ldcache import (NEW_ENTRY, NEW_HEADER, NEW_MAGIC, OLD_ENTRY,
+		OLD_HEADER, OLD_MAGIC, elf_architecture, load_ld_cache, parse_ld_cache)
+
+# (flags, soname, path, hwcap)
+libraries = [
+	(0x0303, "libz.so.1", "/usr/lib/libz.so.1", 0),
+	(0x0a03, "libz.so.1", "/usr/lib/aarch64/libz.so.1", 0),
+	(0x0003, "libz.so.1", "/usr/lib32/libz.so.1", 0),
+	(0x0303, "libfoo.so.2", "/usr/lib/glibc-hwcaps/x86-64-v3/libfoo.so.2", 1 << 62),
+	(0x0303, "libfoo.so.2", "/usr/lib/libfoo.so.2", 0),
+	(0x0303, "libbar.so.1", "/usr/lib/glibc-hwcaps/x86-64-v3/libbar.so.1", 1 << 62),
+	(0x0000, "libold.so.1", "/usr/lib/libold.so.1", 0),
+]
+
+def new_cache(libs):
+	strings = bytearray()
+	def add(s):
+		offset = NEW_HEADER.size + len(libs) * NEW_ENTRY.size + len(strings)
+		strings.extend(s.encode() + b"\0")
+		return offset
+	entries = b"".join(NEW_ENTRY.pack(flags, add(key), add(value), 0, hwcap)
+			for flags, key, value, hwcap in libs)
+	return (NEW_HEADER.pack(NEW_MAGIC, len(libs), len(strings), 0, 0)
+			+ entries + bytes(strings))
+
+def old_cache(libs):
+	strings = bytearray()
+	def add(s):
+		offset = len(strings)
+		strings.extend(s.encode() + b"\0")
+		return offset
+	entries = b"".join(OLD_ENTRY.pack(flags, add(key), add(value))
+			for flags, key, value, hwcap in libs)
+	return OLD_HEADER.pack(OLD_MAGIC, len(libs)) + entries + bytes(strings)
+
+class LdCacheTests(unittest.TestCase):
+	def test_new_format(self):
+		cache = parse_ld_cache(new_cache(libraries))
+		self.assertEqual(cache["x86-64"], {
+			"libz.so.1": "/usr/lib/libz.so.1",
+			"libfoo.so.2": "/usr/lib/libfoo.so.2",
+			"libbar.so.1": "/usr/lib/glibc-hwcaps/x86-64-v3/libbar.so.1",
+		})
+		self.assertEqual(cache["aarch64"],
+				{"libz.so.1": "/usr/lib/aarch64/libz.so.1"})
+		self.assertEqual(cache["i686"],
+				{"libz.so.1": "/usr/lib32/libz.so.1"})
+
+	def test_old_format(self):
+		cache = parse_ld_cache(old_cache(libraries[:3]))
+		self.assertEqual(sorted(cache), ["aarch64", "i686", "x86-64"])
+		self.assertEqual(cache["x86-64"],
+				{"libz.so.1": "/usr/lib/libz.so.1"})
+
+	def test_invalid(self):
+		self.assertRaises(ValueError, parse_ld_cache, b"garbage")
+
+	def test_load(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			path = os.path.join(tmpdir, "ld.so.cache")
+			with open(path, "wb") as f:
+				f.write(new_cache(libraries[:1]))
+			self.assertEqual(load_ld_cache(path)["x86-64"],
+					{"libz.so.1": "/usr/lib/libz.so.1"})
+			# only read again once modified
+			with open(path, "wb") as f:
+				f.write(new_cache(libraries[1:2]))
+			os.utime(path, ns = (0, 0))
+			self.assertEqual(list(load_ld_cache(path)), ["aarch64"])
+			self.assertEqual(load_ld_cache(os.path.join(tmpdir, "nope")), {})
+		finally:
+			shutil.rmtree(tmpdir)
+
+	def test_elf_architecture(self):
+		self.assertEqual(elf_architecture(64, 'EM_X86_64'), 'x86-64')
+		self.assertEqual(elf_architecture(32, 'EM_386'), 'i686')
+		self.assertEqual(elf_architecture(64, 'EM_AARCH64'), 'aarch64')
+		self.assertEqual(elf_architecture(64, 'EM_UNKNOWN'), 'x86-64')
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - checks of packages from their .PKGINFO and .MTREE
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import Namcap.rules
+from Namcap.metadata import load_metadata, metadata_capable, mtree_members
+from Namcap.mtree import Mtree
+from Namcap.tests.synthpkg import make_tarball
+
+MTREE = b"""#mtree
+/set type=file uid=0 gid=0 mode=644
+./.PKGINFO time=1000.0 size=40 sha256digest=00
+./usr time=1000.0 mode=755 type=dir
+/set mode=755
+./usr/bin time=1000.0 type=dir
+./usr/bin/prog time=1000.5 size=123 sha256digest=00
+./usr/bin/link time=1000.0 mode=777 type=link link=../lib/\\303\\251.so
+/unset uid
+./usr/bin/a\\040b time=1000.0 uid=1000 gid=1000 mode=4755 size=1 sha256digest=00
+"""
+
+PKGINFO = b"pkgname = foo\npkgver = 1.0-1\narch = x86_64\n"
+
+class MetadataTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def make_package(self, members):
+		path = os.path.join(self.tmpdir, 'foo-1.0-1-x86_64.pkg.tar.gz')
+		make_tarball(path, members)
+		return path
+
+	def test_members(self):
+		members = mtree_members(Mtree(gzip.compress(MTREE)), {'.PKGINFO'})
+		self.assertEqual([m.name for m in members], ['usr', 'usr/bin',
+			'usr/bin/prog', 'usr/bin/link', 'usr/bin/a b'])
+		usr, bin, prog, link, ab = members
+		self.assertTrue(usr.isdir())
+		self.assertEqual(usr.mode, 0o755)
+		self.assertTrue(prog.isfile())
+		self.assertEqual((prog.mode, prog.size, prog.mtime), (0o755, 123, 1000))
+		self.assertEqual((prog.uname, prog.gname), ('root', 'root'))
+		self.assertTrue(link.issym())
+		self.assertEqual(link.linkname, '../lib/é.so')
+		self.assertEqual((ab.uid, ab.gid, ab.mode), (1000, 1000, 0o4755))
+		self.assertEqual((ab.uname, ab.gname), ('', ''))
+
+	def test_load(self):
+		path = self.make_package([('.MTREE', gzip.compress(MTREE)),
+			('.PKGINFO', PKGINFO), ('usr/bin/prog', b'\0' * 123)])
+		pkginfo, members = load_metadata(path)
+		self.assertEqual(pkginfo['name'], 'foo')
+		self.assertEqual([m.name for m in members], ['.MTREE', '.PKGINFO',
+			'usr', 'usr/bin', 'usr/bin/prog', 'usr/bin/link', 'usr/bin/a b'])
+		# the dot files are those of the archive
+		self.assertEqual(members[1].size, len(PKGINFO))
+
+	def test_no_mtree(self):
+		path = self.make_package([('.PKGINFO', PKGINFO),
+			('usr/bin/prog', b'\0' * 123), ('.MTREE', gzip.compress(MTREE))])
+		self.assertIsNone(load_metadata(path))
+
+	def test_capable(self):
+		rules = Namcap.rules.all_rules
+		self.assertTrue(metadata_capable(rules['permissions']()))
+		self.assertTrue(metadata_capable(rules['license']()))
+		self.assertFalse(metadata_capable(rules['hardlinks']()))
+		self.assertFalse(metadata_capable(rules['elfpaths']()))
+		# classes too, the manifest records it for the builtin rules
+		self.assertTrue(metadata_capable(rules['permissions']))
+		self.assertFalse(metadata_capable(rules['hardlinks']))
+		for name in rules:
+			self.assertEqual(rules.metadata_capable(name), metadata_capable(rules[name]))
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - parsing of .MTREE files
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import gzip
+import io
+import unittest
+
+from Namcap.mtree import Mtree, parse, unescape
+
+MTREE = b"""#mtree
+/set type=file uid=0 gid=0 mode=644
+./.PKGINFO time=1000.0 size=40 md5digest=aa sha256digest=bb
+./usr time=1000.0 mode=755 type=dir
+/set mode=755
+./usr/bin time=1000.0 type=dir
+./usr/bin/prog time=1000.5 size=123 sha256digest=cc
+./usr/bin/link time=1000.0 mode=777 type=link link=../lib/\\303\\251.so
+/unset uid gid
+./usr/bin/a\\040b time=1000.0 \\
+    mode=4755 size=1
+/unset all
+./usr/bin/c\\\\d
+"""
+
+class MtreeTests(unittest.TestCase):
+	def parse(self, text):
+		return list(parse(io.BytesIO(gzip.compress(text))))
+
+	def test_entries(self):
+		entries = self.parse(MTREE)
+		self.assertEqual([e.path for e in entries], ['./.PKGINFO', './usr',
+			'./usr/bin', './usr/bin/prog', './usr/bin/link', './usr/bin/a b',
+			'./usr/bin/c\\d'])
+		pkginfo, usr, bin, prog, link, ab, cd = entries
+		self.assertEqual((pkginfo.type, pkginfo.mode, pkginfo.size),
+				('file', 0o644, 40))
+		self.assertEqual((pkginfo.md5digest, pkginfo.sha256digest), ('aa', 'bb'))
+		self.assertEqual((usr.type, usr.mode, usr.uid), ('dir', 0o755, 0))
+		self.assertEqual((prog.name, prog.type, prog.mode, prog.time),
+				('usr/bin/prog', 'file', 0o755, 1000.5))
+		self.assertEqual(link.link, '../lib/é.so')
+		self.assertEqual((ab.type, ab.mode, ab.uid, ab.gid, ab.size),
+				('file', 0o4755, None, None, 1))
+		self.assertEqual((cd.type, cd.mode, cd.time), (None, None, None))
+
+	def test_unescape(self):
+		self.assertEqual(unescape(b'a\\040b\\tc\\\\'), 'a b\tc\\')
+		self.assertEqual(unescape(b'\\377'), '\udcff')
+
+	def test_invalid(self):
+		entry, = self.parse(b'./a mode=abc size=1\n')
+		self.assertEqual((entry.mode, entry.size), (None, 1))
+		self.assertEqual(Mtree(b'not gzipped').entries, [])
+		self.assertEqual(Mtree(gzip.compress(MTREE)[:-20]).entries, [])
+
+	def test_shared(self):
+		mtree = Mtree(gzip.compress(MTREE))
+		self.assertIs(mtree.entries, mtree.entries)
+		self.assertEqual(len(list(mtree)), 7)
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - structured output of the messages
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import json
+import unittest
+
+from Namcap.output import JsonLinesWriter, error_record, message_record
+
+class OutputTests(unittest.TestCase):
+	def test_record(self):
+		self.assertEqual(message_record('foo', 'symlink', 'E',
+			("dangling-symlink %s points to %s", ('usr/lib/a', 'b'))),
+			{'package': 'foo', 'rule': 'symlink', 'severity': 'error',
+				'tag': 'dangling-symlink', 'args': ['usr/lib/a', 'b']})
+		self.assertEqual(message_record('foo', 'depends', 'W',
+			("dependency-not-needed %s", 'bar'))['args'], ['bar'])
+		self.assertEqual(message_record('foo', 'licensepkg', 'I',
+			("missing-license", ()))['args'], [])
+		self.assertEqual(error_record('bad.pkg.tar.gz', 'invalid-package'),
+			{'package': 'bad.pkg.tar.gz', 'rule': None, 'severity': 'error',
+				'tag': 'invalid-package', 'args': []})
+
+	def test_writer(self):
+		out = io.StringIO()
+		writer = JsonLinesWriter(out, buffer_size = 100)
+		writer.write({'args': ['a']})
+		self.assertEqual(out.getvalue(), '')
+		writer.write({'args': ['x' * 100, b'']})
+		self.assertEqual(out.getvalue().count('\n'), 2)
+		writer.write({'args': ['\udcff']})
+		writer.flush()
+		lines = out.getvalue().splitlines()
+		self.assertEqual(json.loads(lines[0]), {'args': ['a']})
+		self.assertEqual(json.loads(lines[1])['args'], ['x' * 100, "b''"])
+		self.assertEqual(json.loads(lines[2])['args'], ['\udcff'])
+
+# vim: set ts=4 sw=4 noet:
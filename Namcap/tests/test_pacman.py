@@ -2,8 +2,10 @@ import os
 import unittest
 import tempfile
 import shutil
+import tarfile
 
 import Namcap.package
+from Namcap.tests.synthpkg import make_tarball
 
 pkgbuild = """
 # Maintainer: Arch Linux <archlinux@example.com>
@@ -70,4 +72,112 @@ class PkgbuildLoaderTests(unittest.TestCase):
 		self.assertEqual(self.pkginfo['orig_provides'],
 				["yourpackage=0.9"])
 
+pkginfo = """# Generated by makepkg
+pkgname = mypackage
+pkgver = 1.0-1
+pkgdesc = A package
+url = http://www.example.com/
+builddate = 1300000000
+size = 12345
+arch = x86_64
+license = GPL
+depend = glibc
+depend = foobar>=2
+optdepend = libabc: provides the abc feature
+backup = etc/mypackage.conf
+"""
+
+class TarfileLoaderTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.tarname = os.path.join(self.tmpdir, "mypackage.pkg.tar.gz")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def load(self, members):
+		make_tarball(self.tarname, members)
+		with tarfile.open(self.tarname) as tar:
+			pkg = Namcap.package.load_from_tarfile(tar)
+			names = [entry.name for entry in tar]
+		return pkg, names
+
+	def test_pkginfo(self):
+		pkg, names = self.load([(".PKGINFO", pkginfo.encode()),
+			("usr", None)])
+		self.assertEqual(pkg['name'], "mypackage")
+		self.assertEqual(pkg['version'], "1.0-1")
+		self.assertEqual(pkg['desc'], "A package")
+		self.assertEqual(pkg['isize'], 12345)
+		self.assertEqual(pkg['arch'], ["x86_64"])
+		self.assertEqual(pkg['depends'], ["glibc", "foobar"])
+		self.assertEqual(pkg['optdepends'], ["libabc"])
+		self.assertEqual(pkg['backup'], ["etc/mypackage.conf"])
+		self.assertEqual(pkg['provides'], [])
+		self.assertFalse(pkg['has_scriptlet'])
+		self.assertIsNone(pkg['packager'])
+		# the archive can still be walked from the start
+		self.assertEqual(names, [".PKGINFO", "usr"])
+
+	def test_scriptlet(self):
+		pkg, names = self.load([(".PKGINFO", pkginfo.encode()),
+			(".INSTALL", b"post_install() { :; }\n"), ("usr", None)])
+		self.assertTrue(pkg['has_scriptlet'])
+
+	def test_pkginfo_not_first(self):
+		pkg, names = self.load([("usr", None),
+			(".PKGINFO", pkginfo.encode())])
+		self.assertEqual(pkg['name'], "mypackage")
+
+	def test_no_pkginfo(self):
+		pkg, names = self.load([("usr", None)])
+		self.assertIsNone(pkg)
+
+class FakePackage(object):
+	def __init__(self, name, provides, version = "1.0-1"):
+		self.name = name
+		self.provides = provides
+		self.version = version
+
+class FakeDatabase(object):
+	def __init__(self, name, pkgcache):
+		self.name = name
+		self.pkgcache = pkgcache
+
+	def get_pkg(self, name):
+		for pkg in self.pkgcache:
+			if pkg.name == name:
+				return pkg
+
+class ProvidesIndexTests(unittest.TestCase):
+	def setUp(self):
+		self.db = FakeDatabase("namcap-test-db", [
+			FakePackage("bash", ["sh"]),
+			FakePackage("dash", ["sh=0.5"]),
+			FakePackage("jre8-openjdk", ["java-runtime=8", "java-runtime-headless=8"]),
+			FakePackage("mesa", ["libgl", "opengl-driver"]),
+		])
+
+	def test_lookup(self):
+		lookup = Namcap.package.lookup_provider
+		self.assertEqual(lookup("sh", self.db).name, "bash")
+		self.assertEqual(lookup("java-runtime", self.db).name, "jre8-openjdk")
+		self.assertEqual(lookup("libgl", self.db).name, "mesa")
+		self.assertIsNone(lookup("bash", self.db))
+
+	def test_index(self):
+		index = Namcap.package.provides_index(self.db)
+		self.assertEqual([p.name for p in index["sh"]], ["bash", "dash"])
+		self.assertIs(Namcap.package.provides_index(self.db), index)
+
+	def test_versions(self):
+		testing = FakeDatabase("namcap-test-testing", [
+			FakePackage("bash", [], "5.0-2"),
+			FakePackage("zsh", [], "5.8-1"),
+		])
+		versions = Namcap.package.get_versions(["bash", "dash", "zsh"],
+				[testing, self.db])
+		self.assertEqual(versions, {"bash": "5.0-2", "dash": "1.0-1",
+			"zsh": "5.8-1"})
+
 # vim: set ts=4 sw=4 noet:
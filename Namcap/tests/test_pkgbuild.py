@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - parsepkgbuild worker pool
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Namcap.pkgbuild import WorkerPool, run_parsepkgbuild
+
+PKGBUILD = """
+pkgname=foo
+pkgver=1.0
+pkgrel=1
+pkgdesc="A package"
+arch=('i686' 'x86_64')
+depends=('glibc' 'bash')
+echo oops >&2
+"""
+
+class WorkerPoolTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		with open(os.path.join(self.tmpdir, "PKGBUILD"), "w") as f:
+			f.write(PKGBUILD)
+		with open(os.path.join(self.tmpdir, "BROKEN"), "w") as f:
+			f.write("pkgname=foo\n")
+		self.pool = WorkerPool(max_jobs = 3)
+
+	def tearDown(self):
+		self.pool.close()
+		shutil.rmtree(self.tmpdir)
+
+	def test_same_output(self):
+		expected = run_parsepkgbuild(self.tmpdir, "PKGBUILD")
+		self.assertEqual(expected[0], 0)
+		for i in range(5):
+			status, out, err = self.pool.parse(self.tmpdir, "PKGBUILD")
+			self.assertEqual((status, out), expected[:2])
+			self.assertEqual(err, b"oops\n")
+
+	def test_reuse(self):
+		self.pool.parse(self.tmpdir, "PKGBUILD")
+		worker = self.pool._idle[0]
+		self.pool.parse(self.tmpdir, "PKGBUILD")
+		self.assertEqual(self.pool._idle, [worker])
+		# recycled after max_jobs PKGBUILDs
+		self.pool.parse(self.tmpdir, "PKGBUILD")
+		self.assertEqual(self.pool._idle, [])
+		self.assertIsNotNone(worker.process.poll())
+
+	def test_failure(self):
+		status, out, err = self.pool.parse(self.tmpdir, "BROKEN")
+		self.assertEqual(status, 1)
+		self.assertIn(b"invalid package file", out)
+		self.assertEqual(self.pool._idle, [])
+		self.assertEqual(self.pool.parse(self.tmpdir, "PKGBUILD")[0], 0)
+
+	def test_dead_worker(self):
+		self.pool.parse(self.tmpdir, "PKGBUILD")
+		self.pool._idle[0].process.kill()
+		self.assertEqual(self.pool.parse(self.tmpdir, "PKGBUILD")[:2],
+				run_parsepkgbuild(self.tmpdir, "PKGBUILD")[:2])
+
+# vim: set ts=4 sw=4 noet:
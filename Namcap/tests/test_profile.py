@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - time spent in each stage of the checks
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import json
+import unittest
+
+import Namcap.profile
+from Namcap.ruleclass import TarballRule, uses_member_callbacks
+
+class MemberRule(TarballRule):
+	name = "member"
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.infos.append(('member %s', entry))
+
+class ProfileTests(unittest.TestCase):
+	def tearDown(self):
+		Namcap.profile._stages = None
+
+	def test_disabled(self):
+		rule = MemberRule()
+		self.assertIs(Namcap.profile.instrument(rule, 'member'), rule)
+		self.assertNotIn('analyze_member', vars(rule))
+		with Namcap.profile.stage('open_archive'):
+			pass
+		self.assertEqual(Namcap.profile.report()['stages'], {})
+
+	def test_stages(self):
+		Namcap.profile.enable()
+		with Namcap.profile.stage('open_archive'):
+			sum(range(1000))
+		with Namcap.profile.stage('open_archive'):
+			pass
+		rule = Namcap.profile.instrument(MemberRule(), 'member')
+		self.assertTrue(uses_member_callbacks(rule))
+		rule.prepare(None)
+		rule.analyze_member(None, 'a', None)
+		self.assertEqual(rule.infos, [('member %s', 'a')])
+		stages = Namcap.profile.report()['stages']
+		self.assertEqual(sorted(stages), ['open_archive', 'rule member'])
+		self.assertEqual(stages['open_archive']['calls'], 2)
+		self.assertEqual(stages['rule member']['calls'], 2)
+		self.assertGreater(stages['open_archive']['wall'], 0)
+
+	def test_merge(self):
+		Namcap.profile.enable()
+		Namcap.profile.add('analyze_depends', 1, 2.0, 1.0)
+		report = Namcap.profile.report()
+		Namcap.profile.merge(report)
+		out = io.StringIO()
+		Namcap.profile.write_json(Namcap.profile.report(), out)
+		self.assertEqual(json.loads(out.getvalue()), {'version': 1,
+			'stages': {'analyze_depends': {'calls': 2, 'wall': 4.0, 'cpu': 2.0}}})
+		Namcap.profile.add('rule a', 1, 5.0, 0.5)
+		table = Namcap.profile.format_table(Namcap.profile.report()).splitlines()
+		self.assertEqual([line.split()[0] for line in table],
+				['stage', 'rule', 'analyze_depends'])
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - cache of the results of previous checks
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Namcap.resultcache import ResultCache
+
+class ResultCacheTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.cache = ResultCache(os.path.join(self.tmpdir, 'results'))
+		# do not depend on the pacman database of the host
+		self.cache._db_fingerprint = 'db'
+		self.package = os.path.join(self.tmpdir, 'foo-1.0-1-any.pkg.tar')
+		self.tags = os.path.join(self.tmpdir, 'tags')
+		for path in (self.package, self.tags):
+			with open(path, 'w') as f:
+				f.write(path)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_round_trip(self):
+		key = self.cache.key(self.package, ['rpath', 'elfpaths'], self.tags)
+		self.assertIsNone(self.cache.get(key))
+		messages = [('licensepkg', 'E', ('missing-license', ())),
+				('depends', 'W', ('dependency-detected-not-included %s (%s)', ('bar', 'libbar.so')))]
+		self.cache.put(key, 'foo', messages)
+		self.assertEqual(self.cache.get(key), ('foo', messages))
+
+	def test_key(self):
+		key = self.cache.key(self.package, ['rpath', 'elfpaths'], self.tags)
+		self.assertEqual(key,
+				self.cache.key(self.package, ['elfpaths', 'rpath'], self.tags))
+		self.assertNotEqual(key,
+				self.cache.key(self.package, ['rpath'], self.tags))
+		self.assertNotEqual(key,
+				self.cache.key(self.package, ['rpath', 'elfpaths'], self.tags, True))
+		with open(self.tags, 'a') as f:
+			f.write('changed')
+		self.assertNotEqual(key,
+				self.cache.key(self.package, ['rpath', 'elfpaths'], self.tags))
+
+	def test_corrupted(self):
+		key = self.cache.key(self.package, [], self.tags)
+		self.cache.put(key, 'foo', [])
+		with open(self.cache._path(key), 'w') as f:
+			f.write('{"name": "foo"')
+		self.assertIsNone(self.cache.get(key))
+		# saved without the rules by older versions
+		with open(self.cache._path(key), 'w') as f:
+			f.write('{"name": "foo", "messages": [["E", "(\'missing-license\', ())"]]}')
+		self.assertIsNone(self.cache.get(key))
+
+	def test_evict(self):
+		messages = [('rule', 'I', ('some-tag %s', ('x' * 100,)))]
+		keys = ['%064x' % i for i in range(10)]
+		for i, key in enumerate(keys):
+			self.cache.put(key, 'foo', messages)
+			os.utime(self.cache._path(key), ns = (i * 10**9, i * 10**9))
+		size = os.stat(self.cache._path(keys[0])).st_size
+		self.cache.max_size = 9 * size
+		# using a result makes it the most recently used one
+		self.cache.get(keys[0])
+		self.cache.put('%064x' % 10, 'foo', messages)
+		self.assertIsNotNone(self.cache.get(keys[0]))
+		self.assertIsNone(self.cache.get(keys[1]))
+		self.assertIsNotNone(self.cache.get(keys[-1]))
+		self.assertLessEqual(sum(size for mtime, size, path in self.cache._entries()),
+				self.cache.max_size)
+
+# vim: set ts=4 sw=4 noet:
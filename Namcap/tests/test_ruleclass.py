@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the single pass tarball scanner
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import Namcap.ruleclass
+from Namcap.ruleclass import TarballRule, scan_tarball
+from Namcap.tests.synthpkg import make_tarball
+
+class MagicRule(TarballRule):
+	name = "magic"
+	needs_content = True
+	def prepare(self, pkginfo):
+		self.seen = []
+		self.magic = {}
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.seen.append(entry.name)
+		if fileobj is not None:
+			self.magic[entry.name] = fileobj.read(4)
+			fileobj.close()
+	def finalize(self, pkginfo):
+		self.infos.append(("magic %s", len(self.seen)))
+
+class NamesRule(TarballRule):
+	name = "names"
+	def prepare(self, pkginfo):
+		self.fileobjs = []
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.fileobjs.append(fileobj)
+
+class WholeTarballRule(TarballRule):
+	name = "whole"
+	def analyze(self, pkginfo, tar):
+		self.names = tar.getnames()
+
+class ScanTarballTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.tarname = os.path.join(self.tmpdir, "test.tar.gz")
+		make_tarball(self.tarname, [
+			(".PKGINFO", b"pkgname = test\n"),
+			("usr", None),
+			("usr/bin", None),
+			("usr/bin/prog", b"\x7fELF" + b"\0" * 200000),
+			("usr/bin/script", b"#!/bin/sh\necho hello\n"),
+		])
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_single_pass(self):
+		rules = [MagicRule(), MagicRule(), NamesRule()]
+		with tarfile.open(self.tarname) as tar:
+			scan_tarball(None, tar, rules)
+		for r in rules[:2]:
+			self.assertEqual(r.seen, [".PKGINFO", "usr", "usr/bin",
+				"usr/bin/prog", "usr/bin/script"])
+			self.assertEqual(r.magic, {
+				".PKGINFO": b"pkgn",
+				"usr/bin/prog": b"\x7fELF",
+				"usr/bin/script": b"#!/b",
+			})
+			self.assertEqual(r.infos, [("magic %s", 5)])
+		# rules not asking for contents do not get any
+		self.assertEqual(rules[2].fileobjs, [None] * 5)
+
+	def test_analyze(self):
+		r = MagicRule()
+		with tarfile.open(self.tarname) as tar:
+			r.analyze(None, tar)
+		self.assertEqual(r.magic["usr/bin/prog"], b"\x7fELF")
+
+	def test_legacy_rule(self):
+		r = WholeTarballRule()
+		m = MagicRule()
+		with tarfile.open(self.tarname) as tar:
+			scan_tarball(None, tar, [r, m])
+		self.assertEqual(r.names, m.seen)
+
+class MemberFileTests(unittest.TestCase):
+	def setUp(self):
+		self.contents = bytes(range(256)) * 1024
+		self.data = Namcap.ruleclass.MemberData(
+				io.BytesIO(self.contents), len(self.contents))
+
+	def tearDown(self):
+		self.data.close()
+
+	def test_read_seek(self):
+		f = self.data.open()
+		self.assertEqual(f.read(4), self.contents[:4])
+		f.seek(100000)
+		self.assertEqual(f.read(10), self.contents[100000:100010])
+		f.seek(0)
+		self.assertEqual(f.read(), self.contents)
+		self.assertEqual(f.seek(-4, os.SEEK_END), len(self.contents) - 4)
+		self.assertEqual(f.read(100), self.contents[-4:])
+
+	def test_independent_positions(self):
+		f1 = self.data.open()
+		f2 = self.data.open()
+		f1.read(1000)
+		f1.close()
+		self.assertEqual(f2.read(10), self.contents[:10])
+
+	def test_readline(self):
+		data = Namcap.ruleclass.MemberData(io.BytesIO(b"#!/bin/sh\nfoo\n"), 14)
+		f = data.open()
+		self.assertEqual(f.readline(), b"#!/bin/sh\n")
+		self.assertEqual(list(f), [b"foo\n"])
+		data.close()
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the rule registry
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import Namcap.rules
+from Namcap.rules import RuleRegistry, generate_manifest, load_registry
+from Namcap.rules.manifest import RULES
+
+plugin = """
+from Namcap.ruleclass import PkgInfoRule
+
+class SiteRule(PkgInfoRule):
+	name = "site"
+	description = "A site-specific rule"
+	def analyze(self, pkginfo, tar):
+		pass
+"""
+
+class RegistryTests(unittest.TestCase):
+	def test_manifest(self):
+		# run Namcap.rules.write_manifest() if this fails
+		self.assertEqual(generate_manifest(), RULES)
+
+	def test_lazy(self):
+		registry = RuleRegistry()
+		registry.add("missing", "namcap_no_such_module", "Rule",
+				"pkginfo", "Never imported", True)
+		self.assertIn("missing", registry)
+		self.assertEqual(registry.kind("missing"), "pkginfo")
+		self.assertEqual(registry.description("missing"), "Never imported")
+		self.assertTrue(registry.metadata_capable("missing"))
+		self.assertRaises(ImportError, registry.__getitem__, "missing")
+
+	def test_builtin(self):
+		registry = load_registry()
+		self.assertEqual(list(registry)[:2], ["anyelf", "elfpaths"])
+		self.assertEqual(registry["anyelf"], Namcap.rules.anyelf.package)
+		self.assertEqual(registry.kind("pkgnameindesc"), "pkginfo")
+
+	def test_entry_points(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			with open(os.path.join(tmpdir, "namcap_site_rules.py"), "w") as f:
+				f.write(plugin)
+			distinfo = os.path.join(tmpdir, "namcap_site_rules-1.0.dist-info")
+			os.mkdir(distinfo)
+			with open(os.path.join(distinfo, "entry_points.txt"), "w") as f:
+				f.write("[namcap.rules]\nsite = namcap_site_rules:SiteRule\n")
+			sys.path.insert(0, tmpdir)
+			registry = load_registry()
+			self.assertNotIn("namcap_site_rules", sys.modules)
+			self.assertIn("site", registry)
+			self.assertEqual(registry.kind("site"), "pkginfo")
+			self.assertEqual(registry.description("site"), "A site-specific rule")
+			self.assertTrue(registry.metadata_capable("site"))
+		finally:
+			sys.path.remove(tmpdir)
+			sys.modules.pop("namcap_site_rules", None)
+			shutil.rmtree(tmpdir)
+
+# vim: set ts=4 sw=4 noet:
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - tests for the concurrent rule scheduler
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+
+import Namcap.depgraph
+import Namcap.package
+import Namcap.scheduler
+import Namcap.tags
+from Namcap.ruleclass import PkgInfoRule, TarballRule
+from Namcap.tests.synthpkg import make_tarball
+
+class ProducerRule(TarballRule):
+	name = "producer"
+	writes_detected_deps = True
+	def __init__(self, dep, delay):
+		super().__init__()
+		self.dep = dep
+		self.delay = delay
+	def prepare(self, pkginfo):
+		self.count = 0
+	def analyze_member(self, pkginfo, entry, fileobj):
+		self.count += 1
+	def finalize(self, pkginfo):
+		time.sleep(self.delay)
+		pkginfo.detected_deps[self.dep].append(
+				("java-runtime-needed %s", str(self.count)))
+
+class MetadataRule(PkgInfoRule):
+	name = "metadata"
+	def analyze(self, pkginfo, tar):
+		self.infos.append(("name %s", pkginfo["name"]))
+
+class Exclusive(object):
+	"Counts the calls made while another thread is in one, as into pyalpm"
+	def __init__(self):
+		self.inside = 0
+		self.overlaps = 0
+		self.lock = threading.Lock()
+
+	def call(self):
+		with self.lock:
+			self.inside += 1
+			if self.inside > 1:
+				self.overlaps += 1
+		time.sleep(0.0001)
+		with self.lock:
+			self.inside -= 1
+
+class FakePackage(object):
+	"A pyalpm package, its attributes being loaded lazily like in libalpm"
+	def __init__(self, exclusive, **data):
+		self._exclusive = exclusive
+		self._data = dict(conflicts = [], url = '', desc = '', files = [],
+				groups = [], has_scriptlet = False, size = 0, licenses = [],
+				optdepends = [], packager = '', replaces = [], arch = 'x86_64',
+				backup = [])
+		self._data.update(data)
+
+	def __getattr__(self, name):
+		if name.startswith('_'):
+			raise AttributeError(name)
+		self._exclusive.call()
+		try:
+			return self._data[name]
+		except KeyError:
+			raise AttributeError(name)
+
+class FakeDatabase(object):
+	def __init__(self, exclusive, name, packages):
+		self._exclusive = exclusive
+		self.name = name
+		self._packages = packages
+
+	@property
+	def pkgcache(self):
+		self._exclusive.call()
+		return list(self._packages)
+
+	def get_pkg(self, name):
+		self._exclusive.call()
+		for p in self._packages:
+			if p._data['name'] == name:
+				return p
+
+class FakeHandle(object):
+	def __init__(self, exclusive, dbpath, local, testing):
+		self._exclusive = exclusive
+		self.dbpath = dbpath
+		self._local = local
+		self._syncdbs = [testing]
+
+	def get_localdb(self):
+		self._exclusive.call()
+		return self._local
+
+	def get_syncdbs(self):
+		self._exclusive.call()
+		return list(self._syncdbs)
+
+class LookupRule(PkgInfoRule):
+	"Looks installed packages up, like the dependency-producing rules"
+	name = "lookup"
+	writes_detected_deps = True
+	def __init__(self, names):
+		super().__init__()
+		self.names = names
+	def analyze(self, pkginfo, tar):
+		for name in Namcap.package.testing_releases(self.names):
+			self.infos.append(("testing %s", name))
+		for name in self.names:
+			p = Namcap.package.load_from_db(name)
+			if p is not None:
+				pkginfo.detected_deps[p["name"]].append(
+						("java-runtime-needed %s", name))
+
+class LookupTarballRule(TarballRule):
+	name = "lookuptarball"
+	writes_detected_deps = True
+	def __init__(self, names):
+		super().__init__()
+		self.lookup = LookupRule(names)
+	def analyze_member(self, pkginfo, entry, fileobj):
+		pass
+	def finalize(self, pkginfo):
+		self.lookup.analyze(pkginfo, None)
+		self.infos = self.lookup.infos
+
+class SchedulerTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.tarname = os.path.join(self.tmpdir, "test.tar.gz")
+		make_tarball(self.tarname, [
+			(".PKGINFO", b"pkgname = test\n"),
+			("usr", None),
+		])
+		self.pkginfo = Namcap.package.PacmanPackage({'name': 'package'})
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_run_rules(self):
+		rules = [ProducerRule("dep1", 0.2), ProducerRule("dep1", 0),
+				MetadataRule()]
+		with tarfile.open(self.tarname) as tar:
+			e, w, i = Namcap.scheduler.run_rules(self.pkginfo, tar, rules)
+		# reasons are kept in rule order whatever finished first
+		self.assertEqual(self.pkginfo.detected_deps["dep1"],
+				[("java-runtime-needed %s", "2")] * 2)
+		reason = Namcap.tags.format_message(("java-runtime-needed %s", "2"))
+		self.assertEqual(e, [("dependency-detected-not-included %s (%s)",
+			("dep1", reason + ", " + reason))])
+		self.assertEqual(rules[2].infos, [("name %s", "package")])
+
+	def run_lookups(self, workers):
+		pkginfo = Namcap.package.PacmanPackage({'name': 'package'})
+		names = ["lib%d" % i for i in range(10)] + ["sh", "missing"]
+		rules = []
+		for i in range(4):
+			rules.append(LookupRule(names[i:]))
+			rules.append(LookupTarballRule(names[:i + 8]))
+		with tarfile.open(self.tarname) as tar:
+			depends = Namcap.scheduler.run_rules(pkginfo, tar, rules,
+					workers = workers)
+		return depends, [rule.infos for rule in rules]
+
+	def test_pyalpm_lock(self):
+		"pyalpm is never called by two threads at once"
+		exclusive = Exclusive()
+		local = [FakePackage(exclusive, name = "lib%d" % i, version = "1",
+			depends = ["lib%d" % (i + 1)], provides = []) for i in range(10)]
+		local.append(FakePackage(exclusive, name = "bash", version = "5",
+			depends = [], provides = ["sh"]))
+		testing = [FakePackage(exclusive, name = "lib%d" % i, version = "1",
+			depends = [], provides = []) for i in range(0, 10, 3)]
+		handle = FakeHandle(exclusive, self.tmpdir,
+				FakeDatabase(exclusive, "local", local),
+				FakeDatabase(exclusive, "testing", testing))
+		Namcap.package.reset_handle()
+		Namcap.package._pyalpm_handle = handle
+		Namcap.depgraph._graph = None
+		try:
+			serial = self.run_lookups(1)
+			for i in range(2):
+				self.assertEqual(self.run_lookups(8), serial)
+		finally:
+			Namcap.package.reset_handle()
+			Namcap.depgraph._graph = None
+		self.assertEqual(exclusive.overlaps, 0)
+		self.assertIn(("testing %s", "lib3"), serial[1][0])
+
+# vim: set ts=4 sw=4 noet:
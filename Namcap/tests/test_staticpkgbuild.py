@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - static evaluation of PKGBUILDs
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import Namcap.package
+import Namcap.pkgbuild
+import Namcap.staticpkgbuild
+from Namcap.staticpkgbuild import Evaluator, Lexer, Unsupported, evaluate
+
+SPLIT_PKGBUILD = """
+pkgbase=foo
+pkgname=('foo' 'foo-docs')
+pkgver=1.0
+pkgrel=1
+_flavour="a  b"
+pkgdesc="foo $pkgver with ${_flavour}"
+arch=('i686' 'x86_64')
+url=http://example.com/{a,b}
+license=('GPL' "custom:${_flavour}")
+groups=($_flavour x{1,2,{3,4}}y '{q,r}')
+depends=('glibc' "bash>=4" lib{a,b}.so)
+depends+=(zlib)
+makedepends=("${depends[@]}" cmake)
+optdepends=('foo: for   the    foo')
+_empty=()
+_x=p
+replaces=($_x{1,2} q$_x{,2}r "$_x"{1,2} ${_x}{1,2})
+conflicts=("${_empty[@]}")
+source=("$pkgname-$pkgver.tar.gz::https://example.com/$pkgname.tar.gz"
+        # a comment
+        local.patch \\
+        other.patch)
+md5sums=('SKIP'
+         'abc')   # trailing comment
+
+build() {
+  cd "$srcdir/$pkgbase-$pkgver"
+  make
+}
+
+package_foo() {
+  depends+=('foo-docs')
+  make DESTDIR="$pkgdir" install || return 1
+  optdepends=(never)
+}
+
+package_foo-docs()
+{
+  pkgdesc="docs"; arch=(any)
+  true && conflicts=(c1) || conflicts=(c2)
+}
+"""
+
+class EvaluatorTests(unittest.TestCase):
+	def fields(self, text, **variables):
+		evaluator = Evaluator('/nonexistent')
+		evaluator.variables.update(variables)
+		tok = Lexer(text).token()
+		return evaluator.fields(tok[1])
+
+	def test_brace_expansion(self):
+		self.assertEqual(self.fields("a{b,c{d,e}}f"), ["abf", "acdf", "acef"])
+		self.assertEqual(self.fields("'{a,b}'"), ["{a,b}"])
+		self.assertEqual(self.fields("{a}{}"), ["{a}{}"])
+		self.assertRaises(Unsupported, self.fields, "{1..3}")
+		# braces are expanded before the names of the variables are known
+		self.assertEqual(self.fields("$a{1,2}", a = ["x"], a1 = ["y"]), ["y"])
+		self.assertEqual(self.fields('"$a"{1,2}', a = ["x"]), ["x1", "x2"])
+		self.assertEqual(self.fields("${a}{1,2}", a = ["x"]), ["x1", "x2"])
+		self.assertEqual(self.fields("$a{-,+}", a = ["x"]), ["x-", "x+"])
+
+	def test_word_splitting(self):
+		self.assertEqual(self.fields('x$a', a = [" b  c "]), ["x", "b", "c"])
+		self.assertEqual(self.fields('"x$a"', a = [" b "]), ["x b "])
+		self.assertEqual(self.fields('"${a[@]}"', a = ["b c", "d"]), ["b c", "d"])
+		self.assertEqual(self.fields('"${a[@]}"', a = []), [])
+		self.assertEqual(self.fields('""'), [""])
+		self.assertEqual(self.fields('$unset'), [])
+
+	def test_unsupported(self):
+		for text in ['pkgname=$(echo foo)', 'pkgname=`echo foo`',
+				'source ./other', 'pkgname=${foo:=bar}', 'cd /',
+				'pkgname=foo; echo $BASH', 'cat <<EOF\nEOF']:
+			evaluator = Evaluator('/nonexistent', reserved = {'BASH'})
+			self.assertRaises(Unsupported, evaluator.run, text)
+
+class StaticPkgbuildTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.path = os.path.join(self.tmpdir, "PKGBUILD")
+		with open(self.path, "w") as f:
+			f.write(SPLIT_PKGBUILD)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_split(self):
+		out = evaluate(self.path, frozenset())
+		pkginfo = Namcap.package.PacmanPackage(db = out)
+		self.assertTrue(pkginfo.is_split)
+		self.assertEqual(pkginfo["groups"], ["a", "b", "x1y", "x2y", "x3y",
+			"x4y", "{q,r}"])
+		foo, docs = pkginfo.subpackages
+		self.assertEqual(foo["depends"], ["glibc", "bash", "liba.so", "libb.so",
+			"zlib", "foo-docs"])
+		self.assertEqual(foo["optdepends"], ["foo"])
+		self.assertEqual(docs["desc"], "docs")
+		self.assertEqual(docs["arch"], ["any"])
+		self.assertEqual(docs["conflicts"], ["c1"])
+		self.assertEqual(pkginfo["replaces"], ["q", "q", "p1", "p2", "p1", "p2"])
+		self.assertEqual(docs["pkgfunction"], "function")
+
+	def test_same_as_bash(self):
+		status, out, err = Namcap.pkgbuild.get_pool().parse(self.tmpdir, "PKGBUILD")
+		self.assertEqual(status, 0)
+		setvars = Namcap.staticpkgbuild.bash_variables(
+				Namcap.pkgbuild._parse_with_bash)
+		self.assertEqual(evaluate(self.path, setvars),
+				out.decode('utf-8', 'ignore'))
+
+	def test_crlf_same_as_bash(self):
+		with open(self.path, "w", newline = "") as f:
+			f.write("pkgname=foo\r\npkgver=1\r\npkgrel=1\r\narch=(x86_64)\r\n")
+		setvars = Namcap.staticpkgbuild.bash_variables(
+				Namcap.pkgbuild._parse_with_bash)
+		self.assertRaises(Unsupported, evaluate, self.path, setvars)
+		status, out, err = Namcap.pkgbuild.get_pool().parse(self.tmpdir, "PKGBUILD")
+		self.assertIn("foo\r", out.decode('utf-8', 'ignore'))
+		self.assertEqual(Namcap.pkgbuild.parse_pkgbuild(self.path),
+				(status, out.decode('utf-8', 'ignore'), err.decode('utf-8', 'ignore')))
+
+# vim: set ts=4 sw=4 noet:
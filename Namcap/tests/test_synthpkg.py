@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# namcap tests - synthetic package generator
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307
+#   USA
+#
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import Namcap.archive
+import Namcap.elf
+import Namcap.metadata
+import Namcap.package
+from Namcap.tests.synthpkg import Shape, build_package, elf_library
+
+class SyntheticPackageTests(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	def test_elf(self):
+		data = elf_library('libfoo.so.1', 1000)
+		summary = Namcap.elf.ELFSummary(io.BytesIO(data))
+		self.assertEqual((summary.elfclass, summary.e_machine, summary.e_type),
+				(64, 'EM_X86_64', 'ET_DYN'))
+		self.assertEqual(summary.needed, ['libc.so.6'])
+		self.assertTrue(summary.bind_now)
+		symbols = Namcap.elf.DynamicSymbols(io.BytesIO(data))
+		self.assertEqual(symbols.undefined, {'malloc', 'free'})
+		self.assertIn('libfoo_0', symbols.exported)
+
+	def test_package(self):
+		shape = Shape(files = 20, depth = 3, elves = 2, scripts = 3, symlinks = 4)
+		path = os.path.join(self.tmpdir, 'foo-1.0-1-x86_64.pkg.tar.xz')
+		build_package(path, shape, name = 'foo')
+		with open(path, 'rb') as f:
+			data = f.read()
+		build_package(path, shape, name = 'foo')
+		with open(path, 'rb') as f:
+			self.assertEqual(f.read(), data)
+
+		tar = Namcap.archive.open_archive(path)
+		pkginfo = Namcap.package.load_from_tarfile(tar)
+		members = tar.getmembers()
+		tar.close()
+		self.assertEqual(pkginfo['name'], 'foo')
+		self.assertEqual(len([m for m in members if m.isfile()]), 2 + 20 + 2 + 3)
+		self.assertEqual(len([m for m in members if m.issym()]), 4)
+		self.assertEqual(max(m.name.count('/') for m in members), 6)
+		# the .MTREE describes every member
+		pkginfo, mtree_members = Namcap.metadata.load_metadata(path)
+		self.assertEqual(sorted(m.name for m in mtree_members),
+				sorted(m.name for m in members))
+
+# vim: set ts=4 sw=4 noet:
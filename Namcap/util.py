@@ -20,11 +20,20 @@
 import os
 import re
 
+# long enough for every magic number below
+MAGIC_SIZE = 8
+
 def _file_has_magic(fileobj, magic_bytes):
-	length = len(magic_bytes)
-	magic = fileobj.read(length)
-	fileobj.seek(0)
-	return magic == magic_bytes
+	# members handed out by scan_tarball() share their first bytes
+	cache = getattr(fileobj, 'cache', None)
+	if cache is None:
+		magic = fileobj.read(len(magic_bytes))
+		fileobj.seek(0)
+		return magic == magic_bytes
+	if 'head' not in cache:
+		cache['head'] = fileobj.read(MAGIC_SIZE)
+		fileobj.seek(0)
+	return cache['head'].startswith(magic_bytes)
 
 def is_elf(fileobj):
 	"Take file object, peek at the magic bytes to check if ELF file."
@@ -43,6 +52,14 @@ def is_java(fileobj):
 	return _file_has_magic(fileobj, b"\xCA\xFE\xBA\xBE")
 
 def script_type(fileobj):
+	cache = getattr(fileobj, 'cache', None)
+	if cache is not None:
+		if 'script_type' not in cache:
+			cache['script_type'] = _script_type(fileobj)
+		return cache['script_type']
+	return _script_type(fileobj)
+
+def _script_type(fileobj):
 	firstline = fileobj.readline()
 	fileobj.seek(0)
 	try:
@@ -63,4 +80,9 @@ def script_type(fileobj):
 
 clean_filename = lambda s: re.search(r"/tmp/namcap\.[0-9]*/(.*)", s).group(1)
 
+def cache_dir():
+	"The directory where namcap keeps data between runs"
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+	return os.path.join(base, 'namcap')
+
 # vim: set ts=4 sw=4 noet:
@@ -19,8 +19,10 @@
 #
 # 
 
+import contextlib
 import getopt
 import imp
+import io
 import os
 import re
 import shutil
@@ -29,13 +31,23 @@ import sys
 import tarfile
 import types
 
+import Namcap.archive
 import Namcap.depends
+import Namcap.incremental
+import Namcap.metadata
+import Namcap.output
+import Namcap.pkgbuild
+import Namcap.profile
+import Namcap.resultcache
+import Namcap.scheduler
 import Namcap.tags
 import Namcap.version
 
 # Functions
 def get_modules():
 	"""Return all possible modules (rules)"""
+	# imported on first use, namcap -v or --help do not need the rules
+	import Namcap.rules
 	return Namcap.rules.all_rules
 
 def usage():
@@ -45,8 +57,17 @@ def usage():
 	print("")
 	print("Options are:")
 	print("    -L, --list                       : list available rules")
+	print("    --cache                          : reuse the results of previous runs on the same packages")
+	print("    --cache-size=size                : keep up to SIZE MiB of results in the cache")
+	print("    --format=format                  : print messages as text (default) or as JSON Lines (jsonl)")
 	print("    -i                               : prints information (debug) responses from rules")
+	print("    --incremental                    : only analyze the files that changed since the last build")
+	print("    -j jobs, --jobs=jobs             : check up to JOBS packages in parallel")
 	print("    -m                               : makes the output parseable (machine-readable)")
+	print("    --metadata-only                  : only apply the rules needing no more than .PKGINFO and .MTREE")
+	print("    --parse-workers=workers          : parse PKGBUILDs with up to WORKERS bash processes")
+	print("    --profile                        : print the time spent in each stage and rule")
+	print("    --profile-json=file              : write the time spent in each stage and rule to FILE as JSON")
 	print("    -e rulelist, --exclude=rulelist  : don't apply RULELIST rules to the package")
 	print("    -r rulelist, --rules=rulelist    : only apply RULELIST rules to the package")
 	print("    -t tags                          : use a custom tag file")
@@ -55,16 +76,12 @@ def usage():
 	sys.exit(2)
 
 def open_package(filename):
+	"""Opens a tarball, returns None if it is not one"""
 	try:
-		tar = tarfile.open(filename, "r")
-		if '.PKGINFO' not in tar.getnames():
-			tar.close()
-			return None
-	except IOError:
-		if tar:
-			tar.close()
+		with Namcap.profile.stage('open_archive'):
+			return Namcap.archive.open_archive(filename)
+	except (IOError, tarfile.TarError):
 		return None
-	return tar
 
 def check_rules_exclude(optlist):	
 	'''Check if the -r (--rules) and the -r (--exclude) options
@@ -77,51 +94,116 @@ def check_rules_exclude(optlist):
 			args_used += 1			
 	return args_used
 
-def show_messages(name, key, messages):
+def show_messages(name, key, messages, rule = None):
+	"""Prints the messages of a rule, as records with --format=jsonl"""
 	for msg in messages:
-		print("%s %s: %s" % (name, key, Namcap.tags.format_message(msg)))
+		if jsonl_writer is not None:
+			jsonl_writer.write(Namcap.output.message_record(name, rule, key, msg))
+		else:
+			print("%s %s: %s" % (name, key, Namcap.tags.format_message(msg)))
+
+def show_error(package, tag, message):
+	"""Prints an error keeping a package from being checked"""
+	if jsonl_writer is not None:
+		jsonl_writer.write(Namcap.output.error_record(package, tag))
+	else:
+		print("Error: " + message)
 
-def process_realpackage(package, modules):
+def show_results(name, results):
+	"""Prints a list of (rule, key, message), information only if asked for"""
+	for rule, key, msg in results:
+		if key != 'I' or info_reporting:
+			show_messages(name, key, [msg], rule)
+
+def process_realpackage(package, pkgtar, modules, cache_key = None):
 	"""Runs namcap checks over a package tarball"""
 	extracted = 0
-	pkgtar = open_package(package)
-
-	if not pkgtar:
-		print("Error: %s is empty or is not a valid package" % package)
+	# the metadata and the rules share a single pass over the archive
+	with Namcap.profile.stage('load_from_tarfile'):
+		pkginfo = Namcap.package.load_from_tarfile(pkgtar)
+
+	if pkginfo is None:
+		show_error(package, 'invalid-package',
+				"%s is empty or is not a valid package" % package)
+		pkgtar.close()
 		return 1
 
-	pkginfo = Namcap.package.load_from_tarball(package)
-	# Loop through each one, load them apply if possible
+	rules = package_rules(modules)
+
+	# Tarball rules share a single pass over the archive, the other
+	# steps run concurrently
+	facts = None
+	if fact_store is not None:
+		facts = Namcap.incremental.MemberFacts(
+				Namcap.incremental.mtree_digests(pkginfo.mtree),
+				fact_store.load(pkginfo["name"]))
+	errs, warns, infos = Namcap.scheduler.run_rules(pkginfo, pkgtar,
+			[rule for i, rule in rules if isinstance(rule,
+				(Namcap.ruleclass.PkgInfoRule, Namcap.ruleclass.TarballRule))],
+			facts = facts)
+	pkgtar.close()
+	if facts is not None and facts.digests:
+		fact_store.save(pkginfo["name"], facts.current)
+
+	report_package(pkginfo["name"], rules, (errs, warns, infos), cache_key)
+
+def process_metadata(package, modules, cache_key = None):
+	"""
+	Runs namcap checks over the .PKGINFO and .MTREE of a package tarball,
+	the rules needing nothing else. Returns None if the package does not
+	start with them.
+	"""
+	with Namcap.profile.stage('load_metadata'):
+		loaded = Namcap.metadata.load_metadata(package)
+	if loaded is None:
+		return None
+	pkginfo, members = loaded
+	rules = package_rules(modules)
+	errs, warns, infos = Namcap.scheduler.run_rules(pkginfo, members,
+			[rule for i, rule in rules])
+	report_package(pkginfo["name"], rules, (errs, warns, infos), cache_key)
+	return 0
+
+def package_rules(modules):
+	"""Returns the (name, rule) pairs of the rules to run on a package tarball"""
+	rules = []
 	for i in modules:
-		rule = get_modules()[i]()
-
-		if isinstance(rule, Namcap.ruleclass.PkgInfoRule):
-			rule.analyze(pkginfo, None)
-		elif isinstance(rule, Namcap.ruleclass.PkgbuildRule):
-			pass
-		elif isinstance(rule, Namcap.ruleclass.TarballRule):
-			rule.analyze(pkginfo, pkgtar)
-		else:
-			show_messages(pkginfo["name"], 'E',
-			              [('error-running-rule %s', i)])
+		# PKGBUILD rules have nothing to say, do not even import them
+		if get_modules().kind(i) == 'pkgbuild':
+			continue
+		rule = Namcap.profile.instrument(get_modules()[i](), i)
+		rules.append((i, rule))
+	return rules
+
+def report_package(name, rules, depends, cache_key = None):
+	"""Prints the messages of the rules and of the dependency analysis"""
+	errs, warns, infos = depends
+	results = []
+	for i, rule in rules:
+		if not isinstance(rule, (Namcap.ruleclass.PkgInfoRule,
+				Namcap.ruleclass.PkgbuildRule, Namcap.ruleclass.TarballRule)):
+			results.append((i, 'E', ('error-running-rule %s', i)))
 
 		# Output the three types of messages
-		show_messages(pkginfo["name"], 'E', rule.errors)
-		show_messages(pkginfo["name"], 'W', rule.warnings)
-		if info_reporting:
-			show_messages(pkginfo["name"], 'I', rule.infos)
+		results.extend((i, 'E', msg) for msg in rule.errors)
+		results.extend((i, 'W', msg) for msg in rule.warnings)
+		results.extend((i, 'I', msg) for msg in rule.infos)
 	
 	# dependency analysis
-	errs, warns, infos = Namcap.depends.analyze_depends(pkginfo)
-	show_messages(pkginfo["name"], 'E', errs)
-	show_messages(pkginfo["name"], 'W', warns)
-	if info_reporting:
-		show_messages(pkginfo["name"], 'I', infos)
+	results.extend(('depends', 'E', msg) for msg in errs)
+	results.extend(('depends', 'W', msg) for msg in warns)
+	results.extend(('depends', 'I', msg) for msg in infos)
+
+	show_results(name, results)
+	if cache_key is not None:
+		result_cache.put(cache_key, name, results)
 
 def process_pkginfo(pkginfo, modules):
 	"""Runs namcap checks of a single, non-split PacmanPackage object"""
 	for i in modules:
-		rule = get_modules()[i]()
+		if get_modules().kind(i) != 'pkginfo':
+			continue
+		rule = Namcap.profile.instrument(get_modules()[i](), i)
 		if isinstance(rule, Namcap.ruleclass.PkgInfoRule):
 			ret = rule.analyze(pkginfo, None)
 
@@ -130,25 +212,31 @@ def process_pkginfo(pkginfo, modules):
 			name = "PKGBUILD (" + pkginfo["base"] + ")"
 		else:
 			name = "PKGBUILD (" + pkginfo["name"] + ")"
-		show_messages(name, 'E', rule.errors)
-		show_messages(name, 'W', rule.warnings)
+		show_messages(name, 'E', rule.errors, i)
+		show_messages(name, 'W', rule.warnings, i)
 		if info_reporting:
-			show_messages(name, 'I', rule.infos)
+			show_messages(name, 'I', rule.infos, i)
 
 
 def process_pkgbuild(package, modules):
 	"""Runs namcap checks over a PKGBUILD"""
 	# We might want to do some verifying in here... but really... isn't that
 	# what pacman.load is for?
-	pkginfo = Namcap.package.load_from_pkgbuild(package)
+	# what parsepkgbuild complains about is not mixed with the records
+	with Namcap.profile.stage('load_from_pkgbuild'), contextlib.redirect_stdout(
+			sys.stdout if jsonl_writer is None else sys.stderr):
+		pkginfo = Namcap.package.load_from_pkgbuild(package)
 
 	if pkginfo == None:
-		print("Error: %s is not a valid PKGBUILD" % package)
+		show_error(package, 'invalid-pkgbuild', "%s is not a valid PKGBUILD" % package)
 		return 1
 
 	# apply global PKGBUILD rules
 	for i in modules:
-		rule = get_modules()[i]()
+		# tarball rules have nothing to say, do not even import them
+		if get_modules().kind(i) != 'pkgbuild':
+			continue
+		rule = Namcap.profile.instrument(get_modules()[i](), i)
 		if isinstance(rule, Namcap.ruleclass.PkgbuildRule):
 			ret = rule.analyze(pkginfo, package)
 		# Output the messages
@@ -156,26 +244,86 @@ def process_pkgbuild(package, modules):
 			name = "PKGBUILD (" + pkginfo["base"] + ")"
 		else:
 			name = "PKGBUILD (" + pkginfo["name"] + ")"
-		show_messages(name, 'E', rule.errors)
-		show_messages(name, 'W', rule.warnings)
+		show_messages(name, 'E', rule.errors, i)
+		show_messages(name, 'W', rule.warnings, i)
 		if info_reporting:
-			show_messages(name, 'I', rule.infos)
+			show_messages(name, 'I', rule.infos, i)
 	# apply per pkginfo rule
 	for subpkg in (pkginfo.subpackages
 			if pkginfo.is_split else [pkginfo]):
 		process_pkginfo(subpkg, modules)
 
+def process_package(package, modules):
+	"""Runs namcap checks over a package tarball or a PKGBUILD"""
+	pkgtar = None
+	cache_key = None
+	if os.path.isfile(package):
+		# results of a previous run are replayed without decompressing
+		# the package
+		if result_cache is not None and not package.endswith('PKGBUILD'):
+			cache_key = result_cache.key(package, modules,
+					filename or Namcap.tags.DEFAULT_TAGS,
+					machine_readable or jsonl_writer is not None)
+			cached = cache_key and result_cache.get(cache_key)
+			if cached:
+				show_results(*cached)
+				return 0
+		# only the front of the archive is read, unless it does not
+		# start with the .PKGINFO and .MTREE
+		if metadata_only and not package.endswith('PKGBUILD'):
+			ret = process_metadata(package, modules, cache_key)
+			if ret is not None:
+				return ret
+		pkgtar = open_package(package)
+	if pkgtar is not None:
+		ret = process_realpackage(package, pkgtar, modules, cache_key)
+	elif package.endswith('PKGBUILD'):
+		ret = process_pkgbuild(package, modules)
+	else:
+		show_error(package, 'cannot-process', "Cannot process %s" % package)
+		ret = 1
+	return ret or 0
+
+def process_package_captured(package):
+	"""
+	Runs process_package() in a worker process and returns its exit
+	status along with everything it printed, so that the output of
+	parallel checks can be replayed in order, and its profile if any
+	"""
+	profile = None
+	if Namcap.profile.enabled():
+		# only what this package took, the parent adds it up
+		Namcap.profile.enable()
+	out = io.StringIO()
+	with contextlib.redirect_stdout(out):
+		ret = process_package(package, active_modules)
+		if jsonl_writer is not None:
+			jsonl_writer.flush()
+	if Namcap.profile.enabled():
+		profile = Namcap.profile.report()
+	return ret, out.getvalue(), profile
+
 # Main
-modules = get_modules()
 info_reporting = 0
 machine_readable = False
+jsonl_writer = None
+profile_table = False
+profile_json = None
 filename = None
+jobs = 1
+metadata_only = False
+use_cache = False
+fact_store = None
+cache_size = Namcap.resultcache.CACHE_SIZE
+result_cache = None
 
 # get our options and process them
 try:
-	optlist, args = getopt.getopt(sys.argv[1:], "ihmr:e:t:Lv",
+	optlist, args = getopt.getopt(sys.argv[1:], "ihmr:e:t:Lvj:",
 			["info", "help", "machine-readable", "rules=",
-				"exclude=", "tags=", "list", "version"])
+				"exclude=", "tags=", "list", "version", "jobs=",
+				"parse-workers=", "cache", "cache-size=", "incremental",
+				"metadata-only", "format=", "profile", "profile-json="])
 except getopt.GetoptError:
 	usage()
 
@@ -188,24 +336,27 @@ if check_rules_exclude(optlist) > 1:
 
 for i, k in optlist:
 	if i in ('-L', '--list'):
+		modules = get_modules()
 		print("-"*20 + " Namcap rule list " + "-"*20)
 		for j in sorted(modules):
-			print("%-20s: %s" % (j, modules[j].description))
+			print("%-20s: %s" % (j, modules.description(j)))
 		sys.exit(2)
 
 	if i in ('-r', '--rules'):
+		modules = get_modules()
 		module_list = k.split(',')
 		for j in module_list:
 			if j in modules:
-				active_modules[j] = modules[j]
+				active_modules[j] = None
 			else:
 				print("Error: Rule '%s' does not exist" % j)
 				usage()
 
 	# Used to exclude some rules from the check
 	if i in ('-e', '--exclude'):
+		modules = get_modules()
 		module_list = k.split(',')
-		active_modules.update(modules)
+		active_modules.update(dict.fromkeys(modules))
 		for j in module_list:
 			if j in modules:
 				active_modules.pop(j)
@@ -216,6 +367,60 @@ for i, k in optlist:
 	if i in ('-i', '--info'):
 		info_reporting = 1
 
+	if i in ('-j', '--jobs'):
+		try:
+			jobs = int(k)
+		except ValueError:
+			jobs = 0
+		if jobs < 1:
+			print("Error: Invalid number of jobs '%s'" % k)
+			usage()
+
+	if i == '--cache':
+		use_cache = True
+
+	if i == '--profile':
+		profile_table = True
+		Namcap.profile.enable()
+
+	if i == '--profile-json':
+		profile_json = k
+		Namcap.profile.enable()
+
+	if i == '--incremental':
+		fact_store = Namcap.incremental.FactStore()
+
+	if i == '--metadata-only':
+		metadata_only = True
+
+	if i == '--format':
+		if k not in Namcap.output.FORMATS:
+			print("Error: Invalid output format '%s'" % k)
+			usage()
+		jsonl_writer = None
+		if k == 'jsonl':
+			jsonl_writer = Namcap.output.JsonLinesWriter()
+
+	if i == '--cache-size':
+		try:
+			cache_size = int(k)
+		except ValueError:
+			cache_size = -1
+		if cache_size < 0:
+			print("Error: Invalid cache size '%s'" % k)
+			usage()
+		cache_size *= 1024 * 1024
+
+	if i == '--parse-workers':
+		try:
+			workers = int(k)
+		except ValueError:
+			workers = 0
+		if workers < 1:
+			print("Error: Invalid number of workers '%s'" % k)
+			usage()
+		Namcap.pkgbuild.configure(workers = workers)
+
 	if i in ('-h', '--help'):
 		usage()
 	if i in ('-m', '--machine-readable'):
@@ -232,25 +437,67 @@ for i, k in optlist:
 if (args == []):
 	usage()
 
-Namcap.tags.load_tags(filename = filename, machine = machine_readable)
+# messages embedded in others keep their tag in the records
+Namcap.tags.load_tags(filename = filename,
+		machine = machine_readable or jsonl_writer is not None)
 
 packages = args
 
 # No rules selected?  Then select them all!
 if len(active_modules) == 0:
-	active_modules = modules
+	active_modules = dict.fromkeys(get_modules())
+
+if metadata_only:
+	# from the manifest, no rule is imported just to be left out
+	active_modules = dict.fromkeys(i for i in active_modules
+			if get_modules().kind(i) == 'pkgbuild'
+			or get_modules().metadata_capable(i))
+
+if use_cache:
+	result_cache = Namcap.resultcache.ResultCache(max_size = cache_size)
 
 # Go through each package, get the info, and apply the rules
 for package in packages:
 	if not os.access(package, os.R_OK):
-		print("Error: Problem reading %s" % package)
+		show_error(package, 'unreadable-package', "Problem reading %s" % package)
+		if jsonl_writer is not None:
+			jsonl_writer.flush()
+			sys.exit(2)
 		usage()
 
-	if os.path.isfile(package) and tarfile.is_tarfile(package):
-		process_realpackage(package, active_modules)
-	elif package.endswith('PKGBUILD'):
-		process_pkgbuild(package, active_modules)
-	else:
-		print("Error: Cannot process %s" % package)
+status = 0
+if jobs > 1 and len(packages) > 1:
+	# Workers inherit the loaded tags and the selected rules. Results
+	# are printed as soon as possible, in command-line order.
+	import multiprocessing
+	sys.stdout.flush()
+	pool = multiprocessing.get_context('fork').Pool(min(jobs, len(packages)))
+	for ret, output, profile in pool.imap(process_package_captured, packages):
+		sys.stdout.write(output)
+		sys.stdout.flush()
+		status = max(status, ret)
+		if profile is not None:
+			Namcap.profile.merge(profile)
+	pool.close()
+	pool.join()
+else:
+	for package in packages:
+		status = max(status, process_package(package, active_modules))
+		if jsonl_writer is not None:
+			jsonl_writer.flush()
+
+if profile_json is not None:
+	try:
+		with open(profile_json, 'w') as f:
+			Namcap.profile.write_json(Namcap.profile.report(), f)
+	except OSError as e:
+		# not mixed with the records of --format=jsonl
+		print("Error: Cannot write the profile to %s: %s" % (profile_json, e.strerror),
+				file = sys.stdout if jsonl_writer is None else sys.stderr)
+		status = max(status, 1)
+if profile_table:
+	sys.stderr.write(Namcap.profile.format_table(Namcap.profile.report()))
+
+sys.exit(status)
 
 # vim: set ts=4 sw=4 noet:
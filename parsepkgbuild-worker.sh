@@ -0,0 +1,33 @@
+#!/bin/bash
+#
+# Long-lived PKGBUILD parser used by namcap. It reads pairs of lines (a
+# directory and a PKGBUILD file name in it) on its standard input and
+# parses each PKGBUILD with parsepkgbuild.sh in a fresh restricted
+# subshell. Its output is followed by a line
+#
+#   <token> <exit status> <length of the error output>
+#
+# and by the error output itself.
+
+_namcap_token=$2
+eval "_namcap_parse() {
+$(< "$1")
+}"
+
+while IFS= read -r _namcap_dir && IFS= read -r _namcap_file; do
+	{ _namcap_err=$( {
+		( cd -- "$_namcap_dir" || exit 1
+		  set -- "$_namcap_file"
+		  unset OLDPWD _namcap_dir _namcap_file _namcap_token _namcap_err \
+			_namcap_status
+		  set -r
+		  _namcap_parse "$1" ) 2>&1 >&3 3>&- </dev/null
+		printf '\n%d' $?
+	} ); } 3>&1
+	_namcap_status=${_namcap_err##*$'\n'}
+	_namcap_err=${_namcap_err%$'\n'*}
+	printf '\n%s %d %d\n%s' "$_namcap_token" "$_namcap_status" \
+		"${#_namcap_err}" "$_namcap_err"
+done
+
+# vim: set noet ts=4 sw=4:
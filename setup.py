@@ -3,7 +3,8 @@ from setuptools import setup, find_packages
 import Namcap.version
 
 DATAFILES = [('/usr/share/man/man1', ['namcap.1']),
-		('/usr/share/namcap', ['namcap-tags', 'parsepkgbuild.sh']),
+		('/usr/share/namcap', ['namcap-tags', 'parsepkgbuild.sh',
+			'parsepkgbuild-worker.sh']),
 		('/usr/share/doc/namcap',['README','AUTHORS','TODO'])]
 
 setup(name="namcap",
@@ -16,7 +17,7 @@ setup(name="namcap",
 
 	py_modules=["namcap"],
 	packages = find_packages(),
-	scripts=["namcap", 'parsepkgbuild'],
+	scripts=["namcap", 'namcapd', 'namcap-client', 'parsepkgbuild'],
 	test_suite = "Namcap.tests",
 	data_files=DATAFILES)
 